@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "fire_fruit_money.settings")
+os.environ.setdefault("ASYNC_READ_VIEWS", "True")
 
-application = get_asgi_application()
+# WhiteNoise only speaks WSGI. Static files (the admin's and the API docs') are
+# served from the apps' static directories before the middleware, in a thread;
+# put a CDN or the proxy in front of /static/ for anything heavier.
+application = ASGIStaticFilesHandler(get_asgi_application())
@@ -0,0 +1,128 @@
+"""
+Async-native list and retrieve for DRF viewsets.
+
+Under ASGI a view using `AsyncReadMixin` stays on the event loop for its read
+actions and only hands the database round trips of Django's async ORM to a
+thread, instead of holding a worker thread for the whole request. Everything
+else the viewset does, writes included, still runs through DRF's sync
+`dispatch`. Enabled with the `ASYNC_READ_VIEWS` setting, which `asgi.py` turns
+on: under WSGI Django would run every async view in an event loop of its own.
+"""
+
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework.response import Response
+
+from users.authentication import aauthenticate_jwt
+
+
+class AsyncReadMixin:
+    """
+    Serve a viewset's `list` and `retrieve` with `alist` and `aretrieve`.
+
+    Requests authenticated with an access token go through `adispatch`, which
+    mirrors `APIView.dispatch`: content negotiation, permissions, exception
+    handling and `finalize_response` behave as in the sync view. Requests
+    without a valid token, and every other action, run the sync view in a
+    thread, so error responses stay exactly DRF's.
+
+    `get_queryset`, `filter_queryset` and the serializer run on the event loop
+    and must not query; the defaults load every row first and need the
+    queryset to load the relations the serializer renders.
+    """
+
+    async_actions = {"list": "alist", "retrieve": "aretrieve"}
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_READ_VIEWS:
+            return view
+
+        sync_view = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            # As DRF's view does on its first request.
+            if "get" in view.actions and "head" not in view.actions:
+                view.actions["head"] = view.actions["get"]
+
+            user = None
+            if view.actions.get(request.method.lower()) in cls.async_actions:
+                user = await aauthenticate_jwt(request)
+            if user is None:
+                return await sync_view(request, *args, **kwargs)
+
+            self = cls(**view.initkwargs)
+            self.action_map = view.actions
+            return await self.adispatch(request, user, *args, **kwargs)
+
+        # Keeps `cls`, `initkwargs`, `actions` and `csrf_exempt`, which routers,
+        # the schema generator and the CSRF middleware read off the view.
+        return update_wrapper(async_view, view)
+
+    async def adispatch(self, request, user, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        request.user = user
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            self.initial(request, *args, **kwargs)
+            await self.ainitial(request)
+            handler = getattr(self, self.async_actions[self.action])
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request):
+        """Load, with the async ORM, what the sync parts of the request read."""
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request)
+
+    async def aget_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    async def aget_object(self, queryset=None):
+        """`get_object` with the async ORM, of `queryset` if given."""
+        if queryset is None:
+            queryset = self.filter_queryset(self.get_queryset())
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except queryset.model.DoesNotExist:
+            raise Http404(
+                f"No {queryset.model._meta.object_name} matches the given query."
+            )
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return await self.aget_paginated_response(serializer.data)
+
+        rows = [row async for row in queryset]
+        return Response(self.get_serializer(rows, many=True).data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await self.aget_object()).data)
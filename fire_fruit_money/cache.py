@@ -0,0 +1,276 @@
+"""
+Per-family response cache for list and retrieve endpoints.
+
+Cache keys embed the family's change sequence, which every write path
+advances, so a write makes all of the family's cached responses unreachable
+at once and no TTL is needed for correctness. The storage backend is chosen
+with the `RESPONSE_CACHE` setting.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from fire_fruit_money.conditional import afamily_change_state, family_change_state
+
+
+class BaseResponseCache:
+    """Stores rendered responses as `(content, content_type)` pairs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        return self._count(self._get(key))
+
+    async def aget(self, key):
+        return self._count(await self._aget(key))
+
+    def _count(self, entry):
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key, entry):
+        self._set(key, entry)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, entry):
+        raise NotImplementedError
+
+    async def _aget(self, key):
+        return self._get(key)
+
+
+class LRUResponseCache(BaseResponseCache):
+    """In-process LRU cache bounded by the total size of the stored content."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set(self, key, entry):
+        entry_size = len(entry[0])
+        if entry_size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+
+            self._entries[key] = entry
+            self.size += entry_size
+
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted[0])
+                self.evictions += 1
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats.update(entries=len(self._entries), bytes=self.size)
+        return stats
+
+
+class DjangoResponseCache(BaseResponseCache):
+    """
+    Shared cache on top of one of Django's `CACHES`.
+
+    Eviction happens inside the cache server and is not counted here. Entries of
+    superseded family versions are never read again and expire after `timeout`.
+    """
+
+    def __init__(self, alias="default", timeout=24 * 60 * 60):
+        super().__init__()
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _get(self, key):
+        return self.cache.get(key)
+
+    async def _aget(self, key):
+        return await self.cache.aget(key)
+
+    def _set(self, key, entry):
+        self.cache.set(key, entry, self.timeout)
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        config = settings.RESPONSE_CACHE
+        backend = import_string(config["BACKEND"])
+        _response_cache = backend(**config.get("OPTIONS", {}))
+    return _response_cache
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    global _response_cache
+    if setting == "RESPONSE_CACHE":
+        _response_cache = None
+
+
+class FamilyResponseCacheMixin:
+    """
+    Serve `list` and `retrieve` of a family-scoped viewset from the response cache.
+
+    Staff users see every family and always bypass the cache. With
+    `AsyncReadMixin`, `alist` and `aretrieve` are served from it too.
+    """
+
+    cached_actions = ("list", "retrieve")
+
+    def get_response_cache_key(self, request):
+        if self.action not in self.cached_actions:
+            return None
+
+        state = family_change_state(request)
+        if state is None:
+            return None
+
+        variant = hashlib.blake2b(
+            "|".join(
+                (
+                    str(
+                        self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, "")
+                    ),
+                    urlencode(sorted(request.query_params.lists()), doseq=True),
+                    request.META.get("HTTP_ACCEPT", ""),
+                )
+            ).encode(),
+            digest_size=16,
+        ).hexdigest()
+        return ":".join(
+            (
+                "response",
+                str(request.user.family_id),
+                str(state[0]),
+                self.basename,
+                self.action,
+                variant,
+            )
+        )
+
+    def get_cached_response(self, request):
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return None
+
+        entry = get_response_cache().get(key)
+        if entry is None:
+            request._response_cache_key = key
+            return None
+
+        return self.cached_response(entry)
+
+    async def aget_cached_response(self, request):
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return None
+
+        entry = await get_response_cache().aget(key)
+        if entry is None:
+            request._response_cache_key = key
+            return None
+        return self.cached_response(entry)
+
+    def cached_response(self, entry):
+        content, content_type = entry
+        return HttpResponse(content, content_type=content_type)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request) or super().list(
+            request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(request) or super().retrieve(
+            request, *args, **kwargs
+        )
+
+    async def ainitial(self, request):
+        await super().ainitial(request)
+        if self.action in self.cached_actions:
+            await afamily_change_state(request)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.aget_cached_response(request) or await super().alist(
+            request, *args, **kwargs
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aget_cached_response(request) or await super().aretrieve(
+            request, *args, **kwargs
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        key = getattr(request, "_response_cache_key", None)
+        if (
+            key is not None
+            and isinstance(response, Response)
+            and response.status_code == 200
+        ):
+            response.add_post_render_callback(
+                lambda rendered: get_response_cache().set(
+                    key, (rendered.content, rendered["Content-Type"])
+                )
+            )
+        return response
+
+
+class ResponseCacheStatsView(APIView):
+    """Hit, miss and eviction counters of this process's response cache."""
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_response_cache().stats())
@@ -0,0 +1,64 @@
+"""
+Conditional GET support for family-scoped endpoints.
+
+Responses carry an ETag built from the family's change sequence, which every
+write path advances, so a client polling an unchanged collection gets a
+`304 Not Modified` without the rows being fetched or serialized.
+"""
+
+import hashlib
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from users.models import Family
+
+
+def family_change_state(request):
+    """
+    Return `(change_seq, updated_at)` of the requesting user's family.
+
+    Staff users see every family, so there is no single validator for them and
+    `None` is returned. The value is computed once per request.
+    """
+    if not hasattr(request, "_family_change_state"):
+        user = request.user
+        state = None
+        if not user.is_staff and user.family_id:
+            state = Family.objects.values_list("change_seq", "updated_at").get(
+                pk=user.family_id
+            )
+        request._family_change_state = state
+    return request._family_change_state
+
+
+async def afamily_change_state(request):
+    """`family_change_state` with the async ORM, for async views to call first."""
+    if not hasattr(request, "_family_change_state"):
+        user = request.user
+        state = None
+        if not user.is_staff and user.family_id:
+            state = await Family.objects.values_list("change_seq", "updated_at").aget(
+                pk=user.family_id
+            )
+        request._family_change_state = state
+    return request._family_change_state
+
+
+def family_etag(request, *args, **kwargs):
+    state = family_change_state(request)
+    if state is None:
+        return None
+
+    # The same family state renders differently per page, filter and format.
+    variant = hashlib.blake2b(
+        f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}".encode(),
+        digest_size=8,
+    ).hexdigest()
+    return f'W/"{request.user.family_id}-{state[0]}-{variant}"'
+
+
+# No Last-Modified: HTTP dates have one-second resolution, so a client
+# revalidating with If-Modified-Since alone would get a 304 for writes made
+# within the second of its previous response.
+family_condition = method_decorator(condition(etag_func=family_etag))
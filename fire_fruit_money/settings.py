@@ -34,16 +34,18 @@ INSTALLED_APPS = [
     'django.contrib.admin',
     "rest_framework",
     "drf_spectacular",
-    "debug_toolbar",
     "money",
     "users",
+    "monitoring",
 ]
 
+# Every middleware must support async, or under ASGI Django runs the whole
+# chain, async views included, in a thread. Static files are therefore served
+# in front of it by `asgi.py` and `wsgi.py`.
 MIDDLEWARE = [
+    "monitoring.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -51,6 +53,14 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# The toolbar instruments every request, so it is only loaded in development.
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.contrib.sessions.middleware.SessionMiddleware") + 1,
+        "debug_toolbar.middleware.DebugToolbarMiddleware",
+    )
+
 ROOT_URLCONF = "fire_fruit_money.urls"
 
 TEMPLATES = [
@@ -74,16 +84,98 @@ WSGI_APPLICATION = "fire_fruit_money.wsgi.application"
 
 AUTH_USER_MODEL = "users.User"
 
+AUTHENTICATION_BACKENDS = ["users.backends.HashingExecutorBackend"]
+
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
 
+# Serve list and retrieve of the money and users viewsets as async views using
+# the async ORM. `asgi.py` turns it on; under WSGI Django would run each of them
+# in an event loop of its own.
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "False") == "True"
+
+# Per-family response cache for list and retrieve endpoints. Use
+# "fire_fruit_money.cache.DjangoResponseCache" with an "alias" option to share
+# it between processes through one of the CACHES.
+RESPONSE_CACHE = {
+    "BACKEND": "fire_fruit_money.cache.LRUResponseCache",
+    "OPTIONS": {"max_bytes": 64 * 1024 * 1024},
+}
+
+# Users resolved from access tokens, cached per process with their family.
+# "timeout" bounds how long other processes may see a changed user; set
+# "alias" to one of the CACHES shared by all processes to drop it everywhere
+# as soon as it changes.
+USER_CACHE = {"max_entries": 10000, "timeout": 60, "alias": None}
+
+# Largest snapshot, after compression, kept in the response cache. Larger ones
+# are streamed without being kept. Keep it well below the LRU cache's
+# "max_bytes", or share large snapshots through DjangoResponseCache.
+SNAPSHOT_CACHE_MAX_BYTES = int(os.getenv("SNAPSHOT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Number of worker processes serving requests, as read by gunicorn and
+# uvicorn. With more than one, the system checks require a CHANGE_BROKER and
+# STREAM_TICKETS cache shared between processes.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Fan-out of change notifications to the devices connected to this process.
+# "max_pending" bounds the events queued per connection before it is told to
+# resync.
+CHANGE_BROKER = {
+    "BACKEND": "money.events.InMemoryBroker",
+    "OPTIONS": {"max_pending": 100},
+}
+
+# Single-use tickets authenticating change streams, valid for "timeout"
+# seconds. "alias" names one of the CACHES; it must be shared by all processes
+# when the ticket and the stream may be served by different ones.
+STREAM_TICKETS = {"alias": "default", "timeout": 30}
+
+# Opt-in batching of concurrent expense creates of one family into a single
+# transaction: a batch waits up to "window_ms" for up to "max_batch" creates.
+# For example {"window_ms": 5, "max_batch": 100}.
+EXPENSE_WRITE_COALESCING = None
+
+# Interval ("year", the only one supported) of the range partitions of the
+# expense table by date_time, or None for an unpartitioned table. PostgreSQL
+# only. The money 0005 migration converts the table when this is set before it
+# runs; `partition_expenses` creates partitions ahead of time.
+EXPENSE_PARTITIONING = os.getenv("EXPENSE_PARTITIONING") or None
+
+# Bearer token Prometheus sends to scrape /metrics. Without one, only
+# INTERNAL_IPS may scrape.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Statements slower than "threshold_ms" are aggregated per fingerprint and
+# added to monitoring.SlowQuery by a background thread every "flush_interval"
+# seconds, which also plans "plan_sample_rate" of the slow SELECTs. On
+# PostgreSQL they run again under EXPLAIN ANALYZE, read-only, rolled back and
+# cancelled after "plan_timeout_ms". Set to None to disable.
+SLOW_QUERIES = {
+    "threshold_ms": int(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200")),
+    "plan_sample_rate": 0.05,
+    "max_fingerprints": 500,
+    "flush_interval": 10,
+    "plan_timeout_ms": 5000,
+}
+
+# Worker processes hashing passwords for signup, login and password changes.
+# Beyond "max_workers" running and "max_pending" queued operations per process,
+# requests needing a hash get 503. Set to None to hash in the request thread.
+PASSWORD_HASHING = {
+    "max_workers": int(os.getenv("PASSWORD_HASHING_WORKERS", "2")),
+    "max_pending": 32,
+    "timeout": 30,
+}
+
+
 SIMPLE_JWT = {
     "TOKEN_OBTAIN_SERIALIZER": "users.serializers.CustomTokenObtainPairSerializer",
     "TOKEN_REFRESH_SERIALIZER": "users.serializers.CustomTokenRefreshSerializer",
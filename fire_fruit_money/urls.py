@@ -3,6 +3,9 @@ from debug_toolbar.toolbar import debug_toolbar_urls
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
+from fire_fruit_money.cache import ResponseCacheStatsView
+from monitoring.views import MetricsView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
@@ -10,4 +13,7 @@ urlpatterns = [
     path("api/schema/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
     path("api/users/", include("users.urls", namespace="users")),
     path("api/money/", include("money.urls", namespace="money")),
+    path("api/response-cache/", ResponseCacheStatsView.as_view(), name="response-cache"),
+    path("api/monitoring/", include("monitoring.urls", namespace="monitoring")),
+    path("metrics", MetricsView.as_view(), name="metrics"),
 ] + debug_toolbar_urls()
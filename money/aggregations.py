@@ -0,0 +1,98 @@
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db.models import DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from money.models import Category, Expense, ExpenseRollup
+
+PERIOD_CHOICES = ("day", "week", "month", "year")
+
+HUNDRED = Decimal("100")
+CENT = Decimal("0.01")
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def expense_spending_queryset(family, start, end, period):
+    """Live expense totals per category and period over the dates `[start, end)`."""
+    return (
+        Expense.objects.filter(
+            family=family,
+            deleted_at__isnull=True,
+            date_time__gte=start_of_day(start),
+            date_time__lt=start_of_day(end),
+        )
+        .annotate(period=Trunc("date_time", period, output_field=DateField()))
+        .values("category", "period")
+        .annotate(spent=Sum("amount"))
+        .order_by()
+    )
+
+
+def budget_status(limit, spent):
+    return {
+        "spent": spent,
+        "remaining": limit - spent,
+        "percent_used": (spent / limit * HUNDRED).quantize(CENT) if limit else None,
+    }
+
+
+def rollup_spending_queryset(family, start, end, period):
+    """Same totals as `expense_spending_queryset`, read from the monthly rollups."""
+    return (
+        ExpenseRollup.objects.filter(family=family, month__gte=start, month__lt=end)
+        .annotate(period=Trunc("month", period, output_field=DateField()))
+        .values("category", "period")
+        .annotate(spent=Sum("total"))
+        .order_by()
+    )
+
+
+def spending_queryset(family, start, end, period):
+    """
+    Pick the cheapest source for the requested totals.
+
+    Month and year buckets over whole months only need the rollups, which hold
+    one row per category, tag and month instead of one per expense.
+    """
+    if period in ("month", "year") and start.day == 1 and end.day == 1:
+        return rollup_spending_queryset(family, start, end, period)
+    return expense_spending_queryset(family, start, end, period)
+
+
+def category_spending(family, start, end, period):
+    """
+    Spending of every live category of `family` over `[start, end)`.
+
+    Each category reports its budget status for the whole range and for every
+    `period` bucket it has expenses in.
+    """
+    spent_by_category = defaultdict(dict)
+    for row in spending_queryset(family, start, end, period):
+        spent_by_category[row["category"]][row["period"]] = row["spent"]
+
+    categories = Category.objects.filter(
+        family=family, deleted_at__isnull=True
+    ).order_by("title", "id")
+
+    results = []
+    for category in categories:
+        periods = spent_by_category.get(category.pk, {})
+        results.append(
+            {
+                "id": category.pk,
+                "title": category.title,
+                "limit": category.limit,
+                **budget_status(category.limit, sum(periods.values(), Decimal(0))),
+                "periods": [
+                    {"period": bucket, **budget_status(category.limit, spent)}
+                    for bucket, spent in sorted(periods.items())
+                ],
+            }
+        )
+    return results
@@ -0,0 +1,130 @@
+"""
+Archival of soft-deleted rows.
+
+A soft-deleted category, tag or expense stays in its table, and in every list
+response, until each device of the family has synced past its deletion. Then it
+is replaced by a `Tombstone` (kind, id and deletion time) that delta sync reports
+to devices which are further behind.
+"""
+
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Min
+from django.utils import timezone
+
+from money.models import Category, Tag, Expense, ChangeLog, DeviceSyncState, Tombstone
+from users.models import Family
+
+# Expenses reference tags and categories and tags reference categories, so they
+# are archived in this order.
+ARCHIVE_ORDER = (("expense", Expense), ("tag", Tag), ("category", Category))
+
+
+def sync_watermark(family_id, device_ttl):
+    """
+    The change sequence every device of the family has synced past, `None`
+    without devices. Devices that have not synced for `device_ttl` no longer
+    hold tombstones back; they learn about archived deletions from sync.
+    """
+    return (
+        DeviceSyncState.objects.filter(
+            family_id=family_id, updated_at__gte=timezone.now() - device_ttl
+        )
+        .aggregate(watermark=Min("last_seq"))
+        .get("watermark")
+    )
+
+
+def deletions(kind, family_id, watermark, after, limit):
+    """
+    `(seq, object_id)` of up to `limit` of the family's deletions of `kind`
+    after `after` and at or below `watermark`, in seq order.
+    """
+    return list(
+        ChangeLog.objects.filter(
+            family_id=family_id,
+            kind=kind,
+            action="delete",
+            seq__gt=after,
+            seq__lte=watermark,
+        )
+        .order_by("seq")
+        .values_list("seq", "object_id")[:limit]
+    )
+
+
+def archivable(model, kind, family_id, object_ids):
+    """The rows of `object_ids` that are deleted and can be archived."""
+    queryset = model.objects.filter(
+        family_id=family_id, deleted_at__isnull=False, pk__in=object_ids
+    )
+    # Never cascade into rows that are still in the hot tables.
+    if model is not Expense:
+        queryset = queryset.exclude(
+            Exists(Expense.objects.filter(**{kind: OuterRef("pk")}))
+        )
+    if model is Category:
+        queryset = queryset.exclude(Exists(Tag.objects.filter(category=OuterRef("pk"))))
+    return queryset
+
+
+def archive_batch(model, kind, family_id, object_ids):
+    """Archive the archivable rows of `object_ids` in one short transaction; return how many."""
+    with transaction.atomic():
+        queryset = archivable(model, kind, family_id, object_ids).order_by("pk")
+        if connection.features.has_select_for_update_skip_locked:
+            # Rows a request is writing are left for the next run.
+            queryset = queryset.select_for_update(skip_locked=True, of=("self",))
+        rows = list(queryset.values_list("pk", "deleted_at"))
+        if not rows:
+            return 0
+
+        Tombstone.objects.bulk_create(
+            (
+                Tombstone(
+                    family_id=family_id,
+                    kind=kind,
+                    object_id=pk,
+                    deleted_at=deleted_at,
+                )
+                for pk, deleted_at in rows
+            ),
+            ignore_conflicts=True,
+        )
+        model.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+
+        # Cached list responses and ETags still include the archived rows.
+        Family.touch(family_id)
+    return len(rows)
+
+
+def archive_family(family_id, device_ttl=timedelta(days=90), batch_size=1000, pause=0):
+    """
+    Archive the family's deleted rows every device has synced past, in batches
+    of `batch_size` with `pause` seconds between them. Returns the number of
+    archived rows per kind, or `None` when the family has no devices.
+    """
+    watermark = sync_watermark(family_id, device_ttl)
+    if watermark is None:
+        return None
+
+    archived = {}
+    for kind, model in ARCHIVE_ORDER:
+        archived[kind] = 0
+        # The family's deletions are walked once, `batch_size` at a time.
+        after = 0
+        while True:
+            batch = deletions(kind, family_id, watermark, after, batch_size)
+            if not batch:
+                break
+            after = batch[-1][0]
+            archived[kind] += archive_batch(
+                model, kind, family_id, [object_id for _, object_id in batch]
+            )
+            if len(batch) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    return archived
@@ -0,0 +1,209 @@
+"""
+Apply an ordered list of offline-queued client operations in one transaction.
+
+Consecutive operations of the same kind (for example a run of expense creates)
+are validated one by one with the regular serializers and then written together
+through the bulk write paths in `money.services`. Creates may carry a client
+`temp_id` that later operations use in place of the real id, both as their
+target and in `category`/`tag` references.
+"""
+
+from django.db import transaction
+
+from money import services
+from money.models import Category, Tag, Expense
+from money.serializers import CategorySerializer, TagSerializer, ExpenseSerializer
+
+MODELS = {"category": Category, "tag": Tag, "expense": Expense}
+SERIALIZERS = {
+    "category": CategorySerializer,
+    "tag": TagSerializer,
+    "expense": ExpenseSerializer,
+}
+REFERENCE_FIELDS = {
+    "category": (),
+    "tag": ("category",),
+    "expense": ("category", "tag"),
+}
+
+
+class BatchError(Exception):
+    def __init__(self, index, errors):
+        super().__init__(index, errors)
+        self.index = index
+        self.errors = errors
+
+
+class BatchProcessor:
+    def __init__(self, family, context=None):
+        self.family = family
+        self.context = context or {}
+        self.objects = {}
+        self.temp_ids = {}
+        self.pending = []
+        self.pending_key = None
+        self.pending_temp_ids = set()
+        self.results = []
+
+    @transaction.atomic
+    def run(self, operations):
+        """Apply `operations` and return one result per operation, in order."""
+        self.results = [None] * len(operations)
+        self.preload(operations)
+
+        for index, operation in enumerate(operations):
+            self.add(index, operation)
+        self.flush()
+
+        return self.results
+
+    def preload(self, operations):
+        """Fetch every object targeted by a real id with one query per type."""
+        ids = {kind: set() for kind in MODELS}
+        for operation in operations:
+            if operation.get("id", "").isdigit():
+                ids[operation["type"]].add(int(operation["id"]))
+
+        for kind, pks in ids.items():
+            if pks:
+                for pk, instance in self.queryset(kind).in_bulk(pks).items():
+                    self.objects[kind, pk] = instance
+
+    def queryset(self, kind):
+        return MODELS[kind].objects.filter(family=self.family)
+
+    def resolve(self, value):
+        """Translate a temporary id into the real one, leaving real ids as they are."""
+        if isinstance(value, str) and value in self.temp_ids:
+            return self.temp_ids[value]
+        return value
+
+    def get_instance(self, index, kind, value):
+        pk = self.resolve(value)
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise BatchError(index, {"id": [f"Unknown id {value}."]})
+
+        if (kind, pk) not in self.objects:
+            instance = self.queryset(kind).filter(pk=pk).first()
+            if instance is None:
+                raise BatchError(
+                    index, {"id": [f"{kind.capitalize()} {pk} not found."]}
+                )
+            self.objects[kind, pk] = instance
+        return self.objects[kind, pk]
+
+    def add(self, index, operation):
+        kind = operation["type"]
+        data = dict(operation["data"])
+        references = [data.get(field) for field in REFERENCE_FIELDS[kind]]
+
+        # Writes queued so far must land before anything depends on them.
+        key = (operation["op"], kind)
+        if key != self.pending_key or any(
+            ref in self.pending_temp_ids for ref in [operation.get("id"), *references]
+        ):
+            self.flush()
+            self.pending_key = key
+
+        for field in REFERENCE_FIELDS[kind]:
+            if field in data:
+                data[field] = self.resolve(data[field])
+
+        if operation["op"] == "create":
+            temp_id = operation.get("temp_id")
+            if temp_id in self.temp_ids or temp_id in self.pending_temp_ids:
+                raise BatchError(index, {"temp_id": [f"Duplicate temp id {temp_id}."]})
+
+            validated_data = self.validate(index, kind, None, data)
+            self.pending.append((index, operation, None, validated_data))
+            if temp_id:
+                self.pending_temp_ids.add(temp_id)
+
+        elif operation["op"] == "update":
+            instance = self.get_instance(index, kind, operation["id"])
+            validated_data = self.validate(index, kind, instance, data)
+            self.pending.append((index, operation, instance, validated_data))
+
+        else:
+            instance = self.get_instance(index, kind, operation["id"])
+            self.pending.append((index, operation, instance, None))
+
+    def validate(self, index, kind, instance, data):
+        serializer = SERIALIZERS[kind](instance, data=data, context=self.context)
+        if not serializer.is_valid():
+            raise BatchError(index, serializer.errors)
+
+        # Ensure that references stay inside the family
+        for field in REFERENCE_FIELDS[kind]:
+            related = serializer.validated_data.get(field)
+            if related is not None and related.family_id != self.family.pk:
+                raise BatchError(index, {field: [f'Invalid pk "{related.pk}".']})
+
+        return serializer.validated_data
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        op, kind = self.pending_key
+        model = MODELS[kind]
+        pending, self.pending = self.pending, []
+        self.pending_temp_ids = set()
+
+        if op == "create":
+            instances = services.create_objects(
+                model, self.family, [validated_data for *_, validated_data in pending]
+            )
+            for (index, operation, _, _), instance in zip(pending, instances):
+                self.objects[kind, instance.pk] = instance
+                if operation.get("temp_id"):
+                    self.temp_ids[operation["temp_id"]] = instance.pk
+                self.add_result(index, operation, instance)
+
+        elif op == "update":
+            services.update_objects(
+                model,
+                [
+                    (instance, validated_data)
+                    for _, _, instance, validated_data in pending
+                ],
+            )
+            for index, operation, instance, _ in pending:
+                self.add_result(index, operation, instance)
+
+        else:
+            self.delete(kind, [instance for _, _, instance, _ in pending])
+            for index, operation, instance, _ in pending:
+                self.add_result(index, operation, instance, data=False)
+
+    def delete(self, kind, instances):
+        # Deleting twice is a no-op, so replaying a queue is safe.
+        instances = [instance for instance in instances if instance.deleted_at is None]
+
+        if kind == "expense":
+            services.delete_expenses(instances)
+            return
+
+        for instance in {instance.pk: instance for instance in instances}.values():
+            if kind == "category":
+                services.delete_category(instance)
+            else:
+                services.delete_tag(instance)
+
+        # Cascades changed rows behind the cached instances; reload them on demand.
+        dependent = ("tag", "expense") if kind == "category" else ("expense",)
+        self.objects = {
+            key: value for key, value in self.objects.items() if key[0] not in dependent
+        }
+
+    def add_result(self, index, operation, instance, data=True):
+        result = {"op": operation["op"], "type": operation["type"], "id": instance.pk}
+        if operation.get("temp_id"):
+            result["temp_id"] = operation["temp_id"]
+        if data:
+            result["data"] = SERIALIZERS[operation["type"]](
+                instance, context=self.context
+            ).data
+        self.results[index] = result
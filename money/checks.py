@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, Warning, register
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from money.partitioning import (
+    configured_interval,
+    horizon,
+    is_partitioned,
+    partition_interval,
+    partition_name,
+    partition_names,
+)
+
+
+@register(Tags.database)
+def check_expense_partitioning(app_configs=None, databases=None, **kwargs):
+    """Compare the expense table with `EXPENSE_PARTITIONING`."""
+    if not databases or "default" not in databases:
+        return []
+    if connection.vendor != "postgresql":
+        if settings.EXPENSE_PARTITIONING:
+            return [
+                Error(
+                    "EXPENSE_PARTITIONING requires PostgreSQL.",
+                    id="money.E002",
+                )
+            ]
+        return []
+
+    interval = settings.EXPENSE_PARTITIONING
+    if interval:
+        try:
+            configured_interval()
+        except ValueError as error:
+            return [
+                Error(
+                    str(error),
+                    hint="Lists and sync probe every partition; see "
+                    "money.partitioning.",
+                    id="money.E005",
+                )
+            ]
+
+    with connection.cursor() as cursor:
+        partitioned = is_partitioned(cursor)
+        names = partition_names(cursor) if partitioned else []
+
+    if not partitioned:
+        if interval:
+            return [
+                Warning(
+                    "The expense table is not partitioned.",
+                    hint="The money 0005 migration converts it when "
+                    "EXPENSE_PARTITIONING is set; migrate money back to 0004 and "
+                    "forward again, or unset EXPENSE_PARTITIONING.",
+                    id="money.W001",
+                )
+            ]
+        return []
+
+    if partition_interval(names) != interval:
+        return [
+            Error(
+                f"The expense table is partitioned by "
+                f"{partition_interval(names)}, EXPENSE_PARTITIONING is {interval!r}.",
+                hint="Set EXPENSE_PARTITIONING to match the table.",
+                id="money.E001",
+            )
+        ]
+    if partition_name(horizon(timezone.now(), interval, 1), interval) not in names:
+        return [
+            Warning(
+                f"The expense table has no partition for the next {interval}; "
+                f"its rows will go to the default partition.",
+                hint="Run `manage.py partition_expenses` regularly.",
+                id="money.W002",
+            )
+        ]
+    return []
+
+
+@register(Tags.caches)
+def check_shared_change_streams(app_configs=None, **kwargs):
+    """
+    With several workers, a change stream may be served by another process than
+    the one that issued its ticket or that publishes the family's changes.
+    """
+    if settings.WEB_CONCURRENCY <= 1:
+        return []
+    errors = []
+    if import_string(settings.CHANGE_BROKER["BACKEND"]).process_local:
+        errors.append(
+            Error(
+                f"CHANGE_BROKER only reaches change streams of the publishing "
+                f"process, but WEB_CONCURRENCY is {settings.WEB_CONCURRENCY}.",
+                hint="Use a broker backed by a pub/sub shared by all processes.",
+                id="money.E003",
+            )
+        )
+    alias = settings.STREAM_TICKETS["alias"]
+    if isinstance(caches[alias], LocMemCache):
+        errors.append(
+            Error(
+                f"STREAM_TICKETS are kept in the {alias!r} cache local to each "
+                f"process, but WEB_CONCURRENCY is {settings.WEB_CONCURRENCY}.",
+                hint="Set STREAM_TICKETS['alias'] to one of the CACHES shared by "
+                "all processes.",
+                id="money.E004",
+            )
+        )
+    return errors
@@ -0,0 +1,110 @@
+"""
+Coalescing of concurrent expense creates.
+
+Concurrent writers of one family queue on the family row lock taken by
+`ChangeLog.record`, so a burst of single-expense posts turns into a string of
+short transactions that wait on each other. With `EXPENSE_WRITE_COALESCING`
+set, the first create of a family opens a batch and waits up to `window_ms`
+for others to join (or until `max_batch` have), then inserts all of them with
+one `services.create_objects` call and hands every waiting request its own
+instance. If the batch fails, its items are retried one by one so that each
+request gets its own result or error.
+"""
+
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+
+from money import services
+
+
+class Batch:
+    def __init__(self):
+        self.items = []
+        self.futures = []
+        self.full = threading.Event()
+
+
+class WriteCoalescer:
+    def __init__(self, window_ms=5, max_batch=100):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._batches = {}
+
+    def create(self, model, family, item):
+        """Create one object from a validated `item` and return it."""
+        if connection.in_atomic_block:
+            # The batch commits on its own, which a caller's transaction must
+            # not be able to roll back after the others have been answered.
+            (instance,) = services.create_objects(model, family, [item])
+            return instance
+
+        key = (model, family.pk)
+        future = Future()
+        with self._lock:
+            batch = self._batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._batches[key] = Batch()
+            batch.items.append(item)
+            batch.futures.append(future)
+            if len(batch.items) >= self.max_batch:
+                # Later creates start the next batch.
+                del self._batches[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batches.get(key) is batch:
+                    del self._batches[key]
+            self.run(model, family, batch)
+
+        return future.result()
+
+    def run(self, model, family, batch):
+        try:
+            try:
+                instances = services.create_objects(model, family, batch.items)
+            except Exception:
+                self.run_one_by_one(model, family, batch)
+            else:
+                for instance, future in zip(instances, batch.futures):
+                    future.set_result(instance)
+        finally:
+            # Never leave a request waiting, whatever interrupted the leader.
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(RuntimeError("The batch was interrupted."))
+
+    def run_one_by_one(self, model, family, batch):
+        for item, future in zip(batch.items, batch.futures):
+            try:
+                (instance,) = services.create_objects(model, family, [item])
+            except Exception as error:
+                future.set_exception(error)
+            else:
+                future.set_result(instance)
+
+
+_coalescer = None
+
+
+def get_write_coalescer():
+    """The process's coalescer, `None` unless `EXPENSE_WRITE_COALESCING` is set."""
+    global _coalescer
+    if _coalescer is None and settings.EXPENSE_WRITE_COALESCING:
+        _coalescer = WriteCoalescer(**settings.EXPENSE_WRITE_COALESCING)
+    return _coalescer
+
+
+@receiver(setting_changed)
+def reset_write_coalescer(setting, **kwargs):
+    global _coalescer
+    if setting == "EXPENSE_WRITE_COALESCING":
+        _coalescer = None
@@ -0,0 +1,151 @@
+"""
+Change notifications pushed to connected devices.
+
+`ChangeLog.record` publishes an event once the writing transaction commits.
+The broker fans it out to the change streams of the family's devices that are
+connected to this process. The broker is chosen with the `CHANGE_BROKER`
+setting; a broker backed by an external pub/sub only has to implement
+`publish`, `subscribe` and `unsubscribe`.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+# Larger changes are announced without their ids; clients fetch them via sync.
+MAX_EVENT_IDS = 100
+
+
+class Subscription:
+    """
+    The queue of events waiting to be sent on one change stream.
+
+    Events are dropped once `max_pending` are waiting and the stream is told to
+    resync instead, so a stalled client cannot make the process hold an unbounded
+    backlog.
+    """
+
+    def __init__(self, family_id, max_pending):
+        self.family_id = family_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def put(self, event):
+        # Runs on `self.loop`.
+        if self.queue.full():
+            self.overflowed = True
+        else:
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """The next event, `None` after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class BaseBroker:
+    # Whether only subscriptions held by the publishing process get its events.
+    process_local = False
+
+    def publish(self, family_id, event):
+        """Deliver `event` to every subscription of the family. Thread-safe."""
+        raise NotImplementedError
+
+    def subscribe(self, family_id):
+        """Return a new `Subscription`. Must be called on the event loop."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class InMemoryBroker(BaseBroker):
+    """Fans events out to the subscriptions held by this process."""
+
+    process_local = True
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, family_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(family_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The subscriber's event loop has been closed.
+                self.unsubscribe(subscription)
+
+    def subscribe(self, family_id):
+        subscription = Subscription(family_id, self.max_pending)
+        with self._lock:
+            self._subscriptions[family_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.family_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.family_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(
+                len(subscriptions) for subscriptions in self._subscriptions.values()
+            )
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        config = settings.CHANGE_BROKER
+        backend = import_string(config["BACKEND"])
+        _broker = backend(**config.get("OPTIONS", {}))
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == "CHANGE_BROKER":
+        _broker = None
+
+
+def publish_on_commit(family_id, seq, kind, action, object_ids):
+    """Announce a change to the family's devices once the transaction commits."""
+    event = {
+        "seq": seq,
+        "kind": kind,
+        "action": action,
+        "ids": object_ids if len(object_ids) <= MAX_EVENT_IDS else None,
+    }
+    transaction.on_commit(lambda: get_broker().publish(family_id, event))
+
+
+def format_event(data, event=None, event_id=None):
+    """Encode one Server-Sent Events message."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode()
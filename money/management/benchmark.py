@@ -0,0 +1,321 @@
+"""
+Request scenarios for the `benchmark` command.
+
+A scenario is one endpoint and method. `prepare` runs untimed before every
+request and returns the path and body, creating whatever the request consumes
+(a category to delete, an invite to accept, ...), and the client to send it
+with.
+"""
+
+import itertools
+import random
+import uuid
+from dataclasses import dataclass
+from typing import Callable
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from money.management.seed import create_users, generate_family, historical_timestamps
+from money.models import Category, Tag, Expense
+from money.services import create_objects
+from users.models import Invite, User
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    prepare: Callable
+    expected_status: int = 200
+
+
+def api_client():
+    # Server errors are counted as failed requests instead of ending the run.
+    return APIClient(raise_request_exception=False)
+
+
+def authenticated_client(user):
+    client = api_client()
+    client.credentials(
+        HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}"
+    )
+    return client
+
+
+class Workload:
+    """The family the scenarios run against and the helpers to build their input."""
+
+    password = "benchmark-password"
+
+    def __init__(self, expenses, members=3, seed=0):
+        self.rng = random.Random(seed)
+        self.run = uuid.uuid4().hex[:8]
+        self.counter = itertools.count()
+        self.password_hash = make_password(self.password)
+
+        emails = [self.email() for _ in range(members)]
+        with transaction.atomic():
+            self.users = create_users(emails, self.password_hash)
+        with historical_timestamps(), transaction.atomic():
+            self.family = generate_family(
+                self.rng, self.users[0], self.users[1:], expenses=expenses
+            )
+
+        self.admin = User.objects.select_related("family").get(pk=self.users[0].pk)
+        self.client = authenticated_client(self.admin)
+        self.category_id = (
+            Category.objects.filter(family=self.family, deleted_at__isnull=True)
+            .values_list("pk", flat=True)
+            .first()
+        )
+        self.tag_id = (
+            Tag.objects.filter(family=self.family, deleted_at__isnull=True)
+            .values_list("pk", flat=True)
+            .first()
+        )
+        self.expense_id = (
+            Expense.objects.filter(family=self.family, deleted_at__isnull=True)
+            .values_list("pk", flat=True)
+            .first()
+        )
+
+    def email(self):
+        return f"benchmark-{self.run}-{next(self.counter)}@example.com"
+
+    def cleanup(self):
+        # Deleting a user cascades to their family and everything in it.
+        User.objects.filter(email__startswith=f"benchmark-{self.run}-").delete()
+
+    def new_user(self):
+        (user,) = create_users([self.email()], self.password_hash)
+        return User.objects.select_related("family").get(pk=user.pk)
+
+    def new_member(self):
+        user = self.new_user()
+        user.family = self.family
+        user.save()
+        return user
+
+    def new_object(self, model, **data):
+        (instance,) = create_objects(model, self.family, [data])
+        return instance
+
+    def new_category(self):
+        return self.new_object(
+            Category,
+            title=f"Category {self.email()}",
+            color="ffffff",
+            icon="icon",
+            limit=100,
+        )
+
+    def new_tag(self):
+        return self.new_object(
+            Tag,
+            title=f"Tag {self.email()}",
+            color="ffffff",
+            category_id=self.category_id,
+        )
+
+    def new_expense(self):
+        return self.new_object(
+            Expense, category_id=self.category_id, tag_id=self.tag_id, amount=10
+        )
+
+    def category_body(self):
+        return {
+            "title": f"Category {self.email()}",
+            "color": "ffffff",
+            "icon": "icon",
+            "limit": "100.00",
+        }
+
+    def tag_body(self):
+        return {
+            "title": f"Tag {self.email()}",
+            "color": "ffffff",
+            "category": self.category_id,
+        }
+
+    def expense_body(self):
+        return {"category": self.category_id, "tag": self.tag_id, "amount": "12.34"}
+
+    def scenarios(self):
+        admin = self.client
+
+        def get(path):
+            return lambda: (admin, path, None)
+
+        def money(kind, pk, new, body):
+            return [
+                Scenario(f"{kind} list", "get", get(f"/api/money/{kind}/")),
+                Scenario(
+                    f"{kind} list fields",
+                    "get",
+                    get(f"/api/money/{kind}/?fields=id,updated_at&shape=columnar"),
+                ),
+                Scenario(
+                    f"{kind} stream",
+                    "get",
+                    get(f"/api/money/{kind}/?stream=ndjson"),
+                ),
+                Scenario(f"{kind} retrieve", "get", get(f"/api/money/{kind}/{pk}/")),
+                Scenario(
+                    f"{kind} create",
+                    "post",
+                    lambda: (admin, f"/api/money/{kind}/", body()),
+                    201,
+                ),
+                Scenario(
+                    f"{kind} update",
+                    "put",
+                    lambda: (admin, f"/api/money/{kind}/{new().pk}/", body()),
+                ),
+                Scenario(
+                    f"{kind} delete",
+                    "delete",
+                    lambda: (admin, f"/api/money/{kind}/{new().pk}/", None),
+                    204,
+                ),
+            ]
+
+        def invite_to_accept():
+            recipient = self.new_user()
+            invite = Invite.objects.create(sender=self.admin, recipient=recipient)
+            return (
+                authenticated_client(recipient),
+                f"/api/users/invites/{invite.pk}/",
+                {"status": "accept"},
+            )
+
+        def invite_to_delete():
+            invite = Invite.objects.create(sender=self.admin, recipient=self.new_user())
+            return admin, f"/api/users/invites/{invite.pk}/", None
+
+        def member_leaving():
+            member = self.new_member()
+            return (
+                authenticated_client(member),
+                f"/api/users/families/{self.family.pk}/leave/",
+                None,
+            )
+
+        def member_deleted():
+            member = self.new_member()
+            return (
+                admin,
+                f"/api/users/families/{self.family.pk}/delete/?member={member.email}",
+                None,
+            )
+
+        def batch():
+            expense = self.new_expense()
+            return (
+                admin,
+                "/api/money/batch/",
+                {
+                    "operations": [
+                        {
+                            "op": "create",
+                            "type": "category",
+                            "temp_id": "c",
+                            "data": self.category_body(),
+                        },
+                        {
+                            "op": "create",
+                            "type": "expense",
+                            "data": {"category": "c", "tag": None, "amount": "1.00"},
+                        },
+                        {
+                            "op": "update",
+                            "type": "expense",
+                            "id": str(expense.pk),
+                            "data": self.expense_body(),
+                        },
+                        {"op": "delete", "type": "expense", "id": str(expense.pk)},
+                    ]
+                },
+            )
+
+        def token():
+            user = self.new_user()
+            return (
+                api_client(),
+                "/api/users/token/",
+                {"email": user.email, "password": self.password},
+            )
+
+        def refresh_token():
+            return (
+                api_client(),
+                "/api/users/token/refresh",
+                {"refresh": str(RefreshToken.for_user(self.admin))},
+            )
+
+        def verify_token():
+            return (
+                api_client(),
+                "/api/users/token/verify/",
+                {"token": str(RefreshToken.for_user(self.admin).access_token)},
+            )
+
+        def me_update():
+            user = self.new_user()
+            return (
+                authenticated_client(user),
+                "/api/users/me/",
+                {"email": self.email(), "password": self.password},
+            )
+
+        return [
+            *money("category", self.category_id, self.new_category, self.category_body),
+            Scenario(
+                "category spending",
+                "get",
+                get("/api/money/category/spending/?start=2020-01-01&end=2030-01-01"),
+            ),
+            *money("tag", self.tag_id, self.new_tag, self.tag_body),
+            *money("expense", self.expense_id, self.new_expense, self.expense_body),
+            Scenario("sync", "get", get("/api/money/sync/?since=0")),
+            Scenario("snapshot", "get", get("/api/money/snapshot/")),
+            Scenario("batch", "post", batch),
+            Scenario(
+                "register",
+                "post",
+                lambda: (
+                    api_client(),
+                    "/api/users/register/",
+                    {"email": self.email(), "password": self.password},
+                ),
+                201,
+            ),
+            Scenario("token", "post", token),
+            Scenario("token refresh", "post", refresh_token),
+            Scenario("token verify", "post", verify_token),
+            Scenario("me", "get", get("/api/users/me/")),
+            Scenario("me update", "put", me_update),
+            Scenario("families list", "get", get("/api/users/families/")),
+            Scenario(
+                "families retrieve",
+                "get",
+                get(f"/api/users/families/{self.family.pk}/"),
+            ),
+            Scenario("families leave", "post", member_leaving),
+            Scenario("families delete member", "post", member_deleted),
+            Scenario("invites list", "get", get("/api/users/invites/")),
+            Scenario(
+                "invites create",
+                "post",
+                lambda: (
+                    admin,
+                    "/api/users/invites/",
+                    {"recipient": self.new_user().email},
+                ),
+                201,
+            ),
+            Scenario("invites accept", "put", invite_to_accept),
+            Scenario("invites delete", "delete", invite_to_delete, 204),
+        ]
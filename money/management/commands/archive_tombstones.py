@@ -0,0 +1,73 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from money.archival import archive_family
+from money.models import DeviceSyncState
+
+
+class Command(BaseCommand):
+    help = (
+        "Move soft-deleted expenses, tags and categories that every device of "
+        "their family has synced past into the tombstone table. Rows are moved in "
+        "small batches, each in its own short transaction. Families whose "
+        "clients do not send a device id to sync are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches.",
+        )
+        parser.add_argument(
+            "--device-ttl-days",
+            type=int,
+            default=90,
+            help="Devices that have not synced for this long no longer hold "
+            "archival back.",
+        )
+        parser.add_argument(
+            "--family",
+            type=int,
+            action="append",
+            help="Only archive this family; may be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        family_ids = options["family"] or (
+            DeviceSyncState.objects.order_by("family_id")
+            .values_list("family_id", flat=True)
+            .distinct()
+        )
+
+        start = time.perf_counter()
+        totals = {"expense": 0, "tag": 0, "category": 0}
+        for family_id in family_ids:
+            archived = archive_family(
+                family_id,
+                device_ttl=timedelta(days=options["device_ttl_days"]),
+                batch_size=options["batch_size"],
+                pause=options["pause"],
+            )
+            if archived is None:
+                self.stdout.write(f"Family {family_id}: no devices, skipped.")
+                continue
+            if any(archived.values()):
+                self.stdout.write(
+                    f"Family {family_id}: "
+                    + ", ".join(f"{count} {kind}" for kind, count in archived.items())
+                )
+            for kind, count in archived.items():
+                totals[kind] += count
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Archived "
+                + ", ".join(f"{count} {kind} rows" for kind, count in totals.items())
+                + f" in {time.perf_counter() - start:.1f}s."
+            )
+        )
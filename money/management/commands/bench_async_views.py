@@ -0,0 +1,149 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import include, path
+from rest_framework.routers import SimpleRouter
+from rest_framework_simplejwt.tokens import AccessToken
+
+from money.management.seed import seed_family
+from money.views import ExpenseViewSet
+from users.models import User
+
+PATH = "/api/money/expense/?page_size=100"
+
+
+def expense_urlconf(async_reads):
+    """A URLconf routing `PATH` to the expense viewset built for `async_reads`."""
+    router = SimpleRouter()
+    router.register("expense", ExpenseViewSet, basename="expense")
+    urlconf = ModuleType(f"expense_urlconf_{async_reads}")
+    with override_settings(ASYNC_READ_VIEWS=async_reads):
+        urlconf.urlpatterns = [path("api/money/", include((router.urls, "money")))]
+    return urlconf
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput and latency of the expense list as a sync view served "
+        "by a fixed pool of threads (as under a threaded WSGI server) with the "
+        "same list as an async view served on one event loop (as under ASGI with "
+        "ASYNC_READ_VIEWS), at several numbers of concurrent clients. Runs in "
+        "process through the test clients and the whole middleware stack with the "
+        "response cache disabled; the seeded family is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            default="50,200,1000",
+            help="Comma separated numbers of concurrent clients.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2000,
+            help="Requests per run; raised to the concurrency when lower.",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=32,
+            help="Worker threads of the simulated WSGI server.",
+        )
+        parser.add_argument(
+            "--expenses",
+            type=int,
+            default=1000,
+            help="Expenses of the seeded family; one page of 100 is requested.",
+        )
+
+    @override_settings(
+        RESPONSE_CACHE={
+            "BACKEND": "fire_fruit_money.cache.LRUResponseCache",
+            "OPTIONS": {"max_bytes": 0},
+        }
+    )
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            family, _ = seed_family(options["expenses"])
+        user = User.objects.get(family=family)
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+        self.stdout.write(
+            f"{'clients':>8} {'server':>6} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+            f"{'errors':>7}"
+        )
+        try:
+            for concurrency in map(int, options["concurrency"].split(",")):
+                total = max(options["requests"], concurrency)
+                for name, async_reads, run in (
+                    ("wsgi", False, self.run_threads),
+                    ("asgi", True, self.run_async),
+                ):
+                    with override_settings(ROOT_URLCONF=expense_urlconf(async_reads)):
+                        elapsed, latencies = run(
+                            concurrency, total, headers, options["threads"]
+                        )
+                    self.report(concurrency, name, total, elapsed, latencies)
+        finally:
+            # Cascades to the family and everything in it.
+            user.delete()
+
+    def run_threads(self, concurrency, total, headers, threads):
+        local = threading.local()
+        slots = threading.BoundedSemaphore(concurrency)
+        latencies = []
+
+        def request(started):
+            try:
+                if not hasattr(local, "client"):
+                    local.client = Client(headers=headers)
+                assert local.client.get(PATH).status_code == 200
+                latencies.append(time.perf_counter() - started)
+            finally:
+                slots.release()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(threads, concurrency)) as pool:
+            for _ in range(total):
+                slots.acquire()
+                pool.submit(request, time.perf_counter())
+        return time.perf_counter() - start, latencies
+
+    def run_async(self, concurrency, total, headers, threads):
+        latencies = []
+
+        async def main():
+            client = AsyncClient()
+            slots = asyncio.Semaphore(concurrency)
+
+            async def request():
+                async with slots:
+                    started = time.perf_counter()
+                    response = await client.get(PATH, headers=headers)
+                    assert response.status_code == 200
+                    latencies.append(time.perf_counter() - started)
+
+            await asyncio.gather(
+                *(request() for _ in range(total)), return_exceptions=True
+            )
+
+        start = time.perf_counter()
+        asyncio.run(main())
+        return time.perf_counter() - start, latencies
+
+    def report(self, concurrency, name, total, elapsed, latencies):
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{concurrency:>8} {name:>6} {len(latencies) / elapsed:>9.1f} "
+            f"{percentiles[49] * 1000:>8.1f} {percentiles[98] * 1000:>8.1f} "
+            f"{total - len(latencies):>7}"
+        )
@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from money.management.seed import seed_family
+from money.services import delete_category
+
+
+def row_by_row_cascade(category):
+    """The per-row cascade the category viewset used before, kept for comparison."""
+    for expense in category.expenses.all():
+        expense.deleted_at = timezone.now()
+        expense.save()
+
+    for tag in category.tags.all():
+        tag.deleted_at = timezone.now()
+        tag.save()
+
+    category.deleted_at = timezone.now()
+    category.save()
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the category soft-delete cascade at several sizes. "
+        "All rows are created and removed inside a rolled back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="100,1000,10000",
+            help="Comma separated numbers of expenses in the deleted category.",
+        )
+        parser.add_argument(
+            "--tags",
+            type=int,
+            default=10,
+            help="Number of tags in the deleted category.",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        strategies = (
+            ("set-based", delete_category),
+            ("row-by-row", row_by_row_cascade),
+        )
+
+        self.stdout.write(
+            f"{'expenses':>10} {'strategy':>12} {'seconds':>10} {'queries':>8}"
+        )
+        for size in sizes:
+            for name, cascade in strategies:
+                seconds, queries = self.measure(size, options["tags"], cascade)
+                self.stdout.write(
+                    f"{size:>10} {name:>12} {seconds:>10.3f} {queries:>8}"
+                )
+
+    def measure(self, size, tag_count, cascade):
+        with transaction.atomic():
+            _, (category,) = seed_family(size, tags=tag_count)
+
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                cascade(category)
+                seconds = time.perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        return seconds, len(queries)
@@ -0,0 +1,107 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from money.management.seed import seed_family
+from money.models import Expense
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare expense creates inserted one transaction per request with "
+        "creates coalesced into batches: concurrent clients post expenses of one "
+        "family through the test client, with and without "
+        "EXPENSE_WRITE_COALESCING. The seeded family is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            default="1,8,32",
+            help="Comma separated numbers of concurrent clients.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Expenses posted per run.",
+        )
+        parser.add_argument("--window-ms", type=int, default=5)
+        parser.add_argument("--max-batch", type=int, default=100)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            family, categories = seed_family(0)
+        user = User.objects.get(family=family)
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        body = {"category": categories[0].pk, "tag": None, "amount": "12.34"}
+
+        self.stdout.write(
+            f"{'clients':>8} {'mode':>10} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+            f"{'errors':>7}"
+        )
+        try:
+            for concurrency in map(int, options["concurrency"].split(",")):
+                for mode, config in (
+                    ("per-request", None),
+                    (
+                        "coalesced",
+                        {
+                            "window_ms": options["window_ms"],
+                            "max_batch": options["max_batch"],
+                        },
+                    ),
+                ):
+                    before = Expense.objects.filter(family=family).count()
+                    with override_settings(EXPENSE_WRITE_COALESCING=config):
+                        elapsed, latencies = self.run(
+                            concurrency, options["requests"], headers, body
+                        )
+                    created = Expense.objects.filter(family=family).count() - before
+                    if created != len(latencies):
+                        raise CommandError(
+                            f"{len(latencies)} creates succeeded but {created} "
+                            "expenses were inserted."
+                        )
+                    self.report(
+                        concurrency, mode, options["requests"], elapsed, latencies
+                    )
+        finally:
+            # Cascades to the family and everything in it.
+            user.delete()
+
+    def run(self, concurrency, total, headers, body):
+        local = threading.local()
+        latencies = []
+
+        def create():
+            if not hasattr(local, "client"):
+                local.client = Client(headers=headers)
+            start = time.perf_counter()
+            response = local.client.post(
+                "/api/money/expense/", body, content_type="application/json"
+            )
+            if response.status_code == 201:
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(total):
+                pool.submit(create)
+        return time.perf_counter() - start, latencies
+
+    def report(self, concurrency, mode, total, elapsed, latencies):
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"{concurrency:>8} {mode:>10} {len(latencies) / elapsed:>9.1f} "
+            f"{percentiles[49] * 1000:>8.1f} {percentiles[98] * 1000:>8.1f} "
+            f"{total - len(latencies):>7}"
+        )
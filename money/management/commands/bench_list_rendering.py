@@ -0,0 +1,104 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from money.fastpath import CATEGORY_LIST, TAG_LIST, EXPENSE_LIST
+from money.management.seed import seed_family
+from money.models import Category, Tag, Expense
+from money.pagination import KeysetPagination
+from money.serializers import (
+    CategoryListSerializer,
+    TagListSerializer,
+    ExpenseListSerializer,
+)
+
+LISTS = (
+    ("categories", Category, ("family__admin",), CategoryListSerializer, CATEGORY_LIST),
+    ("tags", Tag, ("family__admin", "category"), TagListSerializer, TAG_LIST),
+    (
+        "expenses",
+        Expense,
+        ("family__admin", "category", "tag"),
+        ExpenseListSerializer,
+        EXPENSE_LIST,
+    ),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the serializer-free list fast path renders byte-identical "
+        "JSON to the list serializers, then compare how long each takes to build "
+        "and render a page. Data is seeded inside a rolled back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--expenses",
+            type=int,
+            default=5000,
+            help="Number of expenses to seed; every 7th is soft-deleted.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Runs per renderer; the best time is reported.",
+        )
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+
+        self.stdout.write(
+            f"{'list':>10} {'rows':>7} {'serializer s':>13} {'fast path s':>12} "
+            f"{'speedup':>8}"
+        )
+        with transaction.atomic():
+            family, _ = seed_family(
+                options["expenses"], categories=20, tags=50, deleted_every=7
+            )
+
+            for name, model, related, serializer_class, fast_list in LISTS:
+                queryset = (
+                    model.objects.select_related(*related)
+                    .filter(family=family)
+                    .order_by(*KeysetPagination.ordering)
+                )
+
+                def serialized():
+                    data = serializer_class(queryset.all(), many=True).data
+                    return renderer.render(data)
+
+                def fast():
+                    format_row = fast_list.row_formatter()
+                    rows = fast_list.values(queryset.all())
+                    return renderer.render([format_row(row) for row in rows])
+
+                expected, actual = serialized(), fast()
+                if expected != actual:
+                    raise CommandError(
+                        f"The fast path renders {name} differently from "
+                        f"{serializer_class.__name__}."
+                    )
+
+                slow_time = self.best_of(serialized, options["repeat"])
+                fast_time = self.best_of(fast, options["repeat"])
+                self.stdout.write(
+                    f"{name:>10} {queryset.count():>7} {slow_time:>13.3f} "
+                    f"{fast_time:>12.3f} {slow_time / fast_time:>7.1f}x"
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Fast path output matches."))
+
+    def best_of(self, render, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,237 @@
+import random
+import re
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from money.partitioning import (
+    INTERVALS,
+    partition_bounds,
+    partition_name,
+    partition_starts,
+    table_name,
+)
+
+PLAIN = "bench_expense_plain"
+PARTITIONED = "bench_expense_partitioned"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the expense table unpartitioned and range partitioned by "
+        "date_time: latency of recent-window queries and the cost of vacuum after "
+        "updates to recent rows. Builds two standalone copies of the expense "
+        "table's columns filled with generate_series and drops them afterwards; "
+        "the money tables are not touched. PostgreSQL only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000_000)
+        parser.add_argument("--families", type=int, default=2000)
+        parser.add_argument(
+            "--years", type=int, default=5, help="Years of history the rows span."
+        )
+        parser.add_argument(
+            "--interval",
+            choices=INTERVALS,
+            default="year",
+            help="Partition interval; EXPENSE_PARTITIONING only accepts year.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=50, help="Runs of every query per table."
+        )
+        parser.add_argument(
+            "--churn",
+            type=float,
+            default=0.2,
+            help="Share of the last 30 days' rows updated before vacuuming.",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the tables for inspection."
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning can only be benchmarked on PostgreSQL.")
+        if not 0 < options["churn"] <= 1:
+            raise CommandError("--churn must be above 0 and at most 1.")
+
+        self.now = timezone.now()
+        self.first = self.now - timedelta(days=365 * options["years"])
+        try:
+            with connection.cursor() as cursor:
+                self.build(cursor, options)
+                self.compare_queries(cursor, options)
+                self.compare_vacuum(cursor, options)
+        finally:
+            if not options["keep"]:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {PLAIN}, {PARTITIONED}")
+
+    def timed(self, cursor, sql, params=None):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        return time.perf_counter() - start
+
+    def build(self, cursor, options):
+        interval = options["interval"]
+        cursor.execute(f"DROP TABLE IF EXISTS {PLAIN}, {PARTITIONED}")
+        cursor.execute(f"CREATE TABLE {PLAIN} (LIKE {table_name()})")
+        cursor.execute(
+            f"CREATE TABLE {PARTITIONED} (LIKE {table_name()}) "
+            f"PARTITION BY RANGE (date_time)"
+        )
+        starts = list(partition_starts(self.first, self.now, interval))
+        for start in starts:
+            cursor.execute(
+                f"CREATE TABLE {partition_name(start, interval, PARTITIONED)} "
+                f"PARTITION OF {PARTITIONED} {partition_bounds(start, interval)}"
+            )
+        cursor.execute(
+            f"CREATE TABLE {PARTITIONED}_default PARTITION OF {PARTITIONED} DEFAULT"
+        )
+
+        # Rows are spread evenly over the history in insertion order, as
+        # appended by clients; every 20th is soft-deleted.
+        elapsed = self.timed(
+            cursor,
+            f"INSERT INTO {PLAIN} (id, family_id, category_id, tag_id, amount, "
+            f"date_time, created_at, updated_at, deleted_at) "
+            f"SELECT n, 1 + n %% %s, 1 + n %% (%s * 10), NULL, (n %% 10000) / 100.0, "
+            f"moment, moment, moment, CASE WHEN n %% 20 = 0 THEN moment END "
+            f"FROM (SELECT n, %s + (%s - %s) * (n::float8 / %s) AS moment "
+            f"FROM generate_series(1, %s) AS n) AS series",
+            [
+                options["families"],
+                options["families"],
+                self.first,
+                self.now,
+                self.first,
+                options["rows"],
+                options["rows"],
+            ],
+        )
+        self.stdout.write(f"Inserted {options['rows']} rows in {elapsed:.1f}s.")
+        elapsed = self.timed(cursor, f"INSERT INTO {PARTITIONED} SELECT * FROM {PLAIN}")
+        self.stdout.write(
+            f"Copied them into {len(starts)} partitions in {elapsed:.1f}s."
+        )
+
+        # The indexes of the expense table; the partitioned primary key has to
+        # include the partition key.
+        for table, key in ((PLAIN, "id"), (PARTITIONED, "id, date_time")):
+            start = time.perf_counter()
+            cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({key})")
+            cursor.execute(f"CREATE INDEX ON {table} (family_id, updated_at, id)")
+            cursor.execute(
+                f"CREATE INDEX ON {table} (family_id, date_time) "
+                f"INCLUDE (category_id, tag_id, amount) WHERE deleted_at IS NULL"
+            )
+            cursor.execute(f"VACUUM ANALYZE {table}")
+            self.stdout.write(
+                f"Indexed and vacuumed {table} in {time.perf_counter() - start:.1f}s, "
+                f"{self.size(cursor, table) / 2**20:.0f} MiB."
+            )
+
+    def size(self, cursor, table):
+        cursor.execute(
+            "SELECT coalesce(sum(pg_total_relation_size(inhrelid)), "
+            "pg_total_relation_size(%s::regclass)) "
+            "FROM pg_inherits WHERE inhparent = %s::regclass",
+            [table, table],
+        )
+        return cursor.fetchone()[0]
+
+    def queries(self):
+        week = self.now - timedelta(days=7)
+        month = self.now - timedelta(days=30)
+        return (
+            (
+                "family spending, last 30 days",
+                "SELECT category_id, sum(amount) FROM {table} "
+                "WHERE family_id = %s AND deleted_at IS NULL "
+                "AND date_time >= %s AND date_time < %s GROUP BY category_id",
+                lambda family: [family, month, self.now],
+            ),
+            (
+                "family expenses, last 7 days",
+                "SELECT id, category_id, amount, date_time FROM {table} "
+                "WHERE family_id = %s AND date_time >= %s ORDER BY date_time DESC",
+                lambda family: [family, week],
+            ),
+            (
+                "all families, last 7 days",
+                "SELECT count(*), sum(amount) FROM {table} WHERE date_time >= %s",
+                lambda family: [week],
+            ),
+            # No bound on date_time: every partition is probed.
+            (
+                "family sync page, unbounded",
+                "SELECT id FROM {table} WHERE family_id = %s "
+                "ORDER BY updated_at DESC, id DESC LIMIT 100",
+                lambda family: [family],
+            ),
+        )
+
+    def compare_queries(self, cursor, options):
+        self.stdout.write(
+            f"\n{'query':<30} {'table':>12} {'scanned':>8} {'p50 ms':>9} {'p95 ms':>9}"
+        )
+        families = [
+            random.randint(1, options["families"]) for _ in range(options["repeat"])
+        ]
+        for name, sql, params in self.queries():
+            for label, table in (("plain", PLAIN), ("partitioned", PARTITIONED)):
+                query = sql.format(table=table)
+                cursor.execute(f"EXPLAIN {query}", params(families[0]))
+                # Bitmap index scans name the index, not the table.
+                plan = "\n".join(
+                    line
+                    for (line,) in cursor.fetchall()
+                    if "Bitmap Index Scan" not in line
+                )
+                scanned = len(set(re.findall(rf" on ({table}\w*)", plan)))
+
+                latencies = []
+                for family in families:
+                    start = time.perf_counter()
+                    cursor.execute(query, params(family))
+                    cursor.fetchall()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                latencies.sort()
+                self.stdout.write(
+                    f"{name:<30} {label:>12} {scanned:>8} "
+                    f"{statistics.median(latencies):>9.2f} "
+                    f"{latencies[int(len(latencies) * 0.95)]:>9.2f}"
+                )
+
+    def compare_vacuum(self, cursor, options):
+        since = self.now - timedelta(days=30)
+        modulo = round(1 / options["churn"])
+        self.stdout.write(
+            f"\n{'vacuum':<30} {'table':>12} {'updated':>8} {'seconds':>9}"
+        )
+        for label, table in (("plain", PLAIN), ("partitioned", PARTITIONED)):
+            cursor.execute(
+                f"UPDATE {table} SET amount = amount + 1, updated_at = now() "
+                f"WHERE date_time >= %s AND id %% %s = 0",
+                [since, modulo],
+            )
+            updated = cursor.rowcount
+
+            # Autovacuum works on each partition on its own, so only the
+            # partitions holding the updated rows are vacuumed.
+            targets = [table]
+            if table == PARTITIONED:
+                targets = [
+                    partition_name(start, options["interval"], PARTITIONED)
+                    for start in partition_starts(since, self.now, options["interval"])
+                ]
+            elapsed = self.timed(cursor, f"VACUUM {', '.join(targets)}")
+            self.stdout.write(
+                f"{'after recent updates':<30} {label:>12} {updated:>8} {elapsed:>9.2f}"
+            )
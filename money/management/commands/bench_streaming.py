@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from money.management.seed import seed_family
+from money.models import Expense
+from money.pagination import KeysetPagination
+from money.serializers import ExpenseListSerializer
+from money.streaming import iter_chunks, serialized_rows
+
+
+class PeakRSS:
+    """Sample the resident set size in a background thread and keep the peak."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def read(self):
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * self.page_size
+
+    def sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.read())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.baseline = self.peak = self.read()
+        self._thread = threading.Thread(target=self.sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.read())
+
+    @property
+    def growth(self):
+        return self.peak - self.baseline
+
+
+def buffered(queryset):
+    """Serialize the whole list, then render it: the non-streaming path."""
+    data = ExpenseListSerializer(queryset, many=True).data
+    yield JSONRenderer().render(data)
+
+
+def streamed(stream_format):
+    def render(queryset):
+        return iter_chunks(
+            serialized_rows(ExpenseListSerializer(), queryset), stream_format
+        )
+
+    return render
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare peak RSS growth, time to first byte and total time of the "
+        "buffered and streaming expense list renderers. Data is seeded inside a "
+        "rolled back transaction. Linux only (reads /proc/self/statm)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,100000,1000000",
+            help="Comma separated numbers of expenses.",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        renderers = (
+            ("buffered", buffered),
+            ("json", streamed("json")),
+            ("ndjson", streamed("ndjson")),
+        )
+
+        self.stdout.write(
+            f"{'expenses':>10} {'renderer':>9} {'ttfb s':>8} {'total s':>8} "
+            f"{'peak RSS MB':>12} {'bytes':>12}"
+        )
+        for size in sizes:
+            with transaction.atomic():
+                family, _ = seed_family(size, categories=10, tags=30)
+                queryset = (
+                    Expense.objects.select_related("family__admin", "category", "tag")
+                    .filter(family=family)
+                    .order_by(*KeysetPagination.ordering)
+                )
+
+                for name, render in renderers:
+                    ttfb, total, rss, length = self.measure(render, queryset)
+                    self.stdout.write(
+                        f"{size:>10} {name:>9} {ttfb:>8.3f} {total:>8.3f} "
+                        f"{rss / 2**20:>12.1f} {length:>12}"
+                    )
+
+                transaction.set_rollback(True)
+
+    def measure(self, render, queryset):
+        length = 0
+        ttfb = None
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            for chunk in render(queryset.all()):
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                length += len(chunk)
+            total = time.perf_counter() - start
+        return ttfb, total, rss.growth, length
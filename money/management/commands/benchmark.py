@@ -0,0 +1,165 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from money.management.benchmark import Workload
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every money and users endpoint through the test client against a "
+        "generated family and report latency percentiles, queries and allocated "
+        "memory per request. Results can be saved and compared with a saved "
+        "baseline; the comparison fails on regressions. Generated data is deleted "
+        "afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--expenses", type=int, default=10000)
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument(
+            "--memory-iterations",
+            type=int,
+            default=3,
+            help="Extra requests per scenario traced with tracemalloc, which "
+            "slows them down, so they are not timed.",
+        )
+        parser.add_argument(
+            "--only", help="Run the scenarios whose name contains this text."
+        )
+        parser.add_argument(
+            "--response-cache",
+            action="store_true",
+            help="Keep the response cache on; repeated GETs then measure hits.",
+        )
+        parser.add_argument("--save", help="Write the results to this JSON file.")
+        parser.add_argument("--compare", help="Compare with results saved earlier.")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed relative p50 latency and memory growth when comparing.",
+        )
+
+    def handle(self, *args, **options):
+        settings_override = override_settings()
+        if not options["response_cache"]:
+            settings_override = override_settings(
+                RESPONSE_CACHE={
+                    "BACKEND": "fire_fruit_money.cache.LRUResponseCache",
+                    "OPTIONS": {"max_bytes": 0},
+                }
+            )
+
+        with settings_override:
+            workload = Workload(options["expenses"])
+            try:
+                results = self.run(workload, options)
+            finally:
+                workload.cleanup()
+
+        self.report(results)
+        if options["save"]:
+            with open(options["save"], "w") as output:
+                json.dump(
+                    {"expenses": options["expenses"], "results": results},
+                    output,
+                    indent=2,
+                )
+        if options["compare"]:
+            self.compare(results, options["compare"], options["tolerance"])
+
+    def run(self, workload, options):
+        results = {}
+        for scenario in workload.scenarios():
+            if options["only"] and options["only"] not in scenario.name:
+                continue
+
+            latencies, queries, failures = [], [], 0
+            for iteration in range(options["warmup"] + options["iterations"]):
+                client, path, data = scenario.prepare()
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = self.send(client, scenario.method, path, data)
+                    elapsed = time.perf_counter() - start
+
+                if response.status_code != scenario.expected_status:
+                    failures += 1
+                if iteration >= options["warmup"]:
+                    latencies.append(elapsed)
+                    queries.append(len(captured))
+
+            allocated = []
+            for _ in range(options["memory_iterations"]):
+                client, path, data = scenario.prepare()
+                tracemalloc.start()
+                self.send(client, scenario.method, path, data)
+                allocated.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+
+            percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+            results[scenario.name] = {
+                "p50_ms": percentiles[49] * 1000,
+                "p90_ms": percentiles[89] * 1000,
+                "p99_ms": percentiles[98] * 1000,
+                "queries": max(queries),
+                "peak_kb": max(allocated, default=0) / 1024,
+                "failures": failures,
+            }
+        return results
+
+    def send(self, client, method, path, data):
+        response = getattr(client, method)(path, data, format="json")
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'scenario':<28} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>7} {'peak KB':>9} {'failed':>6}"
+        )
+        for name, result in results.items():
+            line = (
+                f"{name:<28} {result['p50_ms']:>8.2f} {result['p90_ms']:>8.2f} "
+                f"{result['p99_ms']:>8.2f} {result['queries']:>7} "
+                f"{result['peak_kb']:>9.1f} {result['failures']:>6}"
+            )
+            self.stdout.write(self.style.ERROR(line) if result["failures"] else line)
+
+    def compare(self, results, path, tolerance):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result["p50_ms"] > before["p50_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms"
+                )
+            if result["queries"] > before["queries"]:
+                regressions.append(
+                    f"{name}: queries {before['queries']} -> {result['queries']}"
+                )
+            if result["peak_kb"] > before["peak_kb"] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: peak {before['peak_kb']:.1f} -> {result['peak_kb']:.1f} KB"
+                )
+            if result["failures"] > before["failures"]:
+                regressions.append(
+                    f"{name}: failures {before['failures']} -> {result['failures']}"
+                )
+
+        if regressions:
+            raise CommandError("Regressions:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {path}."))
@@ -0,0 +1,101 @@
+import random
+import time
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from money.management.seed import create_users, generate_family, historical_timestamps
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate families with members, categories, tags and expenses spread over "
+        "past years, soft-deleted rows included, using bulk inserts. Every "
+        "generated user has the same password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--families", type=int, default=10)
+        parser.add_argument(
+            "--members",
+            type=int,
+            default=3,
+            help="Maximum members per family including the admin; each family "
+            "gets between 1 and this many.",
+        )
+        parser.add_argument("--categories", type=int, default=10)
+        parser.add_argument("--tags", type=int, default=30)
+        parser.add_argument(
+            "--expenses",
+            type=int,
+            default=100000,
+            help="Expenses per family.",
+        )
+        parser.add_argument("--years", type=int, default=3)
+        parser.add_argument(
+            "--deleted-ratio",
+            type=float,
+            default=0.05,
+            help="Share of soft-deleted categories, tags and expenses.",
+        )
+        parser.add_argument("--password", default="password")
+        parser.add_argument(
+            "--prefix",
+            default="generated",
+            help="Emails are <prefix>-<run>-<family>-<member>@example.com.",
+        )
+        parser.add_argument("--seed", type=int, help="Random seed.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        run = uuid.UUID(int=rng.getrandbits(128)).hex[:8]
+        password_hash = make_password(options["password"])
+
+        family_sizes = [
+            rng.randint(1, max(options["members"], 1))
+            for _ in range(options["families"])
+        ]
+        emails = [
+            f"{options['prefix']}-{run}-{family}-{member}@example.com"
+            for family, size in enumerate(family_sizes)
+            for member in range(size)
+        ]
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = create_users(emails, password_hash)
+        self.stdout.write(
+            f"Created {len(users)} users in {time.perf_counter() - start:.1f}s."
+        )
+
+        offset = 0
+        with historical_timestamps():
+            for index, size in enumerate(family_sizes):
+                admin, members = users[offset], users[offset + 1 : offset + size]
+                offset += size
+
+                family_start = time.perf_counter()
+                with transaction.atomic():
+                    generate_family(
+                        rng,
+                        admin,
+                        members,
+                        categories=options["categories"],
+                        tags=options["tags"],
+                        expenses=options["expenses"],
+                        years=options["years"],
+                        deleted_ratio=options["deleted_ratio"],
+                    )
+                self.stdout.write(
+                    f"Family {index + 1}/{len(family_sizes)} ({admin.email}, "
+                    f"{size} members) in {time.perf_counter() - family_start:.1f}s."
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {len(family_sizes)} families in "
+                f"{time.perf_counter() - start:.1f}s. Password: {options['password']!r}."
+            )
+        )
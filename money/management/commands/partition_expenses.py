@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from money.partitioning import create_future_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the expense partitions for the coming years; run it regularly, "
+        "e.g. daily from cron. The table itself is converted by the money 0005 "
+        "migration when EXPENSE_PARTITIONING is set. PostgreSQL only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=3,
+            help="Years to keep partitions created ahead for.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Expenses can only be partitioned on PostgreSQL.")
+
+        try:
+            created = create_future_partitions(options["ahead"])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        for name in created:
+            self.stdout.write(f"Created {name}.")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions created."))
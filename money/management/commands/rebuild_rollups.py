@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from money.rollups import diff_rollups, rebuild_rollups
+from users.models import Family
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the expense rollups from scratch, one family per transaction, "
+        "and verify them against a full recomputation."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--family",
+            type=int,
+            action="append",
+            dest="families",
+            help="Only process this family. May be given several times.",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only verify the stored rollups, do not rebuild them.",
+        )
+
+    def handle(self, *args, **options):
+        families = Family.objects.order_by("pk").values_list("pk", flat=True)
+        if options["families"]:
+            families = families.filter(pk__in=options["families"])
+
+        mismatched = 0
+        for family_id in families.iterator():
+            if not options["check"]:
+                rebuild_rollups(family_id)
+
+            diff = diff_rollups(family_id)
+            if diff:
+                mismatched += 1
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"Family {family_id}: {len(diff)} bucket(s) differ"
+                    )
+                )
+                for (_, category, tag, month), (stored, expected) in diff.items():
+                    self.stdout.write(
+                        f"  category={category} tag={tag} month={month:%Y-%m} "
+                        f"stored={stored} expected={expected}"
+                    )
+
+        if mismatched:
+            raise CommandError(f"Rollups differ for {mismatched} family(ies).")
+
+        self.stdout.write(self.style.SUCCESS("Rollups match a full recomputation."))
@@ -0,0 +1,270 @@
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from money.models import Category, Tag, Expense, ChangeLog
+from money.rollups import rebuild_rollups
+from users.authentication import invalidate_cached_users
+from users.models import Family, User
+from users.provisioning import provision_users
+
+
+def seed_family(expenses, categories=1, tags=10, deleted_every=0):
+    """
+    Create a throwaway family with `expenses` expenses spread over its
+    categories and tags.
+
+    Every `deleted_every`-th expense is soft-deleted, every row gets its change
+    log entry and the rollups are built. Must run inside a transaction.
+
+    Returns the family and its categories.
+    """
+    user = User.objects.create_user(f"bench-{uuid.uuid4().hex}@example.com")
+    family = User.objects.select_related("family").get(pk=user.pk).family
+    now = timezone.now()
+
+    created_categories = Category.objects.bulk_create(
+        Category(
+            family=family, title=f"bench-{i}", color="ffffff", icon="bench", limit=1000
+        )
+        for i in range(categories)
+    )
+    created_tags = Tag.objects.bulk_create(
+        Tag(
+            family=family,
+            title=f"bench-{i}",
+            color="ffffff",
+            category=created_categories[i % categories],
+        )
+        for i in range(tags)
+    )
+    created_expenses = Expense.objects.bulk_create(
+        (
+            Expense(
+                family=family,
+                category=created_categories[i % categories],
+                tag=created_tags[i % tags] if tags else None,
+                amount=i % 100,
+                deleted_at=now if deleted_every and i % deleted_every == 0 else None,
+            )
+            for i in range(expenses)
+        ),
+        batch_size=5000,
+    )
+
+    for kind, objects in (
+        ("category", created_categories),
+        ("tag", created_tags),
+        ("expense", created_expenses),
+    ):
+        ChangeLog.record(family.pk, kind, "create", (obj.pk for obj in objects))
+    rebuild_rollups(family.pk)
+
+    return family, created_categories
+
+
+@contextmanager
+def historical_timestamps():
+    """
+    Let bulk inserts keep the `auto_now` / `auto_now_add` values they are given.
+
+    Generated expenses are spread over past years, which those fields would
+    otherwise overwrite with the current time.
+    """
+    fields = [
+        field
+        for model in (Category, Tag, Expense)
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+EXPENSE_FIELDS = (
+    "id",
+    "family",
+    "category",
+    "tag",
+    "amount",
+    "date_time",
+    "created_at",
+    "updated_at",
+    "deleted_at",
+)
+CHANGELOG_FIELDS = ("family", "seq", "kind", "object_id", "action", "created_at")
+
+
+def reserve_ids(model, count):
+    """Allocate `count` primary keys of `model` for rows inserted with explicit ids."""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                "FROM generate_series(1, %s)",
+                [model._meta.db_table, count],
+            )
+            return [pk for (pk,) in cursor.fetchall()]
+
+    # Elsewhere the enclosing transaction holds the database's write lock.
+    last = model.objects.aggregate(last=Max("id"))["last"] or 0
+    return list(range(last + 1, last + 1 + count))
+
+
+def insert_rows(model, fields, rows):
+    """
+    Insert tuples of values for `fields` into the table of `model`.
+
+    PostgreSQL gets them through `COPY`, which skips the per-object work of
+    `bulk_create`; other databases fall back to `bulk_create`.
+    """
+    fields = [model._meta.get_field(name) for name in fields]
+    if connection.vendor == "postgresql":
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+        table = connection.ops.quote_name(model._meta.db_table)
+        with connection.cursor() as cursor:
+            with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+        return
+
+    attnames = [field.attname for field in fields]
+    model.objects.bulk_create(
+        (model(**dict(zip(attnames, row))) for row in rows), batch_size=5000
+    )
+
+
+def create_users(emails, password_hash):
+    """
+    Bulk-create users, each with the personal family signup would give them.
+
+    `password_hash` is shared, so no password is hashed per user.
+    """
+    return provision_users(
+        {"email": email, "password_hash": password_hash} for email in emails
+    )
+
+
+def generate_family(
+    rng,
+    admin,
+    members=(),
+    categories=10,
+    tags=30,
+    expenses=10000,
+    years=3,
+    deleted_ratio=0.05,
+    chunk_size=50000,
+):
+    """
+    Fill the family of `admin` with categories, tags and expenses.
+
+    `members` join the family. Expenses are spread uniformly over the last
+    `years` years; about `deleted_ratio` of every kind of row is soft-deleted
+    some time after it was created. Every row gets its change log entry and the
+    rollups are rebuilt. Must run inside a transaction and `historical_timestamps()`.
+    """
+    family = admin.family
+    now = timezone.now()
+    start = now - timedelta(days=365 * years)
+    span = (now - start).total_seconds()
+
+    def moment():
+        return start + timedelta(seconds=rng.random() * span)
+
+    def deleted_after(created):
+        if rng.random() >= deleted_ratio:
+            return None, created
+        deleted_at = created + (now - created) * rng.random()
+        return deleted_at, deleted_at
+
+    if members:
+        for member in members:
+            member.family = family
+        User.objects.bulk_update(members, ["family"], batch_size=5000)
+        invalidate_cached_users(*(member.pk for member in members))
+
+    def build_category(i):
+        created = moment()
+        deleted_at, updated_at = deleted_after(created)
+        return Category(
+            family=family,
+            title=f"Category {i}",
+            color=f"{rng.randrange(0x1000000):06x}",
+            icon=f"icon-{i % 20}",
+            limit=rng.randrange(100, 5000),
+            created_at=created,
+            updated_at=updated_at,
+            deleted_at=deleted_at,
+        )
+
+    created_categories = Category.objects.bulk_create(
+        build_category(i) for i in range(categories)
+    )
+
+    def build_tag(i):
+        created = moment()
+        deleted_at, updated_at = deleted_after(created)
+        return Tag(
+            family=family,
+            title=f"Tag {i}",
+            color=f"{rng.randrange(0x1000000):06x}",
+            category=rng.choice(created_categories),
+            created_at=created,
+            updated_at=updated_at,
+            deleted_at=deleted_at,
+        )
+
+    created_tags = Tag.objects.bulk_create(build_tag(i) for i in range(tags))
+    ChangeLog.record(
+        family.pk, "category", "create", (c.pk for c in created_categories)
+    )
+    ChangeLog.record(family.pk, "tag", "create", (t.pk for t in created_tags))
+
+    category_ids = [category.pk for category in created_categories]
+    tag_ids = [tag.pk for tag in created_tags]
+
+    def expense_row(pk):
+        date_time = moment()
+        deleted_at, updated_at = deleted_after(date_time)
+        tag_id = rng.choice(tag_ids) if tag_ids and rng.random() < 0.7 else None
+        amount = Decimal(rng.randrange(50, 50000)) / 100
+        return (
+            pk,
+            family.pk,
+            rng.choice(category_ids),
+            tag_id,
+            amount,
+            date_time,
+            date_time,
+            updated_at,
+            deleted_at,
+        )
+
+    for offset in range(0, expenses, chunk_size):
+        ids = reserve_ids(Expense, min(chunk_size, expenses - offset))
+        insert_rows(Expense, EXPENSE_FIELDS, (expense_row(pk) for pk in ids))
+
+        last_seq = Family.reserve_change_seq(family.pk, len(ids))
+        insert_rows(
+            ChangeLog,
+            CHANGELOG_FIELDS,
+            (
+                (family.pk, seq, "expense", pk, "create", now)
+                for seq, pk in zip(range(last_seq - len(ids) + 1, last_seq + 1), ids)
+            ),
+        )
+
+    rebuild_rollups(family.pk)
+    return family
@@ -0,0 +1,168 @@
+# Generated by Django 5.1.7 on 2026-10-18 01:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("money", "0001_initial"),
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="family",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="categories",
+                to="users.family",
+            ),
+        ),
+        migrations.AddField(
+            model_name="changelog",
+            name="family",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="changes",
+                to="users.family",
+            ),
+        ),
+        migrations.AddField(
+            model_name="devicesyncstate",
+            name="family",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="devices",
+                to="users.family",
+            ),
+        ),
+        migrations.AddField(
+            model_name="expense",
+            name="category",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="expenses",
+                to="money.category",
+            ),
+        ),
+        migrations.AddField(
+            model_name="expense",
+            name="family",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="expenses",
+                to="users.family",
+            ),
+        ),
+        migrations.AddField(
+            model_name="expenserollup",
+            name="category",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="rollups",
+                to="money.category",
+            ),
+        ),
+        migrations.AddField(
+            model_name="expenserollup",
+            name="family",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="expense_rollups",
+                to="users.family",
+            ),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="category",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tags",
+                to="money.category",
+            ),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="family",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tags",
+                to="users.family",
+            ),
+        ),
+        migrations.AddField(
+            model_name="expenserollup",
+            name="tag",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="rollups",
+                to="money.tag",
+            ),
+        ),
+        migrations.AddField(
+            model_name="expense",
+            name="tag",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="expenses",
+                to="money.tag",
+            ),
+        ),
+        migrations.AddField(
+            model_name="tombstone",
+            name="family",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tombstones",
+                to="users.family",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="changelog",
+            constraint=models.UniqueConstraint(
+                fields=("family", "seq"), name="unique_family_seq"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="devicesyncstate",
+            constraint=models.UniqueConstraint(
+                fields=("family", "device"), name="unique_family_device"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="tag",
+            constraint=models.UniqueConstraint(
+                fields=("family", "title"), name="unique_family_title"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="expenserollup",
+            constraint=models.UniqueConstraint(
+                fields=("family", "month", "category", "tag"),
+                name="unique_rollup_bucket",
+                nulls_distinct=False,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="tombstone",
+            constraint=models.UniqueConstraint(
+                fields=("family", "kind", "object_id"), name="unique_family_tombstone"
+            ),
+        ),
+    ]
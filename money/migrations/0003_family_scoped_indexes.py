@@ -0,0 +1,59 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are built without blocking writes, which PostgreSQL cannot do
+    # inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("money", "0002_initial"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="category",
+            index=models.Index(
+                fields=["family", "updated_at", "id"],
+                name="category_family_updated_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="category",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["family", "id"],
+                name="category_family_live_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tag",
+            index=models.Index(
+                fields=["family", "updated_at", "id"], name="tag_family_updated_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tag",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["family", "id"],
+                name="tag_family_live_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="expense",
+            index=models.Index(
+                fields=["family", "updated_at", "id"], name="expense_family_updated_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="expense",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["family", "date_time"],
+                include=("category", "tag", "amount"),
+                name="expense_family_live_date_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The index is built without blocking writes, which PostgreSQL cannot do
+    # inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("money", "0003_family_scoped_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="changelog",
+            index=models.Index(
+                condition=models.Q(("action", "delete")),
+                fields=["family", "kind", "seq"],
+                name="changelog_family_delete_idx",
+            ),
+        ),
+    ]
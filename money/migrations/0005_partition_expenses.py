@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def partition_expenses(apps, schema_editor):
+    """
+    Convert the expense table when `EXPENSE_PARTITIONING` is set, which only
+    PostgreSQL supports. Nothing is done without it, so to convert later, set it
+    and migrate money back to 0004 and forward again.
+    """
+    from money.partitioning import convert, is_partitioned
+
+    connection = schema_editor.connection
+    if not settings.EXPENSE_PARTITIONING or connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            return
+    convert(model=apps.get_model("money", "Expense"))
+
+
+class Migration(migrations.Migration):
+    # The conversion runs in a transaction of its own, which locks the table
+    # while its rows are copied.
+    atomic = False
+
+    dependencies = [
+        ("money", "0004_changelog_delete_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_expenses, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,12 @@
 from django.db import models
 
+from money.events import publish_on_commit
 from users.models import Family
 
 
 class Category(models.Model):
     family = models.ForeignKey(
-        Family, on_delete=models.CASCADE, related_name="categories"
+        Family, on_delete=models.CASCADE, related_name="categories", db_index=False
     )
     title = models.CharField(max_length=100)
     color = models.CharField(max_length=6)
@@ -16,12 +17,28 @@ class Category(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(null=True, blank=True, default=None)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["family", "updated_at", "id"],
+                name="category_family_updated_idx",
+            ),
+            # Serves the snapshot's live rows of a family in id order.
+            models.Index(
+                fields=["family", "id"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="category_family_live_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
 
 class Tag(models.Model):
-    family = models.ForeignKey(Family, on_delete=models.CASCADE, related_name="tags")
+    family = models.ForeignKey(
+        Family, on_delete=models.CASCADE, related_name="tags", db_index=False
+    )
     title = models.CharField(max_length=100)
     color = models.CharField(max_length=6)
     category = models.ForeignKey(
@@ -38,6 +55,17 @@ class Tag(models.Model):
                 fields=["family", "title"], name="unique_family_title"
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=["family", "updated_at", "id"], name="tag_family_updated_idx"
+            ),
+            # Serves the snapshot's live rows of a family in id order.
+            models.Index(
+                fields=["family", "id"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="tag_family_live_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -45,7 +73,7 @@ class Tag(models.Model):
 
 class Expense(models.Model):
     family = models.ForeignKey(
-        Family, on_delete=models.CASCADE, related_name="expenses"
+        Family, on_delete=models.CASCADE, related_name="expenses", db_index=False
     )
     category = models.ForeignKey(
         Category, on_delete=models.CASCADE, related_name="expenses"
@@ -58,5 +86,165 @@ class Expense(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(null=True, blank=True, default=None)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["family", "updated_at", "id"], name="expense_family_updated_idx"
+            ),
+            # Covers the spending aggregations over live expenses with an index-only scan.
+            models.Index(
+                fields=["family", "date_time"],
+                include=["category", "tag", "amount"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="expense_family_live_date_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.category}: {self.amount} at {self.date_time.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class ChangeLog(models.Model):
+    """Append-only, per-family log of writes to categories, tags and expenses."""
+
+    KIND_CHOICES = (
+        ("category", "category"),
+        ("tag", "tag"),
+        ("expense", "expense"),
+    )
+    ACTION_CHOICES = (
+        ("create", "create"),
+        ("update", "update"),
+        ("delete", "delete"),
+    )
+
+    family = models.ForeignKey(
+        Family, on_delete=models.CASCADE, related_name="changes", db_index=False
+    )
+    seq = models.BigIntegerField()
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=12, choices=ACTION_CHOICES)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["family", "seq"], name="unique_family_seq"),
+        ]
+        indexes = [
+            # Serves archival walking a family's deletions of one kind by seq.
+            models.Index(
+                fields=["family", "kind", "seq"],
+                condition=models.Q(action="delete"),
+                name="changelog_family_delete_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.kind} {self.object_id}"
+
+    @classmethod
+    def record(cls, family_id, kind, action, object_ids):
+        """
+        Append one entry per object, each with its own sequence number, and
+        announce the change to the family's devices once the transaction commits.
+        """
+        object_ids = list(object_ids)
+        if not object_ids:
+            return
+
+        last_seq = Family.reserve_change_seq(family_id, len(object_ids))
+        first_seq = last_seq - len(object_ids) + 1
+
+        cls.objects.bulk_create(
+            (
+                cls(
+                    family_id=family_id,
+                    seq=first_seq + offset,
+                    kind=kind,
+                    object_id=object_id,
+                    action=action,
+                )
+                for offset, object_id in enumerate(object_ids)
+            ),
+            batch_size=5000,
+        )
+        publish_on_commit(family_id, last_seq, kind, action, object_ids)
+
+
+class ExpenseRollup(models.Model):
+    """Running totals of live expenses per family, category, tag and month."""
+
+    family = models.ForeignKey(
+        Family, on_delete=models.CASCADE, related_name="expense_rollups", db_index=False
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="rollups"
+    )
+    tag = models.ForeignKey(
+        Tag, on_delete=models.CASCADE, related_name="rollups", null=True, blank=True
+    )
+    month = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["family", "month", "category", "tag"],
+                name="unique_rollup_bucket",
+                nulls_distinct=False,
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.category} {self.month:%Y-%m}: {self.total}"
+
+
+class DeviceSyncState(models.Model):
+    """The change sequence up to which a device has synced its family's data."""
+
+    family = models.ForeignKey(
+        Family, on_delete=models.CASCADE, related_name="devices", db_index=False
+    )
+    device = models.CharField(max_length=64)
+    last_seq = models.BigIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["family", "device"], name="unique_family_device"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.device} at #{self.last_seq}"
+
+
+class Tombstone(models.Model):
+    """
+    A soft-deleted category, tag or expense moved out of its table once every
+    device of the family had synced past its deletion.
+    """
+
+    family = models.ForeignKey(
+        Family, on_delete=models.CASCADE, related_name="tombstones", db_index=False
+    )
+    kind = models.CharField(max_length=12, choices=ChangeLog.KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField()
+
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["family", "kind", "object_id"], name="unique_family_tombstone"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted at {self.deleted_at}"
@@ -0,0 +1,101 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Forward-only keyset pagination ordered by `(updated_at, id)`.
+
+    The cursor is an opaque token holding the `(updated_at, id)` pair of the last
+    row of the previous page, so every page is a single index seek no matter how
+    deep the client is. Rows written while the client is paging get a newer
+    `updated_at` and show up again on a later page instead of shifting the
+    pages that were already fetched.
+    """
+
+    ordering = ("updated_at", "id")
+    page_size = 500
+    page_size_query_param = "page_size"
+    max_page_size = 5000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.set_page(
+            [row async for row in self.get_page_queryset(queryset, request)]
+        )
+
+    def get_page_queryset(self, queryset, request):
+        """`queryset` narrowed to the requested page plus one row."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None:
+            updated_at, pk = self.cursor
+            queryset = queryset.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk)
+            )
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if self.has_next and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            token = urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+            updated_at, pk = token.rsplit("|", 1)
+            updated_at = parse_datetime(updated_at)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if updated_at is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return updated_at, pk
+
+    def encode_cursor(self, instance):
+        token = f"{instance.updated_at.isoformat()}|{instance.id}"
+        encoded = urlsafe_b64encode(token.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        return None
+
+    def get_paginated_data(self, data):
+        return {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_html_context(self):
+        return {"previous_url": None, "next_url": self.get_next_link()}
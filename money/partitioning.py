@@ -0,0 +1,277 @@
+"""
+Range partitioning of the expense table by `date_time`. PostgreSQL only.
+
+Nearly every expense query reads recent months, while the table keeps every
+year of history. With `EXPENSE_PARTITIONING` set, the money 0005 migration turns
+the table into one partitioned by year; queries bounded on `date_time`, such as
+the spending aggregations and expense lists with `date_from`, then scan only the
+matching partitions, and vacuum works on the small recent partitions instead
+of the whole history. Rows outside every partition go to a default partition.
+Running `partition_expenses` regularly keeps partitions created ahead of time.
+
+The hot paths are not bounded on `date_time`: the default expense list and sync
+page by `updated_at` and load rows by id, which says nothing about the date an
+expense is for. They probe every partition, so partitions are yearly only,
+keeping that to one per year of history: over five years, monthly ones made a
+family's sync page five times slower (`bench_partitioning`). Monthly partitions
+are still recognized, for the checks and the benchmark.
+
+The `EXPENSE_PARTITIONING` setting states whether the table is partitioned;
+database checks, run by `migrate` and by `check --database default`, report a
+table that does not match it.
+
+PostgreSQL requires the partition key in every unique constraint, so the
+primary key becomes `(id, date_time)`: ids stay unique because they all come
+from one sequence, not because the database enforces it. A lookup by id alone,
+as in retrieve, updates, deletes and archival, probes the primary key index of
+every partition. Django's model state still has `id` as the primary key, so
+migrations that alter the expense table's key or indexes must be checked
+against a partitioned database first.
+"""
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from money.models import Expense
+
+INTERVALS = ("month", "year")
+# The intervals `EXPENSE_PARTITIONING` accepts.
+CONFIGURABLE_INTERVALS = ("year",)
+PARTITION_NAME = re.compile(r"_p(?P<year>\d{4})(?:_(?P<month>\d{2}))?$")
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def table_name():
+    return Expense._meta.db_table
+
+
+def default_partition_name():
+    return f"{table_name()}_default"
+
+
+def configured_interval():
+    """The partition interval of `EXPENSE_PARTITIONING`; `ValueError` when unset."""
+    interval = settings.EXPENSE_PARTITIONING
+    if interval not in CONFIGURABLE_INTERVALS:
+        raise ValueError(
+            f"EXPENSE_PARTITIONING must be one of: "
+            f"{', '.join(CONFIGURABLE_INTERVALS)}."
+        )
+    return interval
+
+
+def partition_start(moment, interval):
+    """The UTC start of the partition `moment` falls in."""
+    moment = moment.astimezone(dt_timezone.utc) if moment.tzinfo else moment
+    return datetime(
+        moment.year,
+        moment.month if interval == "month" else 1,
+        1,
+        tzinfo=dt_timezone.utc,
+    )
+
+
+def next_start(start, interval):
+    if interval == "year":
+        return start.replace(year=start.year + 1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def partition_starts(first, last, interval):
+    """Starts of the partitions from the one holding `first` to the one holding `last`."""
+    start = partition_start(first, interval)
+    last = partition_start(last, interval)
+    while start <= last:
+        yield start
+        start = next_start(start, interval)
+
+
+def horizon(now, interval, ahead):
+    """Start of the partition `ahead` months or years after the one of `now`."""
+    start = partition_start(now, interval)
+    for _ in range(ahead):
+        start = next_start(start, interval)
+    return start
+
+
+def partition_name(start, interval, table=None):
+    suffix = f"{start:%Y_%m}" if interval == "month" else f"{start:%Y}"
+    return f"{table or table_name()}_p{suffix}"
+
+
+def partition_bounds(start, interval):
+    return (
+        f"FOR VALUES FROM ('{start.isoformat()}') "
+        f"TO ('{next_start(start, interval).isoformat()}')"
+    )
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table_name()]
+    )
+    row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def partition_names(cursor):
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(%s) ORDER BY child.relname",
+        [table_name()],
+    )
+    return [name for (name,) in cursor.fetchall()]
+
+
+def partition_interval(names):
+    """Whether the existing partitions are monthly or yearly, from their names."""
+    for name in names:
+        match = PARTITION_NAME.search(name)
+        if match:
+            return "month" if match["month"] else "year"
+    return None
+
+
+def add_partition(cursor, start, interval):
+    """
+    Create the partition starting at `start`.
+
+    Rows of its range already in the default partition are moved into it
+    first, as PostgreSQL refuses to add a partition they would belong to.
+    """
+    table = quote(table_name())
+    partition = quote(partition_name(start, interval))
+    default = quote(default_partition_name())
+    end = next_start(start, interval)
+
+    with transaction.atomic():
+        # Inserts routed to the default partition between the check (or the
+        # move) and adding the partition would make it fail. Locking the parent
+        # first, in the order inserts take their locks, blocks them until the
+        # partition exists without risking a deadlock.
+        cursor.execute(f"LOCK TABLE ONLY {table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"LOCK TABLE {default} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            f"SELECT 1 FROM {default} WHERE date_time >= %s AND date_time < %s LIMIT 1",
+            [start, end],
+        )
+        if cursor.fetchone() is None:
+            cursor.execute(
+                f"CREATE TABLE {partition} PARTITION OF {table} "
+                f"{partition_bounds(start, interval)}"
+            )
+            return
+
+        cursor.execute(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} "
+            f"WHERE date_time >= %s AND date_time < %s RETURNING *) "
+            f"INSERT INTO {partition} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {partition} "
+            f"{partition_bounds(start, interval)}"
+        )
+
+
+def create_future_partitions(ahead=3, now=None):
+    """
+    Create the missing partitions from the current one up to `ahead` years later
+    and return their names.
+    """
+    interval = configured_interval()
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            raise ValueError("The expense table is not partitioned.")
+        names = set(partition_names(cursor))
+
+        now = now or timezone.now()
+        created = []
+        for start in partition_starts(now, horizon(now, interval, ahead), interval):
+            name = partition_name(start, interval)
+            if name not in names:
+                add_partition(cursor, start, interval)
+                created.append(name)
+        return created
+
+
+def convert(ahead=3, model=Expense):
+    """
+    Rebuild the expense table as a table partitioned by the configured interval
+    holding the same rows and return the names of its partitions.
+
+    Indexes and foreign keys are those of `model`, the migration's historical
+    model when run by the money 0005 migration. The table is locked and copied
+    in one transaction, so this is meant for a maintenance window.
+    """
+    interval = configured_interval()
+
+    name = model._meta.db_table
+    table = quote(name)
+    legacy = quote(f"{name}_unpartitioned")
+    sequence = f"{name}_id_seq"
+
+    with connection.schema_editor() as schema_editor, connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            raise ValueError("The expense table is already partitioned.")
+
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT min(date_time), max(id) FROM {table}")
+        first, last_id = cursor.fetchone()
+        now = timezone.now()
+
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE (date_time)"
+        )
+        last = horizon(now, interval, ahead)
+        for start in partition_starts(first or now, last, interval):
+            cursor.execute(
+                f"CREATE TABLE {quote(partition_name(start, interval))} "
+                f"PARTITION OF {table} {partition_bounds(start, interval)}"
+            )
+        cursor.execute(
+            f"CREATE TABLE {quote(default_partition_name())} PARTITION OF {table} DEFAULT"
+        )
+
+        # Constraints and indexes are built once the rows are in place.
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+        cursor.execute(f"DROP TABLE {legacy}")
+
+        # Identity columns are not supported on partitioned tables before
+        # PostgreSQL 17, so ids come from an owned sequence, as with `serial`.
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {table}.id")
+        cursor.execute("SELECT setval(%s, %s, false)", [sequence, (last_id or 0) + 1])
+        cursor.execute(
+            f"ALTER TABLE {table} ALTER COLUMN id "
+            f"SET DEFAULT nextval('{sequence}'::regclass)"
+        )
+
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {quote(f'{name}_pkey')} "
+            f"PRIMARY KEY (id, date_time)"
+        )
+        for sql in schema_editor._model_indexes_sql(model):
+            schema_editor.execute(sql)
+        for field in model._meta.concrete_fields:
+            if field.remote_field and field.db_constraint:
+                schema_editor.execute(
+                    schema_editor._create_fk_sql(
+                        model, field, "_fk_%(to_table)s_%(to_column)s"
+                    )
+                )
+        cursor.execute(f"ANALYZE {table}")
+
+        return partition_names(cursor)
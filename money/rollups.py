@@ -0,0 +1,148 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from money.models import Expense, ExpenseRollup
+from users.models import Family
+
+
+def month_of(value):
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def rollup_entries(expenses):
+    """The `(bucket, amount, count)` contribution of every live expense."""
+    return [
+        (
+            (
+                expense.family_id,
+                expense.category_id,
+                expense.tag_id,
+                month_of(expense.date_time),
+            ),
+            expense.amount,
+            1,
+        )
+        for expense in expenses
+        if expense.deleted_at is None
+    ]
+
+
+def update_rollups(removed=(), added=()):
+    """
+    Subtract the `removed` and add the `added` rollup entries.
+
+    Must run in the same transaction as the expense write, after the family row
+    has been locked by `ChangeLog.record`.
+    """
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for sign, entries in ((-1, removed), (1, added)):
+        for bucket, amount, count in entries:
+            deltas[bucket][0] += sign * amount
+            deltas[bucket][1] += sign * count
+
+    for (family_id, category_id, tag_id, month), (amount, count) in deltas.items():
+        if not amount and not count:
+            continue
+
+        rollup = ExpenseRollup.objects.filter(
+            family_id=family_id, category_id=category_id, tag_id=tag_id, month=month
+        )
+        values = {"total": F("total") + amount, "count": F("count") + count}
+        if rollup.update(**values):
+            continue
+
+        try:
+            with transaction.atomic():
+                ExpenseRollup.objects.create(
+                    family_id=family_id,
+                    category_id=category_id,
+                    tag_id=tag_id,
+                    month=month,
+                    total=amount,
+                    count=count,
+                )
+        except IntegrityError:
+            rollup.update(**values)
+
+
+def move_tag_rollups(tag):
+    """Fold the rollups of a deleted tag into the untagged rollups of its categories."""
+    rollups = list(ExpenseRollup.objects.select_for_update().filter(tag=tag))
+    ExpenseRollup.objects.filter(pk__in=[rollup.pk for rollup in rollups]).delete()
+    update_rollups(
+        added=[
+            ((r.family_id, r.category_id, None, r.month), r.total, r.count)
+            for r in rollups
+        ]
+    )
+
+
+def compute_rollups(family_id):
+    """Recompute the rollups of a family from its expenses."""
+    rows = (
+        Expense.objects.filter(family_id=family_id, deleted_at__isnull=True)
+        .annotate(month=TruncMonth("date_time", output_field=DateField()))
+        .values("category", "tag", "month")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    )
+    return {
+        (family_id, row["category"], row["tag"], row["month"]): (
+            row["total"],
+            row["count"],
+        )
+        for row in rows
+    }
+
+
+def stored_rollups(family_id):
+    rollups = ExpenseRollup.objects.filter(family_id=family_id).exclude(count=0)
+    return {
+        (r.family_id, r.category_id, r.tag_id, r.month): (r.total, r.count)
+        for r in rollups
+    }
+
+
+def diff_rollups(family_id):
+    """Buckets whose stored `(total, count)` differs from a full recomputation."""
+    expected = compute_rollups(family_id)
+    stored = stored_rollups(family_id)
+    return {
+        bucket: (stored.get(bucket), expected.get(bucket))
+        for bucket in expected.keys() | stored.keys()
+        if stored.get(bucket) != expected.get(bucket)
+    }
+
+
+@transaction.atomic
+def rebuild_rollups(family_id):
+    """
+    Replace the rollups of a family with a full recomputation.
+
+    The family row is locked first, which makes concurrent expense writes of the
+    family wait for the rebuild to commit.
+    """
+    list(Family.objects.select_for_update().filter(pk=family_id).values_list("pk"))
+
+    ExpenseRollup.objects.filter(family_id=family_id).delete()
+    ExpenseRollup.objects.bulk_create(
+        (
+            ExpenseRollup(
+                family_id=family_id,
+                category_id=category_id,
+                tag_id=tag_id,
+                month=month,
+                total=total,
+                count=count,
+            )
+            for (_, category_id, tag_id, month), (total, count) in compute_rollups(
+                family_id
+            ).items()
+        ),
+        batch_size=5000,
+    )
@@ -1,5 +1,9 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 
+from money.aggregations import PERIOD_CHOICES
 from money.models import Category, Tag, Expense
 
 
@@ -107,3 +111,91 @@ class ExpenseListSerializer(ExpenseSerializer):
     created_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
     updated_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
     deleted_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
+
+
+class SpendingQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    period = serializers.ChoiceField(choices=PERIOD_CHOICES, default="month")
+
+    def validate(self, data):
+        today = timezone.localdate()
+        start = data.setdefault("start", today.replace(day=1))
+        end = data.setdefault(
+            "end", (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        )
+
+        # Ensure that the requested range is not empty
+        if end <= start:
+            raise serializers.ValidationError({"end": "End must be after start."})
+
+        return data
+
+
+class ExpenseDateRangeSerializer(serializers.Serializer):
+    date_from = serializers.DateTimeField(required=False)
+    date_to = serializers.DateTimeField(required=False)
+
+    def validate(self, data):
+        if "date_from" in data and "date_to" in data:
+            if data["date_to"] <= data["date_from"]:
+                raise serializers.ValidationError(
+                    {"date_to": "date_to must be after date_from."}
+                )
+        return data
+
+    def filter(self, queryset):
+        """Bound `date_time`, which lets a partitioned table skip partitions."""
+        if "date_from" in self.validated_data:
+            queryset = queryset.filter(date_time__gte=self.validated_data["date_from"])
+        if "date_to" in self.validated_data:
+            queryset = queryset.filter(date_time__lt=self.validated_data["date_to"])
+        return queryset
+
+
+class SpendingPeriodSerializer(serializers.Serializer):
+    period = serializers.DateField()
+    spent = serializers.DecimalField(max_digits=14, decimal_places=2)
+    remaining = serializers.DecimalField(max_digits=14, decimal_places=2)
+    percent_used = serializers.DecimalField(
+        max_digits=None, decimal_places=2, allow_null=True
+    )
+
+
+class CategorySpendingSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    limit = serializers.DecimalField(max_digits=12, decimal_places=2)
+    spent = serializers.DecimalField(max_digits=14, decimal_places=2)
+    remaining = serializers.DecimalField(max_digits=14, decimal_places=2)
+    percent_used = serializers.DecimalField(
+        max_digits=None, decimal_places=2, allow_null=True
+    )
+    periods = SpendingPeriodSerializer(many=True)
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=("create", "update", "delete"))
+    type = serializers.ChoiceField(choices=("category", "tag", "expense"))
+    id = serializers.CharField(required=False)
+    temp_id = serializers.CharField(required=False, max_length=64)
+    data = serializers.DictField(required=False, default=dict)
+
+    def validate(self, data):
+        # Ensure that updates and deletes say which object they target
+        if data["op"] != "create" and "id" not in data:
+            raise serializers.ValidationError(
+                {"id": f"This field is required for {data['op']}."}
+            )
+
+        # Ensure that temporary ids can't be mistaken for real ids
+        if "temp_id" in data and data["temp_id"].isdigit():
+            raise serializers.ValidationError(
+                {"temp_id": "Temporary ids must not be numeric."}
+            )
+
+        return data
+
+
+class BatchSerializer(serializers.Serializer):
+    operations = BatchOperationSerializer(many=True, allow_empty=False, max_length=1000)
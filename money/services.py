@@ -0,0 +1,144 @@
+"""
+Write paths for categories, tags and expenses.
+
+Every function records its writes in the change log and keeps the expense
+rollups current, in the same transaction as the write itself. Views and the
+batch endpoint go through here so that no write path can skip either.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from money.models import Expense, ChangeLog, ExpenseRollup
+from money.rollups import move_tag_rollups, rollup_entries, update_rollups
+
+
+def update_rows(queryset, **values):
+    """
+    Update every row matched by `queryset` in a single statement and return their ids.
+
+    The rows are locked first so the returned ids are exactly the rows updated.
+    """
+    ids = list(queryset.select_for_update().values_list("id", flat=True))
+    if ids:
+        queryset.model.objects.filter(pk__in=ids).update(**values)
+    return ids
+
+
+@transaction.atomic
+def create_objects(model, family, items):
+    """Insert one object per validated `items` entry for `family` with a single INSERT."""
+    instances = model.objects.bulk_create(
+        [model(family=family, **item) for item in items], batch_size=1000
+    )
+
+    ChangeLog.record(
+        family.pk, model._meta.model_name, "create", [obj.pk for obj in instances]
+    )
+    if model is Expense:
+        update_rollups(added=rollup_entries(instances))
+
+    return instances
+
+
+@transaction.atomic
+def update_objects(model, changes):
+    """
+    Apply `(instance, validated_data)` pairs with a single bulk UPDATE.
+
+    Several changes to the same instance are applied in order.
+    """
+    instances = {}
+    for instance, data in changes:
+        instances.setdefault(instance.pk, (instance, {}))[1].update(data)
+    if not instances:
+        return []
+
+    removed = (
+        rollup_entries(instance for instance, _ in instances.values())
+        if model is Expense
+        else ()
+    )
+
+    now = timezone.now()
+    fields = {"updated_at"}
+    for instance, data in instances.values():
+        for attr, value in data.items():
+            setattr(instance, attr, value)
+        instance.updated_at = now
+        fields.update(data)
+
+    updated = [instance for instance, _ in instances.values()]
+    model.objects.bulk_update(updated, sorted(fields), batch_size=1000)
+
+    family_id = updated[0].family_id
+    ChangeLog.record(
+        family_id, model._meta.model_name, "update", [obj.pk for obj in updated]
+    )
+    if model is Expense:
+        update_rollups(removed=removed, added=rollup_entries(updated))
+
+    return updated
+
+
+@transaction.atomic
+def delete_category(category):
+    """Soft-delete a category together with its tags and expenses."""
+    now = timezone.now()
+
+    expense_ids = update_rows(
+        category.expenses.filter(deleted_at__isnull=True),
+        deleted_at=now,
+        updated_at=now,
+    )
+    tag_ids = update_rows(
+        category.tags.filter(deleted_at__isnull=True),
+        deleted_at=now,
+        updated_at=now,
+    )
+    soft_delete([category], now)
+
+    ChangeLog.record(category.family_id, "expense", "delete", expense_ids)
+    ChangeLog.record(category.family_id, "tag", "delete", tag_ids)
+    ChangeLog.record(category.family_id, "category", "delete", [category.pk])
+    ExpenseRollup.objects.filter(category=category).delete()
+
+
+@transaction.atomic
+def delete_tag(tag):
+    """Soft-delete a tag and detach it from its expenses."""
+    now = timezone.now()
+
+    expense_ids = update_rows(tag.expenses.all(), tag=None, updated_at=now)
+    soft_delete([tag], now)
+
+    ChangeLog.record(tag.family_id, "expense", "update", expense_ids)
+    ChangeLog.record(tag.family_id, "tag", "delete", [tag.pk])
+    move_tag_rollups(tag)
+
+
+@transaction.atomic
+def delete_expenses(expenses):
+    """Soft-delete expenses of one family with a single UPDATE."""
+    expenses = list({expense.pk: expense for expense in expenses}.values())
+    if not expenses:
+        return
+
+    removed = rollup_entries(expenses)
+    soft_delete(expenses, timezone.now())
+
+    ChangeLog.record(
+        expenses[0].family_id, "expense", "delete", [obj.pk for obj in expenses]
+    )
+    update_rollups(removed=removed)
+
+
+def soft_delete(instances, now):
+    """Mark `instances` deleted, stamping `deleted_at` and `updated_at` with `now`."""
+    model = type(instances[0])
+    model.objects.filter(pk__in=[instance.pk for instance in instances]).update(
+        deleted_at=now, updated_at=now
+    )
+    for instance in instances:
+        instance.deleted_at = now
+        instance.updated_at = now
@@ -0,0 +1,155 @@
+"""
+Consistent full-family snapshots for bootstrapping new devices.
+
+Every live category, tag and expense of a family is read inside one
+repeatable-read transaction, together with the family's change sequence. The
+client stores the rows and passes that sequence to the delta sync as `since`,
+so nothing written while the snapshot was produced is missed.
+
+The snapshot is written to a temporary file before any of it is sent, so the
+transaction lasts as long as reading the rows does rather than as long as the
+client takes to download them.
+"""
+
+import zlib
+from tempfile import SpooledTemporaryFile
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from fire_fruit_money.conditional import family_etag
+from money.fastpath import CATEGORY_LIST, TAG_LIST, EXPENSE_LIST
+from money.models import Category, Tag, Expense
+from money.streaming import iter_chunks
+from users.models import Family
+
+SECTIONS = (
+    ("categories", Category, CATEGORY_LIST),
+    ("tags", Tag, TAG_LIST),
+    ("expenses", Expense, EXPENSE_LIST),
+)
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def accepts_gzip(request):
+    """Whether `Accept-Encoding` allows gzip, `gzip;q=0` and `*;q=0` refusing it."""
+    qualities = {}
+    for coding in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, *params = (part.strip() for part in coding.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def snapshot_etag(request, *args, **kwargs):
+    etag = family_etag(request)
+    if etag is None:
+        return None
+
+    # The gzip and identity bodies differ byte for byte.
+    encoding = "gzip" if accepts_gzip(request) else "identity"
+    return f'{etag[:-1]}-{encoding}"'
+
+
+snapshot_condition = method_decorator(condition(etag_func=snapshot_etag))
+
+
+class Snapshot:
+    """
+    Iterate over `{"seq": ..., "categories": [...], "tags": [...], "expenses": [...]}`
+    as encoded JSON chunks.
+
+    `seq` is set once the snapshot transaction has started. Iterating holds
+    the transaction open until the last chunk; `build` doesn't wait for the
+    client.
+    """
+
+    def __init__(self, family_id):
+        self.family_id = family_id
+        self.seq = None
+
+    def build(self, encoding, max_memory):
+        """
+        Write the snapshot, gzip-compressed under the `gzip` encoding, to a
+        temporary file that stays in memory up to `max_memory` bytes.
+
+        Returns the file, rewound, and its size.
+        """
+        file = SpooledTemporaryFile(max_size=max_memory)
+        chunks = iter(self)
+        if encoding == "gzip":
+            chunks = gzip_chunks(chunks)
+        for chunk in chunks:
+            file.write(chunk)
+        size = file.tell()
+        file.seek(0)
+        return file, size
+
+    def __iter__(self):
+        outermost = not connection.in_atomic_block
+        with transaction.atomic():
+            if outermost and connection.vendor == "postgresql":
+                # READ COMMITTED would take a new snapshot for every statement.
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY"
+                    )
+
+            self.seq = Family.objects.values_list("change_seq", flat=True).get(
+                pk=self.family_id
+            )
+            yield f'{{"seq":{self.seq}'.encode()
+
+            for name, model, fast_list in SECTIONS:
+                queryset = model.objects.filter(
+                    family_id=self.family_id, deleted_at__isnull=True
+                ).order_by("id")
+                rows = map(
+                    fast_list.row_formatter(),
+                    fast_list.values(queryset).iterator(chunk_size=2000),
+                )
+                yield f',"{name}":'.encode()
+                yield from iter_chunks(rows, "json")
+
+            yield b"}"
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress `chunks` into a gzip stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def snapshot_cache_key(family_id, seq, encoding):
+    return f"snapshot:{family_id}:{seq}:{encoding}"
+
+
+def file_chunks(file):
+    """Read `file` in chunks, closing it at the end."""
+    with file:
+        while chunk := file.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+async def afile_chunks(file):
+    """`file_chunks` for ASGI, which buffers a sync iterator's whole output."""
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while chunk := await read(FILE_CHUNK_SIZE):
+            yield chunk
+    finally:
+        file.close()
@@ -0,0 +1,109 @@
+"""
+Streaming JSON array and NDJSON output for large list responses.
+
+Rows are read with a server-side cursor and serialized one at a time, so
+memory stays flat no matter how many rows the response holds. Under ASGI the
+rows come from `aiterator()` instead: Django consumes a sync body in a thread
+up front and only then sends it, so a sync iterator would hold the whole
+response in memory.
+"""
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+class ChunkEncoder:
+    """
+    Encode rows into chunks of about `chunk_size` bytes.
+
+    With `columns`, rows are value arrays: the JSON output becomes
+    `{"columns": [...], "rows": [...]}` and the NDJSON output starts with a
+    line holding the column names.
+    """
+
+    def __init__(self, stream_format, chunk_size=64 * 1024, columns=None):
+        if stream_format == "json":
+            opening, self.separator, self.closing = "[", ",", "]"
+            if columns is not None:
+                opening = f'{{"columns":{encoder.encode(columns)},"rows":['
+                self.closing = "]}"
+        else:
+            opening, self.separator, self.closing = "", "\n", "\n"
+            if columns is not None:
+                opening = encoder.encode(columns) + "\n"
+        self.stream_format = stream_format
+        self.chunk_size = chunk_size
+        self.buffer = [opening]
+        self.buffered = len(opening)
+        self.first = True
+
+    def add(self, row):
+        """Buffer `row`, returning a chunk once enough output is buffered."""
+        encoded = encoder.encode(row)
+        if not self.first:
+            self.buffer.append(self.separator)
+        self.buffer.append(encoded)
+        self.buffered += len(encoded) + 1
+        self.first = False
+
+        if self.buffered >= self.chunk_size:
+            chunk = "".join(self.buffer).encode()
+            self.buffer = []
+            self.buffered = 0
+            return chunk
+        return None
+
+    def close(self):
+        """The last chunk."""
+        if self.stream_format == "json" or not self.first:
+            self.buffer.append(self.closing)
+        return "".join(self.buffer).encode()
+
+
+def iter_chunks(rows, stream_format, chunk_size=64 * 1024, columns=None):
+    """Encode `rows` with a `ChunkEncoder` and yield its chunks."""
+    chunks = ChunkEncoder(stream_format, chunk_size, columns)
+    for row in rows:
+        chunk = chunks.add(row)
+        if chunk is not None:
+            yield chunk
+    yield chunks.close()
+
+
+async def aiter_chunks(rows, stream_format, chunk_size=64 * 1024, columns=None):
+    """`iter_chunks` of an async iterable of rows."""
+    chunks = ChunkEncoder(stream_format, chunk_size, columns)
+    async for row in rows:
+        chunk = chunks.add(row)
+        if chunk is not None:
+            yield chunk
+    yield chunks.close()
+
+
+def serialized_rows(serializer, queryset, chunk_size=2000):
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        yield serializer.to_representation(instance)
+
+
+async def aserialized_rows(serializer, queryset, chunk_size=2000):
+    async for instance in queryset.aiterator(chunk_size=chunk_size):
+        yield serializer.to_representation(instance)
+
+
+def streaming_response(rows, stream_format, columns=None):
+    """
+    Stream an iterable of row dicts, or of value arrays under `columns`. An
+    async iterable is streamed as it is read, as ASGI needs.
+    """
+    if hasattr(rows, "__aiter__"):
+        chunks = aiter_chunks(rows, stream_format, columns=columns)
+    else:
+        chunks = iter_chunks(rows, stream_format, columns=columns)
+    return StreamingHttpResponse(chunks, content_type=STREAM_FORMATS[stream_format])
@@ -0,0 +1,1277 @@
+import json
+import re
+import threading
+from base64 import urlsafe_b64encode
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from types import ModuleType
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import DataError, connection, transaction
+from django.test import (
+    AsyncClient,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import include, path, reverse
+from django.utils.module_loading import import_string
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.routers import DefaultRouter
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from fire_fruit_money.async_views import AsyncReadMixin
+from fire_fruit_money.cache import get_response_cache
+from money.aggregations import expense_spending_queryset
+from money.archival import archive_family
+from money.checks import check_expense_partitioning, check_shared_change_streams
+from money.events import get_broker
+from money.management.seed import seed_family
+from money.models import (
+    Category,
+    Tag,
+    Expense,
+    ChangeLog,
+    DeviceSyncState,
+    Tombstone,
+)
+from money.pagination import KeysetPagination
+from money.partitioning import (
+    is_partitioned,
+    next_start,
+    partition_interval,
+    partition_names,
+    partition_starts,
+    quote,
+)
+from money.rollups import diff_rollups
+from money import services
+from money.coalescing import get_write_coalescer
+from money.services import delete_expenses
+from money.snapshot import accepts_gzip, snapshot_cache_key
+from money.streaming import iter_chunks
+from money import urls as money_urls
+from money.views import CategoryViewSet, TagViewSet, ExpenseViewSet
+from users import urls as users_urls
+from users.models import Family, User
+
+ROW_COUNTS = (10, 1000, 10000)
+
+
+@skipUnless(connection.vendor == "postgresql", "Query plans are PostgreSQL's.")
+class QueryPlanTests(TestCase):
+    """The family-scoped reads keep using indexes on a large dataset."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for _ in range(20):
+            cls.family, _ = seed_family(
+                5000, categories=200, tags=300, deleted_every=10
+            )
+
+        with connection.cursor() as cursor:
+            for model in (Category, Tag, Expense, ChangeLog):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+            # Under EXPENSE_PARTITIONING plans scan the empty partitions ahead
+            # too, sequentially, for nothing.
+            cls.empty_partitions = set()
+            if connection.vendor == "postgresql" and is_partitioned(cursor):
+                for name in partition_names(cursor):
+                    cursor.execute(f"SELECT EXISTS (SELECT FROM {quote(name)})")
+                    if not cursor.fetchone()[0]:
+                        cls.empty_partitions.add(name)
+
+    def get_queries(self):
+        family = self.family
+        limit = KeysetPagination.page_size + 1
+        since = timezone.now()
+
+        for model in (Category, Tag, Expense):
+            name = model._meta.model_name
+            queryset = model.objects.filter(family=family).order_by(
+                *KeysetPagination.ordering
+            )
+            yield f"{name} list", queryset[:limit]
+            yield f"{name} list since", queryset.filter(updated_at__gte=since)[:limit]
+            yield f"{name} snapshot", model.objects.filter(
+                family=family, deleted_at__isnull=True
+            ).order_by("id")
+
+        yield "change log sync", ChangeLog.objects.filter(
+            family=family, seq__gt=0
+        ).order_by("seq")[:1001]
+        yield "archival deletions", ChangeLog.objects.filter(
+            family=family, kind="expense", action="delete", seq__gt=0, seq__lte=2**62
+        ).order_by("seq")[:1000]
+
+        today = timezone.localdate()
+        yield "spending aggregation", expense_spending_queryset(
+            family, today.replace(day=1), today + timedelta(days=1), "month"
+        )
+
+    def test_no_sequential_scans(self):
+        for name, queryset in self.get_queries():
+            with self.subTest(name):
+                plan = queryset.explain()
+                scanned = set(re.findall(r"Seq Scan on (money_\w+)", plan))
+                self.assertFalse(scanned - self.empty_partitions, plan)
+
+
+# A cache per test, so responses of earlier tests are never served.
+@override_settings(
+    RESPONSE_CACHE={"BACKEND": "fire_fruit_money.cache.LRUResponseCache"}
+)
+class QueryCountTests(TestCase):
+    """
+    List and retrieve run a fixed number of queries however many rows there
+    are: one for the rows, plus one for the family's change state unless the
+    user is staff.
+    """
+
+    def get_client(self, family, staff):
+        user = User.objects.select_related("family").get(family_admin=family)
+        user.is_staff = staff
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def assert_read_queries(self, basename, model):
+        for rows in ROW_COUNTS:
+            family, _ = seed_family(rows, categories=rows, tags=rows)
+            pk = model.objects.filter(family=family).latest("id").pk
+
+            for staff, queries in ((False, 2), (True, 1)):
+                with self.subTest(rows=rows, staff=staff):
+                    client = self.get_client(family, staff)
+                    with self.assertNumQueries(queries):
+                        response = client.get(
+                            reverse(f"money:{basename}-list"),
+                            {"page_size": KeysetPagination.max_page_size},
+                        )
+                    self.assertEqual(response.status_code, 200)
+                    if not staff:
+                        self.assertEqual(
+                            len(response.data["results"]),
+                            min(rows, KeysetPagination.max_page_size),
+                        )
+
+                    with self.assertNumQueries(queries):
+                        response = client.get(
+                            reverse(f"money:{basename}-detail", args=[pk])
+                        )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_category(self):
+        self.assert_read_queries("category", Category)
+
+    def test_tag(self):
+        self.assert_read_queries("tag", Tag)
+
+    def test_expense(self):
+        self.assert_read_queries("expense", Expense)
+
+
+# Nothing is cached, so the serializer and the fast path both render.
+@override_settings(
+    RESPONSE_CACHE={
+        "BACKEND": "fire_fruit_money.cache.LRUResponseCache",
+        "OPTIONS": {"max_bytes": 0},
+    }
+)
+class FastListTests(TestCase):
+    """The list fast path renders the same bytes as the list serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, _ = seed_family(120, categories=7, tags=15, deleted_every=4)
+        expenses = Expense.objects.filter(family=cls.family)
+        ids = list(expenses.order_by("id").values_list("id", flat=True))
+        expenses.filter(id__in=ids[::3]).update(tag=None)
+        expenses.filter(id__in=ids[1::5]).update(amount=12.5)
+        cls.user = User.objects.select_related("family").get(family_admin=cls.family)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, viewset, basename, params, fast):
+        fast_list = viewset.fast_list if fast else None
+        with mock.patch.object(viewset, "fast_list", fast_list):
+            response = self.client.get(reverse(f"money:{basename}-list"), params)
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return b"".join(response.streaming_content)
+        return response.content
+
+    def get_shapes(self, names):
+        for base in (
+            {},
+            {"page_size": 10},
+            {"fields": ",".join((names[0], names[2], names[-1]))},
+            {"omit": ",".join((names[1], names[3]))},
+        ):
+            for stream in (None, "json", "ndjson"):
+                yield base if stream is None else {**base, "stream": stream}
+
+    def columnar(self, content, params):
+        """The serializer's output of `params` rearranged into the columnar shape."""
+        stream = params.get("stream")
+        if stream == "ndjson":
+            rows = [json.loads(line) for line in content.decode().splitlines()]
+        else:
+            data = json.loads(content)
+            rows = data if stream else data["results"]
+
+        columns = list(rows[0])
+        values = [list(row.values()) for row in rows]
+        if stream:
+            return b"".join(iter_chunks(values, stream, columns=columns))
+        data["results"] = {"columns": columns, "rows": values}
+        return JSONRenderer().render(data)
+
+    def test_fast_path_matches_serializer(self):
+        for viewset, basename in (
+            (CategoryViewSet, "category"),
+            (TagViewSet, "tag"),
+            (ExpenseViewSet, "expense"),
+        ):
+            for params in self.get_shapes(viewset.fast_list.names):
+                with self.subTest(basename, **params):
+                    expected = self.get(viewset, basename, params, fast=False)
+                    self.assertEqual(
+                        self.get(viewset, basename, params, fast=True), expected
+                    )
+
+                    # The serializer ignores `shape` but keeps it in links.
+                    columnar = {**params, "shape": "columnar"}
+                    expected = self.get(viewset, basename, columnar, fast=False)
+                    self.assertEqual(
+                        self.get(viewset, basename, columnar, fast=True),
+                        self.columnar(expected, params),
+                    )
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, _ = seed_family(25)
+        cls.user = User.objects.select_related("family").get(family_admin=cls.family)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("money:expense-list")
+
+    def get_page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]], response.data["next"]
+
+    def get_ids(self, url, params=None, between_pages=None):
+        """The ids of every page, `between_pages` called after the first one."""
+        ids, url = self.get_page(url, params)
+        if between_pages is not None:
+            between_pages(ids)
+        while url is not None:
+            page, url = self.get_page(url)
+            ids += page
+        return ids
+
+    def test_updated_between_pages(self):
+        expected = list(
+            Expense.objects.filter(family=self.family)
+            .order_by("updated_at", "id")
+            .values_list("id", flat=True)
+        )
+
+        def update(seen):
+            # A row already listed and one further on.
+            for pk in (seen[0], expected[-5]):
+                expense = Expense.objects.get(pk=pk)
+                response = self.client.put(
+                    reverse("money:expense-detail", args=[expense.pk]),
+                    {
+                        "category": expense.category_id,
+                        "tag": expense.tag_id,
+                        "amount": "1.00",
+                    },
+                )
+                self.assertEqual(response.status_code, 200)
+
+        ids = self.get_ids(self.url, {"page_size": 10}, between_pages=update)
+        # Updated rows move to the end, in the order they were updated; the
+        # one already listed comes again.
+        self.assertEqual(
+            ids,
+            [pk for pk in expected if pk != expected[-5]] + [expected[0], expected[-5]],
+        )
+
+    def test_ties_broken_by_id(self):
+        Expense.objects.filter(family=self.family).update(updated_at=timezone.now())
+        ids = self.get_ids(self.url, {"page_size": 7})
+        self.assertEqual(
+            ids,
+            sorted(
+                Expense.objects.filter(family=self.family).values_list("id", flat=True)
+            ),
+        )
+
+    def test_malformed_cursor(self):
+        def encode(token):
+            return urlsafe_b64encode(token.encode()).decode()
+
+        for cursor in (
+            "x",
+            "é",
+            encode("no separator"),
+            encode("not a date|1"),
+            encode("2026-01-01T00:00:00+00:00|not an id"),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+# A cache of its own, so responses of other tests are never served.
+@override_settings(
+    RESPONSE_CACHE={"BACKEND": "fire_fruit_money.cache.LRUResponseCache"}
+)
+class ResponseCacheInvalidationTests(TestCase):
+    """Cached responses are only served while the family's change sequence holds."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, cls.categories = seed_family(5)
+        cls.admin = User.objects.get(family_admin=cls.family)
+        cls.member = User.objects.create_user(f"member-{cls.family.pk}@example.com")
+        cls.member.family = cls.family
+        cls.member.save(update_fields=["family"])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, user, url):
+        response = self.client.get(
+            url, headers={"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def change_seq(self, family_id):
+        return Family.objects.get(pk=family_id).change_seq
+
+    def test_write(self):
+        url = reverse("money:expense-list")
+        response = self.get(self.admin, url)
+        # Only the family's change state is read.
+        with self.assertNumQueries(1):
+            cached = self.get(self.admin, url)
+        self.assertEqual(cached.content, response.content)
+
+        seq = self.change_seq(self.family.pk)
+        response = self.client.post(
+            url,
+            {"category": self.categories[0].pk, "tag": None, "amount": "3.00"},
+            format="json",
+            headers={"Authorization": f"Bearer {AccessToken.for_user(self.admin)}"},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.change_seq(self.family.pk), seq + 1)
+
+        with self.assertNumQueries(2):
+            fresh = self.get(self.admin, url)
+        self.assertNotEqual(fresh["ETag"], cached["ETag"])
+        self.assertIn(
+            response.data["id"], [row["id"] for row in fresh.json()["results"]]
+        )
+
+    def test_membership_change(self):
+        url = reverse("money:category-list")
+        own_family_id = Family.objects.get(admin=self.member).pk
+        seqs = {
+            family_id: self.change_seq(family_id)
+            for family_id in (self.family.pk, own_family_id)
+        }
+        admin_etag = self.get(self.admin, url)["ETag"]
+        self.assertEqual(
+            {row["id"] for row in self.get(self.member, url).json()["results"]},
+            {category.pk for category in self.categories},
+        )
+
+        # The cached user is dropped once the membership change commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("users:families-leave-family", args=[self.family.pk]),
+                headers={
+                    "Authorization": f"Bearer {AccessToken.for_user(self.member)}"
+                },
+            )
+        self.assertEqual(response.status_code, 200)
+        for family_id, seq in seqs.items():
+            self.assertEqual(self.change_seq(family_id), seq + 1)
+
+        self.assertEqual(self.get(self.member, url).json()["results"], [])
+        self.assertNotEqual(self.get(self.admin, url)["ETag"], admin_etag)
+
+
+class ConditionalGetTests(TestCase):
+    """Lists revalidate against the family's change sequence only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, _ = seed_family(5)
+        cls.user = User.objects.select_related("family").get(family_admin=cls.family)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("money:expense-list")
+
+    def test_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        Family.touch(self.family.pk)
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_no_last_modified(self):
+        response = self.client.get(self.url)
+        self.assertNotIn("Last-Modified", response)
+
+        # A write within the same second as the previous response.
+        Family.touch(self.family.pk)
+        response = self.client.get(self.url, headers={"If-Modified-Since": http_date()})
+        self.assertEqual(response.status_code, 200)
+
+
+class SnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, _ = seed_family(50)
+        cls.user = User.objects.select_related("family").get(family_admin=cls.family)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("money:snapshot")
+        # A cache per test: the family's change sequence, and so the cache key,
+        # is the same in every test.
+        self.enterContext(
+            override_settings(
+                RESPONSE_CACHE={"BACKEND": "fire_fruit_money.cache.LRUResponseCache"}
+            )
+        )
+
+    def get(self, encoding, **headers):
+        """The response and its body, read to the end."""
+        response = self.client.get(
+            self.url, headers={"Accept-Encoding": encoding, **headers}
+        )
+        return response, response.getvalue()
+
+    def is_cached(self, encoding):
+        seq = Family.objects.get(pk=self.family.pk).change_seq
+        key = snapshot_cache_key(self.family.pk, seq, encoding)
+        return get_response_cache().get(key) is not None
+
+    def test_etag_per_encoding(self):
+        gzip, _ = self.get("gzip")
+        identity, _ = self.get("identity")
+        self.assertEqual(gzip["Content-Encoding"], "gzip")
+        self.assertNotEqual(gzip["ETag"], identity["ETag"])
+
+        response, _ = self.get("identity", **{"If-None-Match": gzip["ETag"]})
+        self.assertEqual(response.status_code, 200)
+        response, _ = self.get("gzip", **{"If-None-Match": gzip["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_cache_max_bytes(self):
+        with self.settings(SNAPSHOT_CACHE_MAX_BYTES=100):
+            self.get("identity")
+        self.assertFalse(self.is_cached("identity"))
+
+        _, body = self.get("identity")
+        self.assertTrue(self.is_cached("identity"))
+        response, cached = self.get("identity")
+        self.assertFalse(response.streaming)
+        self.assertEqual(cached, body)
+
+    def test_read_before_sending(self):
+        with self.settings(SNAPSHOT_CACHE_MAX_BYTES=100):
+            # The change state, then the snapshot's transaction: its change
+            # sequence and the three sections between two savepoint queries.
+            with self.assertNumQueries(7):
+                response = self.client.get(self.url)
+            self.assertTrue(response.streaming)
+            with self.assertNumQueries(0):
+                body = response.getvalue()
+        self.assertEqual(int(response["Content-Length"]), len(body))
+        self.assertEqual(body, self.get("identity")[1])
+
+    def test_streams_asynchronously(self):
+        async def get():
+            response = await AsyncClient().get(
+                self.url,
+                headers={
+                    "Accept-Encoding": "gzip",
+                    "Authorization": f"Bearer {AccessToken.for_user(self.user)}",
+                },
+            )
+            self.assertTrue(response.is_async)
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        with self.settings(SNAPSHOT_CACHE_MAX_BYTES=100):
+            body = async_to_sync(get)()
+        self.assertEqual(body, self.get("gzip")[1])
+
+    def test_accepts_gzip(self):
+        factory = RequestFactory()
+        cases = {
+            "": False,
+            "identity": False,
+            "gzip, deflate, br": True,
+            "br;q=1.0, gzip;q=0.8": True,
+            "gzip;q=0": False,
+            "gzip; q=0.0, deflate": False,
+            "*": True,
+            "*;q=0": False,
+            "*, gzip;q=0": False,
+            "gzip;q=x": False,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                request = factory.get(self.url, headers={"Accept-Encoding": header})
+                self.assertIs(accepts_gzip(request), expected)
+
+
+@override_settings(
+    CHANGE_BROKER={
+        "BACKEND": "money.events.InMemoryBroker",
+        "OPTIONS": {"max_pending": 2},
+    }
+)
+class ChangeStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, _ = seed_family(1)
+        cls.user = User.objects.get(family_admin=cls.family)
+
+    def get_ticket(self):
+        response = APIClient().post(
+            reverse("money:events-ticket"),
+            headers={"Authorization": f"Bearer {AccessToken.for_user(self.user)}"},
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data["ticket"]
+
+    async def test_ticket_is_single_use(self):
+        ticket = await sync_to_async(self.get_ticket)()
+        url = reverse("money:events")
+
+        response = await AsyncClient().get(url, {"ticket": ticket})
+        self.assertEqual(response.status_code, 200)
+        await response.streaming_content.aclose()
+
+        response = await AsyncClient().get(url, {"ticket": ticket})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_access_token_not_accepted_in_url(self):
+        token = str(AccessToken.for_user(self.user))
+        for param in ("token", "ticket"):
+            response = await AsyncClient().get(reverse("money:events"), {param: token})
+            self.assertEqual(response.status_code, 401)
+
+    async def test_resync_carries_current_seq(self):
+        ticket = await sync_to_async(self.get_ticket)()
+        response = await AsyncClient().get(reverse("money:events"), {"ticket": ticket})
+        events = aiter(response.streaming_content)
+        await anext(events)  # retry
+        await anext(events)  # hello
+
+        # More events than the subscription holds, then a write never announced.
+        for seq in range(1, 5):
+            get_broker().publish(self.family.pk, {"seq": seq})
+        await sync_to_async(Family.touch)(self.family.pk)
+        seq = await Family.objects.values_list("change_seq", flat=True).aget(
+            pk=self.family.pk
+        )
+
+        event = await anext(events)
+        await events.aclose()
+        self.assertIn(b"event: resync", event)
+        self.assertIn(f'"seq":{seq}'.encode(), event)
+
+
+@override_settings(
+    RESPONSE_CACHE={"BACKEND": "fire_fruit_money.cache.LRUResponseCache"}
+)
+class DeleteCascadeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, cls.categories = seed_family(
+            30, categories=3, tags=6, deleted_every=5
+        )
+        cls.user = User.objects.select_related("family").get(family_admin=cls.family)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.since = Family.objects.get(pk=self.family.pk).change_seq
+
+    def delete(self, basename, pk):
+        response = self.client.delete(reverse(f"money:{basename}-detail", args=[pk]))
+        self.assertEqual(response.status_code, 204)
+
+    def changes(self):
+        """`(kind, action)` to the object ids logged since `setUp`, in order."""
+        changes = {}
+        for kind, action, object_id in (
+            ChangeLog.objects.filter(family=self.family, seq__gt=self.since)
+            .order_by("seq")
+            .values_list("kind", "action", "object_id")
+        ):
+            changes.setdefault((kind, action), []).append(object_id)
+        return changes
+
+    def test_delete_category(self):
+        category = self.categories[0]
+        expense_ids = set(
+            category.expenses.filter(deleted_at__isnull=True).values_list(
+                "id", flat=True
+            )
+        )
+        tag_ids = set(category.tags.values_list("id", flat=True))
+        self.assertTrue(expense_ids and tag_ids)
+
+        self.delete("category", category.pk)
+
+        changes = self.changes()
+        self.assertEqual(
+            set(changes),
+            {
+                ("expense", "delete"),
+                ("tag", "delete"),
+                ("category", "delete"),
+            },
+        )
+        self.assertCountEqual(changes["expense", "delete"], expense_ids)
+        self.assertCountEqual(changes["tag", "delete"], tag_ids)
+        self.assertEqual(changes["category", "delete"], [category.pk])
+        self.assertFalse(category.expenses.filter(deleted_at__isnull=True).exists())
+        self.assertEqual(diff_rollups(self.family.pk), {})
+
+    def test_delete_tag(self):
+        tag = Tag.objects.filter(family=self.family).first()
+        expense_ids = set(tag.expenses.values_list("id", flat=True))
+        self.assertTrue(expense_ids)
+
+        self.delete("tag", tag.pk)
+
+        changes = self.changes()
+        self.assertEqual(set(changes), {("expense", "update"), ("tag", "delete")})
+        self.assertCountEqual(changes["expense", "update"], expense_ids)
+        self.assertEqual(changes["tag", "delete"], [tag.pk])
+        self.assertFalse(Expense.objects.filter(tag=tag).exists())
+        self.assertEqual(diff_rollups(self.family.pk), {})
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, cls.categories = seed_family(4, tags=2)
+        cls.user = User.objects.select_related("family").get(family_admin=cls.family)
+        cls.other_family, cls.other_categories = seed_family(2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, operations):
+        return self.client.post(
+            reverse("money:batch"), {"operations": operations}, format="json"
+        )
+
+    def category(self, title):
+        return {"title": title, "color": "00ff00", "icon": "plane", "limit": 100}
+
+    def expense(self, category, tag=None, amount="12.50"):
+        return {"category": category, "tag": tag, "amount": amount}
+
+    def test_temp_ids_across_groups(self):
+        operations = [
+            {
+                "op": "create",
+                "type": "category",
+                "temp_id": "c1",
+                "data": self.category("Trips"),
+            },
+            {
+                "op": "create",
+                "type": "tag",
+                "temp_id": "t1",
+                "data": {
+                    "title": "Flights",
+                    "color": "0000ff",
+                    "category": "c1",
+                },
+            },
+            {"op": "create", "type": "expense", "data": self.expense("c1", "t1")},
+            {"op": "create", "type": "expense", "data": self.expense("c1")},
+            {
+                "op": "update",
+                "type": "category",
+                "id": "c1",
+                "data": self.category("Travel"),
+            },
+            {"op": "delete", "type": "tag", "id": "t1"},
+        ]
+        response = self.post(operations)
+        self.assertEqual(response.status_code, 200, response.data)
+
+        results = response.data["results"]
+        category = Category.objects.get(pk=results[0]["id"], family=self.family)
+        tag = Tag.objects.get(pk=results[1]["id"], family=self.family)
+        self.assertEqual(
+            [result.get("temp_id") for result in results],
+            ["c1", "t1", None, None, None, None],
+        )
+        self.assertEqual(tag.category, category)
+        self.assertEqual(category.title, "Travel")
+        self.assertIsNotNone(tag.deleted_at)
+        for result in results[2:4]:
+            expense = Expense.objects.get(pk=result["id"])
+            self.assertEqual(expense.category, category)
+            # Detached by the tag's deletion.
+            self.assertIsNone(expense.tag)
+        self.assertEqual(
+            response.data["seq"], Family.objects.get(pk=self.family.pk).change_seq
+        )
+
+    def test_other_family_rejected(self):
+        other_expense = Expense.objects.filter(family=self.other_family).first()
+        for operations, index, field in (
+            (
+                [
+                    {
+                        "op": "create",
+                        "type": "expense",
+                        "data": self.expense(self.other_categories[0].pk),
+                    }
+                ],
+                0,
+                "category",
+            ),
+            (
+                [
+                    {
+                        "op": "create",
+                        "type": "expense",
+                        "data": self.expense(self.categories[0].pk),
+                    },
+                    {"op": "delete", "type": "expense", "id": str(other_expense.pk)},
+                ],
+                1,
+                "id",
+            ),
+        ):
+            with self.subTest(field=field):
+                response = self.post(operations)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data["index"], index)
+                self.assertIn(field, response.data["errors"])
+        self.assertIsNone(Expense.objects.get(pk=other_expense.pk).deleted_at)
+
+    def test_failure_rolls_back_everything(self):
+        expense = Expense.objects.filter(family=self.family).first()
+        seq = Family.objects.get(pk=self.family.pk).change_seq
+        expenses = Expense.objects.filter(family=self.family).count()
+
+        response = self.post(
+            [
+                {
+                    "op": "create",
+                    "type": "category",
+                    "temp_id": "c1",
+                    "data": self.category("Trips"),
+                },
+                {"op": "create", "type": "expense", "data": self.expense("c1")},
+                {"op": "delete", "type": "expense", "id": str(expense.pk)},
+                {
+                    "op": "create",
+                    "type": "expense",
+                    "data": self.expense(self.categories[0].pk, amount="not a number"),
+                },
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["index"], 3)
+        self.assertIn("amount", response.data["errors"])
+
+        self.assertEqual(Family.objects.get(pk=self.family.pk).change_seq, seq)
+        self.assertFalse(Category.objects.filter(title="Trips").exists())
+        self.assertEqual(Expense.objects.filter(family=self.family).count(), expenses)
+        self.assertIsNone(Expense.objects.get(pk=expense.pk).deleted_at)
+        self.assertFalse(
+            ChangeLog.objects.filter(family=self.family, seq__gt=seq).exists()
+        )
+
+
+@override_settings(EXPENSE_WRITE_COALESCING={"window_ms": 1000, "max_batch": 4})
+class WriteCoalescerTests(TransactionTestCase):
+    def test_failing_create_errors_alone(self):
+        with transaction.atomic():
+            family, categories = seed_family(0)
+        items = [
+            {"category": categories[0], "tag": None, "amount": Decimal(i)}
+            for i in range(4)
+        ]
+        # Overflows the column, failing the batch and then its own insert.
+        items[2]["amount"] = Decimal("1e20")
+
+        coalescer = get_write_coalescer()
+        results = [None] * len(items)
+        barrier = threading.Barrier(len(items))
+
+        def create(index):
+            barrier.wait()
+            try:
+                results[index] = coalescer.create(Expense, family, items[index])
+            except Exception as error:
+                results[index] = error
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=create, args=[index]) for index in range(len(items))
+        ]
+        with mock.patch.object(
+            services, "create_objects", wraps=services.create_objects
+        ) as create_objects:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # One batch of all four, then each on its own.
+        self.assertEqual(
+            [len(call.args[2]) for call in create_objects.call_args_list],
+            [4, 1, 1, 1, 1],
+        )
+        self.assertIsInstance(results[2], DataError)
+        for index in (0, 1, 3):
+            self.assertIsInstance(results[index], Expense)
+            self.assertEqual(results[index].amount, index)
+        self.assertEqual(
+            sorted(Expense.objects.filter(family=family).values_list("pk", flat=True)),
+            sorted(results[index].pk for index in (0, 1, 3)),
+        )
+        self.assertEqual(
+            ChangeLog.objects.filter(family=family, kind="expense").count(), 3
+        )
+
+
+class SyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, _ = seed_family(10, categories=2, tags=3)
+        cls.user = User.objects.select_related("family").get(family_admin=cls.family)
+        cls.expenses = list(Expense.objects.filter(family=cls.family).order_by("id"))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("money:sync")
+
+    def sync(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, data, key):
+        return {row["id"] for row in data[key]}
+
+    def test_pages_by_seq(self):
+        # Two categories, three tags and ten expenses, one change each.
+        seq, pages, expense_ids = 0, 0, set()
+        while True:
+            data = self.sync(since=seq, limit=4)
+            pages += 1
+            changed = sum(len(data[key]) for key in ("categories", "tags", "expenses"))
+            self.assertEqual(changed, data["seq"] - seq)
+            self.assertEqual(changed, 4 if data["has_more"] else 3)
+            expense_ids |= self.ids(data, "expenses")
+            seq = data["seq"]
+            if not data["has_more"]:
+                break
+
+        self.assertEqual(pages, 4)
+        self.assertEqual(seq, Family.objects.get(pk=self.family.pk).change_seq)
+        self.assertEqual(expense_ids, {expense.pk for expense in self.expenses})
+
+        data = self.sync(since=seq)
+        self.assertEqual(data["seq"], seq)
+        self.assertFalse(data["has_more"])
+        self.assertEqual(data["expenses"], [])
+
+    def test_changes_listed_once_in_their_latest_state(self):
+        since = Family.objects.get(pk=self.family.pk).change_seq
+        delete_expenses(self.expenses[:2])
+        delete_expenses(self.expenses[1:3])
+
+        data = self.sync(since=since)
+        self.assertEqual(data["seq"], since + 4)
+        self.assertEqual(
+            sorted(row["id"] for row in data["expenses"]),
+            [expense.pk for expense in self.expenses[:3]],
+        )
+        self.assertTrue(all(row["deleted_at"] for row in data["expenses"]))
+        self.assertEqual(data["tombstones"], [])
+
+    def test_tombstones(self):
+        since = Family.objects.get(pk=self.family.pk).change_seq
+        delete_expenses(self.expenses[:3])
+        self.sync(since=since + 3, device="phone")
+        archive_family(self.family.pk)
+
+        data = self.sync(since=since)
+        self.assertEqual(data["expenses"], [])
+        self.assertEqual(
+            [(row["type"], row["id"]) for row in data["tombstones"]],
+            [("expense", expense.pk) for expense in self.expenses[:3]],
+        )
+        self.assertTrue(all(row["deleted_at"] for row in data["tombstones"]))
+
+    def test_device_last_seq(self):
+        self.sync(since=5, device="phone")
+        self.sync(since=9, device="phone")
+        self.sync(since=2, device="tablet")
+        self.sync(since=12)
+        self.assertEqual(
+            dict(
+                DeviceSyncState.objects.filter(family=self.family).values_list(
+                    "device", "last_seq"
+                )
+            ),
+            {"phone": 9, "tablet": 2},
+        )
+
+    def test_invalid_params(self):
+        for params in (
+            {"since": "x"},
+            {"since": -1},
+            {"limit": "x"},
+            {"device": ""},
+            {"device": "x" * 65},
+        ):
+            with self.subTest(**params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+
+
+class ArchivalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, _ = seed_family(20)
+        cls.user = User.objects.select_related("family").get(family_admin=cls.family)
+        cls.expenses = list(Expense.objects.filter(family=cls.family).order_by("id"))
+
+    def sync_device(self):
+        seq = Family.objects.get(pk=self.family.pk).change_seq
+        DeviceSyncState.objects.update_or_create(
+            family=self.family, device="phone", defaults={"last_seq": seq}
+        )
+
+    def test_archives_deletions_synced_past(self):
+        delete_expenses(self.expenses[:7])
+        self.sync_device()
+        delete_expenses(self.expenses[7:9])
+
+        archived = archive_family(self.family.pk, batch_size=3)
+        self.assertEqual(archived, {"expense": 7, "tag": 0, "category": 0})
+        self.assertEqual(
+            set(Tombstone.objects.values_list("object_id", flat=True)),
+            {expense.pk for expense in self.expenses[:7]},
+        )
+        self.assertEqual(
+            Expense.objects.filter(family=self.family).count(), len(self.expenses) - 7
+        )
+
+        # Nothing left below the watermark.
+        archived = archive_family(self.family.pk, batch_size=3)
+        self.assertEqual(archived, {"expense": 0, "tag": 0, "category": 0})
+
+    def test_last_sync_time_lists_tombstones(self):
+        last_sync_time = (timezone.now() - timedelta(hours=1)).isoformat()
+        delete_expenses(self.expenses[:3])
+        self.sync_device()
+        archive_family(self.family.pk)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse("money:expense-list")
+        params = {"last_sync_time": last_sync_time, "page_size": 1}
+
+        response = client.get(url, params)
+        self.assertEqual(
+            [tombstone["id"] for tombstone in response.data["tombstones"]],
+            [expense.pk for expense in self.expenses[:3]],
+        )
+        # Only the first page lists them.
+        response = client.get(response.data["next"])
+        self.assertNotIn("tombstones", response.data)
+
+        response = client.get(url)
+        self.assertNotIn("tombstones", response.data)
+
+
+SHARED_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": "/tmp/fire-fruit-money-tests",
+    },
+}
+
+
+@override_settings(WEB_CONCURRENCY=4, CACHES=SHARED_CACHES)
+class SharedChangeStreamCheckTests(SimpleTestCase):
+    def check_ids(self):
+        return [error.id for error in check_shared_change_streams()]
+
+    def test_process_local(self):
+        self.assertEqual(self.check_ids(), ["money.E003", "money.E004"])
+
+    @override_settings(STREAM_TICKETS={"alias": "shared", "timeout": 30})
+    def test_shared_tickets(self):
+        self.assertEqual(self.check_ids(), ["money.E003"])
+
+    @override_settings(WEB_CONCURRENCY=1)
+    def test_single_worker(self):
+        self.assertEqual(self.check_ids(), [])
+
+
+def async_read_urlconf():
+    """The money and users viewsets' routes, built with `ASYNC_READ_VIEWS`."""
+    urlconf = ModuleType("async_read_urlconf")
+    urlconf.urlpatterns = []
+    with override_settings(ASYNC_READ_VIEWS=True):
+        for prefix, app in (("api/money/", money_urls), ("api/users/", users_urls)):
+            router = DefaultRouter()
+            for args in app.router.registry:
+                router.register(*args)
+            urlconf.urlpatterns.append(
+                path(prefix, include((router.urls, app.app_name)))
+            )
+    return urlconf
+
+
+@override_settings(
+    RESPONSE_CACHE={"BACKEND": "fire_fruit_money.cache.LRUResponseCache"}
+)
+class AsyncReadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.urlconf = async_read_urlconf()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.family, _ = seed_family(20, deleted_every=5)
+        cls.user = User.objects.get(family_admin=cls.family)
+        cls.expense = Expense.objects.filter(family=cls.family).latest("id")
+
+    def setUp(self):
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def get_urls(self):
+        return [
+            reverse("money:category-list"),
+            reverse("money:tag-list"),
+            reverse("money:expense-list") + "?page_size=7&shape=columnar",
+            reverse("money:expense-list") + "?omit=family,tag",
+            reverse("money:expense-list") + "?last_sync_time=2000-01-01T00:00:00Z",
+            reverse("money:expense-detail", args=[self.expense.pk]),
+            reverse("money:expense-detail", args=[self.expense.pk]) + "?fields=id",
+            reverse("users:families-list"),
+            reverse("users:families-detail", args=[self.family.pk]),
+            reverse("users:invites-list"),
+        ]
+
+    def test_middleware_is_async_capable(self):
+        for name in settings.MIDDLEWARE:
+            with self.subTest(middleware=name):
+                self.assertTrue(getattr(import_string(name), "async_capable", False))
+
+    async def test_same_responses_as_sync(self):
+        urls = self.get_urls()
+        expected = [
+            (await AsyncClient().get(url, headers=self.headers)).json() for url in urls
+        ]
+
+        adispatch = mock.patch.object(
+            AsyncReadMixin,
+            "adispatch",
+            autospec=True,
+            side_effect=AsyncReadMixin.adispatch,
+        )
+        with override_settings(ROOT_URLCONF=self.urlconf), adispatch as adispatch:
+            for url, body in zip(urls, expected):
+                with self.subTest(url=url):
+                    # A fresh cache, so the response is built by the async view.
+                    with override_settings(
+                        RESPONSE_CACHE={
+                            "BACKEND": "fire_fruit_money.cache.LRUResponseCache"
+                        }
+                    ):
+                        response = await AsyncClient().get(url, headers=self.headers)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(response.json(), body)
+        self.assertEqual(adispatch.call_count, len(urls))
+
+    def test_cache_and_etag(self):
+        url = reverse("money:expense-list")
+        get = async_to_sync(AsyncClient().get)
+        with override_settings(ROOT_URLCONF=self.urlconf):
+            response = get(url, headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+
+            # Only the family's change state is read.
+            with self.assertNumQueries(1):
+                cached = get(url, headers=self.headers)
+            self.assertEqual(cached.content, response.content)
+
+            with self.assertNumQueries(1):
+                response = get(
+                    url, headers={**self.headers, "If-None-Match": response["ETag"]}
+                )
+            self.assertEqual(response.status_code, 304)
+
+    def test_streams_asynchronously(self):
+        async def get(url):
+            response = await AsyncClient().get(url, headers=self.headers)
+            self.assertTrue(response.is_async)
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        for query in ("?stream=ndjson", "?stream=json&shape=columnar&omit=tag"):
+            url = reverse("money:expense-list") + query
+            with self.subTest(query=query):
+                response = self.client.get(url, headers=self.headers)
+                self.assertFalse(response.is_async)
+                with override_settings(ROOT_URLCONF=self.urlconf):
+                    content = async_to_sync(get)(url)
+                self.assertEqual(content, b"".join(response.streaming_content))
+
+    async def test_errors_match_sync(self):
+        missing = reverse("money:expense-detail", args=[0])
+        cases = [
+            (reverse("money:expense-list"), {}),
+            (reverse("money:expense-list") + "?cursor=x", self.headers),
+            (reverse("money:expense-list") + "?shape=x", self.headers),
+            (missing, self.headers),
+        ]
+        expected = [
+            await AsyncClient().get(url, headers=headers) for url, headers in cases
+        ]
+
+        with override_settings(ROOT_URLCONF=self.urlconf):
+            for (url, headers), sync in zip(cases, expected):
+                with self.subTest(url=url):
+                    response = await AsyncClient().get(url, headers=headers)
+                    self.assertEqual(response.status_code, sync.status_code)
+                    self.assertEqual(response.json(), sync.json())
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class PartitioningTests(SimpleTestCase):
+    def test_next_start(self):
+        self.assertEqual(next_start(utc(2024, 11, 1), "month"), utc(2024, 12, 1))
+        self.assertEqual(next_start(utc(2024, 12, 1), "month"), utc(2025, 1, 1))
+        self.assertEqual(next_start(utc(2024, 1, 1), "year"), utc(2025, 1, 1))
+
+    def test_partition_starts(self):
+        # Bounds inside a partition include it, whatever their time zone.
+        first = datetime(2025, 1, 1, 0, 30, tzinfo=dt_timezone(timedelta(hours=2)))
+        self.assertEqual(
+            list(partition_starts(first, utc(2025, 2, 10), "month")),
+            [utc(2024, 12, 1), utc(2025, 1, 1), utc(2025, 2, 1)],
+        )
+        self.assertEqual(
+            list(partition_starts(utc(2023, 6, 1), utc(2025, 1, 1), "year")),
+            [utc(2023, 1, 1), utc(2024, 1, 1), utc(2025, 1, 1)],
+        )
+        self.assertEqual(
+            list(partition_starts(utc(2025, 3, 1), utc(2025, 2, 1), "month")), []
+        )
+
+    def test_partition_interval(self):
+        self.assertEqual(
+            partition_interval(["money_expense_default", "money_expense_p2025_01"]),
+            "month",
+        )
+        self.assertEqual(partition_interval(["money_expense_p2025"]), "year")
+        self.assertIsNone(partition_interval(["money_expense_default"]))
+
+
+@mock.patch("money.checks.connection")
+class ExpensePartitioningCheckTests(SimpleTestCase):
+    def check_ids(self, connection, vendor="postgresql", names=None):
+        connection.vendor = vendor
+        with (
+            mock.patch("money.checks.is_partitioned", return_value=names is not None),
+            mock.patch("money.checks.partition_names", return_value=names or []),
+        ):
+            return [
+                error.id for error in check_expense_partitioning(databases=["default"])
+            ]
+
+    def yearly_names(self, *years):
+        return ["money_expense_default"] + [f"money_expense_p{y}" for y in years]
+
+    @override_settings(EXPENSE_PARTITIONING=None)
+    def test_unset(self, connection):
+        self.assertEqual(self.check_ids(connection, vendor="sqlite"), [])
+        self.assertEqual(self.check_ids(connection), [])
+
+    @override_settings(EXPENSE_PARTITIONING="year")
+    def test_requires_postgresql(self, connection):
+        self.assertEqual(self.check_ids(connection, vendor="sqlite"), ["money.E002"])
+
+    @override_settings(EXPENSE_PARTITIONING="month")
+    def test_monthly_refused(self, connection):
+        self.assertEqual(self.check_ids(connection), ["money.E005"])
+
+    @override_settings(EXPENSE_PARTITIONING="year")
+    def test_not_partitioned(self, connection):
+        self.assertEqual(self.check_ids(connection), ["money.W001"])
+
+    @override_settings(EXPENSE_PARTITIONING=None)
+    def test_partitioned_but_unset(self, connection):
+        names = self.yearly_names(2025)
+        self.assertEqual(self.check_ids(connection, names=names), ["money.E001"])
+
+    @override_settings(EXPENSE_PARTITIONING="year")
+    def test_interval_mismatch(self, connection):
+        names = ["money_expense_default", "money_expense_p2025_01"]
+        self.assertEqual(self.check_ids(connection, names=names), ["money.E001"])
+
+    @override_settings(EXPENSE_PARTITIONING="year")
+    def test_next_partition(self, connection):
+        year = timezone.now().year
+        names = self.yearly_names(year)
+        self.assertEqual(self.check_ids(connection, names=names), ["money.W002"])
+        names = self.yearly_names(year, year + 1)
+        self.assertEqual(self.check_ids(connection, names=names), [])
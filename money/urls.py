@@ -1,7 +1,16 @@
 from django.urls import path, include
 from rest_framework import routers
 
-from money.views import CategoryViewSet, TagViewSet, ExpenseViewSet
+from money.views import (
+    CategoryViewSet,
+    TagViewSet,
+    ExpenseViewSet,
+    SyncView,
+    BatchView,
+    SnapshotView,
+    ChangeStreamView,
+    ChangeStreamTicketView,
+)
 
 router = routers.DefaultRouter()
 
@@ -10,6 +19,11 @@ router.register("tag", TagViewSet, basename="tag")
 router.register("expense", ExpenseViewSet, basename="expense")
 
 urlpatterns = [
+    path("sync/", SyncView.as_view(), name="sync"),
+    path("batch/", BatchView.as_view(), name="batch"),
+    path("snapshot/", SnapshotView.as_view(), name="snapshot"),
+    path("events/", ChangeStreamView.as_view(), name="events"),
+    path("events/ticket/", ChangeStreamTicketView.as_view(), name="events-ticket"),
     path("", include(router.urls)),
 ]
 
@@ -1,9 +1,52 @@
-from django.db import transaction
-from django.utils import timezone
-from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import viewsets
-
-from money.models import Category, Tag, Expense
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
+from rest_framework import generics, status, viewsets
+from rest_framework.decorators import action as action_decorator
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from fire_fruit_money.async_views import AsyncReadMixin
+from fire_fruit_money.cache import FamilyResponseCacheMixin, get_response_cache
+from fire_fruit_money.conditional import family_change_state, family_condition
+from money import services
+from money.aggregations import category_spending
+from money.batch import BatchError, BatchProcessor
+from money.coalescing import get_write_coalescer
+from money.events import format_event, get_broker
+from money.fastpath import (
+    CATEGORY_LIST,
+    TAG_LIST,
+    EXPENSE_LIST,
+    SHAPES,
+    FastListMixin,
+    datetime_formatter,
+)
+from money.models import Category, Tag, Expense, ChangeLog, DeviceSyncState, Tombstone
+from money.pagination import KeysetPagination
+from money.snapshot import (
+    Snapshot,
+    accepts_gzip,
+    afile_chunks,
+    file_chunks,
+    snapshot_cache_key,
+    snapshot_condition,
+)
+from money.streaming import (
+    STREAM_FORMATS,
+    aserialized_rows,
+    serialized_rows,
+    streaming_response,
+)
+from users.authentication import aauthenticate_jwt, issue_stream_ticket
+from users.models import Family
 from money.serializers import (
     CategorySerializer,
     CategoryListSerializer,
@@ -11,34 +54,164 @@ from money.serializers import (
     TagListSerializer,
     ExpenseListSerializer,
     ExpenseSerializer,
+    ExpenseDateRangeSerializer,
+    SpendingQuerySerializer,
+    CategorySpendingSerializer,
+    BatchSerializer,
 )
 
 
-class BaseMoneyViewSet(viewsets.ModelViewSet):
+class BaseMoneyViewSet(FamilyResponseCacheMixin, FastListMixin, AsyncReadMixin, viewsets.ModelViewSet):
     """A base ViewSet that provides common functionality for money-related views."""
 
+    pagination_class = KeysetPagination
+
     def queryset_last_sync_time_filter(self, queryset):
         last_sync_time = self.request.query_params.get("last_sync_time")
         if last_sync_time:
             queryset = queryset.filter(updated_at__gte=last_sync_time)
         return queryset
 
+    def get_tombstones(self):
+        """
+        `(object_id, deleted_at)` of the rows deleted at or after `last_sync_time`
+        that have been archived since, listed on the first page only; `None`
+        without `last_sync_time`.
+        """
+        params = self.request.query_params
+        last_sync_time = params.get("last_sync_time")
+        if not last_sync_time or params.get(self.paginator.cursor_query_param):
+            return None
+
+        tombstones = Tombstone.objects.filter(
+            kind=self.basename, deleted_at__gte=last_sync_time
+        )
+        if not self.request.user.is_staff:
+            tombstones = tombstones.filter(family=self.request.user.family)
+        return tombstones.order_by("object_id").values_list("object_id", "deleted_at")
+
+    def format_tombstones(self, tombstones):
+        format_datetime = datetime_formatter()
+        return [
+            {
+                "type": self.basename,
+                "id": object_id,
+                "deleted_at": format_datetime(deleted_at),
+            }
+            for object_id, deleted_at in tombstones
+        ]
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        tombstones = self.get_tombstones()
+        if tombstones is not None:
+            response.data["tombstones"] = self.format_tombstones(tombstones)
+        return response
+
+    async def aget_paginated_response(self, data):
+        response = await super().aget_paginated_response(data)
+        tombstones = self.get_tombstones()
+        if tombstones is not None:
+            response.data["tombstones"] = self.format_tombstones(
+                [row async for row in tombstones]
+            )
+        return response
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
                 name="last_sync_time",
                 type=str,
-                description="Filter by last sync time in ISO 8601 format. Example: `?last_sync_time=2025-01-02T14:05:21Z` (UTC).",
-            )
+                description="Filter by last sync time in ISO 8601 format. Example: `?last_sync_time=2025-01-02T14:05:21Z` (UTC). Rows deleted since then and already archived are listed under `tombstones` on the first page; streamed responses leave them out, so streaming clients should use `/sync/` instead.",
+            ),
+            OpenApiParameter(
+                name="fields",
+                type=str,
+                description="Comma separated fields to return, e.g. `?fields=id,category,amount,date_time`.",
+            ),
+            OpenApiParameter(
+                name="omit",
+                type=str,
+                description="Comma separated fields to leave out. Cannot be combined with `fields`.",
+            ),
+            OpenApiParameter(
+                name="shape",
+                type=str,
+                enum=list(SHAPES),
+                description="`columnar` returns the field names once under `columns` and each row as an array under `rows`.",
+            ),
+            OpenApiParameter(
+                name="stream",
+                type=str,
+                enum=list(STREAM_FORMATS),
+                description="Stream every matching row unpaginated, as a JSON array or as NDJSON (one object per line).",
+            ),
         ]
     )
+    @family_condition
     def list(self, request, *args, **kwargs):
+        stream_format = request.query_params.get("stream")
+        if stream_format is not None:
+            return self.stream_list(stream_format)
         return super().list(request, *args, **kwargs)
 
+    @family_condition
+    async def alist(self, request, *args, **kwargs):
+        stream_format = request.query_params.get("stream")
+        if stream_format is not None:
+            # Nothing is queried before the body is iterated.
+            return self.stream_list(stream_format, asynchronous=True)
+        return await super().alist(request, *args, **kwargs)
+
+    def stream_list(self, stream_format, asynchronous=False):
+        """
+        Stream every matching row. `asynchronous` reads them with `aiterator()`,
+        so that under ASGI the body is sent as it is read.
+        """
+        if stream_format not in STREAM_FORMATS:
+            raise ValidationError(
+                {"stream": f"Must be one of: {', '.join(STREAM_FORMATS)}."}
+            )
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by(
+            *KeysetPagination.ordering
+        )
+        if self.fast_list is None:
+            serialize = aserialized_rows if asynchronous else serialized_rows
+            rows = serialize(self.get_serializer(), queryset)
+            return streaming_response(rows, stream_format)
+
+        fast_list = self.get_fast_list()
+        columnar = self.is_columnar()
+        format_row = fast_list.row_formatter(columnar=columnar)
+        values = fast_list.values(queryset)
+        if asynchronous:
+            rows = (format_row(row) async for row in values.aiterator(chunk_size=2000))
+        else:
+            rows = map(format_row, values.iterator(chunk_size=2000))
+        return streaming_response(
+            rows, stream_format, columns=fast_list.names if columnar else None
+        )
+
+    def perform_create(self, serializer):
+        (serializer.instance,) = services.create_objects(
+            serializer.Meta.model,
+            self.request.user.family,
+            [serializer.validated_data],
+        )
+
+    def perform_update(self, serializer):
+        services.update_objects(
+            serializer.Meta.model,
+            [(serializer.instance, serializer.validated_data)],
+        )
+
 
 class CategoryViewSet(BaseMoneyViewSet):
+    fast_list = CATEGORY_LIST
+
     def get_queryset(self):
-        queryset = Category.objects.select_related("family")
+        queryset = Category.objects.select_related("family__admin")
         if not self.request.user.is_staff:
             queryset = queryset.filter(family=self.request.user.family)
 
@@ -53,31 +226,37 @@ class CategoryViewSet(BaseMoneyViewSet):
             else CategorySerializer
         )
 
-    def perform_create(self, serializer):
-        serializer.save(family=self.request.user.family)
-
-    @transaction.atomic
     def perform_destroy(self, instance):
-        tags = instance.tags.all()
-        expenses = instance.expenses.all()
+        services.delete_category(instance)
 
-        if expenses:
-            for expense in expenses:
-                expense.deleted_at = timezone.now()
-                expense.save()
+    @extend_schema(
+        parameters=[SpendingQuerySerializer],
+        responses=CategorySpendingSerializer(many=True),
+    )
+    @action_decorator(
+        methods=["GET"],
+        detail=False,
+        url_path="spending",
+    )
+    def spending(self, request):
+        """
+        Spending against the limit of every category of the user's family.
 
-        if tags:
-            for tag in tags:
-                tag.deleted_at = timezone.now()
-                tag.save()
+        Totals are computed in the database over `[start, end)` (default: the
+        current month) and also broken down by `period`.
+        """
+        query = SpendingQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
 
-        instance.deleted_at = timezone.now()
-        instance.save()
+        results = category_spending(request.user.family, **query.validated_data)
+        return Response(CategorySpendingSerializer(results, many=True).data)
 
 
 class TagViewSet(BaseMoneyViewSet):
+    fast_list = TAG_LIST
+
     def get_queryset(self):
-        queryset = Tag.objects.select_related("family", "category")
+        queryset = Tag.objects.select_related("family__admin", "category")
         if not self.request.user.is_staff:
             queryset = queryset.filter(family=self.request.user.family)
 
@@ -90,34 +269,41 @@ class TagViewSet(BaseMoneyViewSet):
             TagListSerializer if self.action in ("list", "retrieve") else TagSerializer
         )
 
-    def perform_create(self, serializer):
-        serializer.save(family=self.request.user.family)
-
-    @transaction.atomic
     def perform_destroy(self, instance):
-        expenses = instance.expenses.all()
-
-        if expenses:
-            for expense in expenses:
-                expense.tag = None
-                expense.updated_at = timezone.now()
-                expense.save()
-
-        instance.deleted_at = timezone.now()
-        instance.save()
+        services.delete_tag(instance)
 
 
+@extend_schema_view(
+    list=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="date_from",
+                type=OpenApiTypes.DATETIME,
+                description="Only expenses dated at or after this time (ISO 8601).",
+            ),
+            OpenApiParameter(
+                name="date_to",
+                type=OpenApiTypes.DATETIME,
+                description="Only expenses dated before this time (ISO 8601).",
+            ),
+        ]
+    )
+)
 class ExpenseViewSet(BaseMoneyViewSet):
+    fast_list = EXPENSE_LIST
+
     def get_queryset(self):
-        queryset = Expense.objects.select_related(
-            "family", "category"
-        ).prefetch_related("tag")
+        queryset = Expense.objects.select_related("family__admin", "category", "tag")
 
         if not self.request.user.is_staff:
             queryset = queryset.filter(family=self.request.user.family)
 
         queryset = self.queryset_last_sync_time_filter(queryset)
 
+        date_range = ExpenseDateRangeSerializer(data=self.request.query_params)
+        date_range.is_valid(raise_exception=True)
+        queryset = date_range.filter(queryset)
+
         return queryset
 
     def get_serializer_class(self):
@@ -128,8 +314,305 @@ class ExpenseViewSet(BaseMoneyViewSet):
         )
 
     def perform_create(self, serializer):
-        serializer.save(family=self.request.user.family)
+        coalescer = get_write_coalescer()
+        if coalescer is None:
+            return super().perform_create(serializer)
+        serializer.instance = coalescer.create(
+            Expense, self.request.user.family, serializer.validated_data
+        )
 
     def perform_destroy(self, instance):
-        instance.deleted_at = timezone.now()
-        instance.save()
+        services.delete_expenses([instance])
+
+
+class SyncView(generics.GenericAPIView):
+    """
+    Delta sync based on the family change log.
+
+    Returns the current state of every category, tag and expense changed after
+    sequence number `since`, together with the sequence number the client should
+    send next time. Deleted objects that have since been archived are listed
+    under `tombstones`. Clients that send a `device` id record how far they
+    have synced, which lets deleted rows be archived.
+    """
+
+    default_limit = 1000
+    max_limit = 5000
+
+    def get_int_param(self, name, default):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError({name: "Must be an integer."})
+        if value < 0:
+            raise ValidationError({name: "Must not be negative."})
+        return value
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="since",
+                type=int,
+                description="Return changes after this sequence number. Use `0` for a full sync.",
+            ),
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                description="Maximum number of change log entries to consume per call.",
+            ),
+            OpenApiParameter(
+                name="device",
+                type=str,
+                description="Stable id of the syncing device, at most 64 characters.",
+            ),
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    def get(self, request, *args, **kwargs):
+        since = self.get_int_param("since", 0)
+        limit = min(self.get_int_param("limit", self.default_limit), self.max_limit)
+        family = request.user.family
+
+        device = request.query_params.get("device")
+        if device is not None:
+            if not 0 < len(device) <= 64:
+                raise ValidationError({"device": "Must be 1 to 64 characters."})
+            # Asking for changes after `since` confirms everything up to it.
+            DeviceSyncState.objects.update_or_create(
+                family=family, device=device, defaults={"last_seq": since}
+            )
+
+        changes = list(
+            ChangeLog.objects.filter(family=family, seq__gt=since)
+            .order_by("seq")
+            .values_list("seq", "kind", "object_id")[: limit + 1]
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        changed_ids = defaultdict(set)
+        for _, kind, object_id in changes:
+            changed_ids[kind].add(object_id)
+
+        categories = Category.objects.select_related("family__admin").filter(
+            family=family, pk__in=changed_ids["category"]
+        )
+        tags = Tag.objects.select_related("family__admin", "category").filter(
+            family=family, pk__in=changed_ids["tag"]
+        )
+        expenses = Expense.objects.select_related(
+            "family__admin", "category", "tag"
+        ).filter(family=family, pk__in=changed_ids["expense"])
+        data = {
+            "categories": CategoryListSerializer(categories, many=True).data,
+            "tags": TagListSerializer(tags, many=True).data,
+            "expenses": ExpenseListSerializer(expenses, many=True).data,
+        }
+
+        # Changed objects missing from their table have been archived.
+        missing = Q()
+        for kind, key in (
+            ("category", "categories"),
+            ("tag", "tags"),
+            ("expense", "expenses"),
+        ):
+            ids = changed_ids[kind] - {row["id"] for row in data[key]}
+            if ids:
+                missing |= Q(kind=kind, object_id__in=ids)
+        format_datetime = datetime_formatter()
+        tombstones = (
+            Tombstone.objects.filter(missing, family=family)
+            .order_by("kind", "object_id")
+            .values("kind", "object_id", "deleted_at")
+            if missing
+            else ()
+        )
+
+        return Response(
+            {
+                "seq": changes[-1][0] if changes else since,
+                "has_more": has_more,
+                **data,
+                "tombstones": [
+                    {
+                        "type": tombstone["kind"],
+                        "id": tombstone["object_id"],
+                        "deleted_at": format_datetime(tombstone["deleted_at"]),
+                    }
+                    for tombstone in tombstones
+                ],
+            }
+        )
+
+
+class BatchView(generics.GenericAPIView):
+    """
+    Apply an ordered list of create, update and delete operations atomically.
+
+    Either every operation is applied or none is. On success the response lists
+    one result per operation and the family's change sequence afterwards.
+    """
+
+    serializer_class = BatchSerializer
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        family = request.user.family
+        processor = BatchProcessor(family, context=self.get_serializer_context())
+        try:
+            results = processor.run(serializer.validated_data["operations"])
+        except BatchError as error:
+            return Response(
+                {
+                    "detail": "No operation was applied.",
+                    "index": error.index,
+                    "errors": error.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        family.refresh_from_db(fields=["change_seq"])
+        return Response({"seq": family.change_seq, "results": results})
+
+
+class SnapshotView(generics.GenericAPIView):
+    """
+    Every live category, tag and expense of the family, read consistently.
+
+    The response is gzip-compressed when the client accepts it and carries the
+    change sequence `seq` the rows are current as of; pass it as `since` to the
+    delta sync. Snapshots up to `SNAPSHOT_CACHE_MAX_BYTES` are kept in the
+    response cache until the family changes; larger ones are spooled to disk
+    and streamed from there.
+    """
+
+    content_type = "application/json"
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    @snapshot_condition
+    def get(self, request, *args, **kwargs):
+        family_id = request.user.family_id
+        encoding = "gzip" if accepts_gzip(request) else "identity"
+
+        response = None
+        state = family_change_state(request)
+        if state is not None:
+            entry = get_response_cache().get(
+                snapshot_cache_key(family_id, state[0], encoding)
+            )
+            if entry is not None:
+                response = HttpResponse(entry[0], content_type=entry[1])
+
+        if response is None:
+            max_bytes = settings.SNAPSHOT_CACHE_MAX_BYTES
+            snapshot = Snapshot(family_id)
+            file, size = snapshot.build(encoding, max_memory=max_bytes)
+            if size <= max_bytes:
+                with file:
+                    body = file.read()
+                get_response_cache().set(
+                    snapshot_cache_key(family_id, snapshot.seq, encoding),
+                    (body, self.content_type),
+                )
+                response = HttpResponse(body, content_type=self.content_type)
+            else:
+                if isinstance(request._request, ASGIRequest):
+                    chunks = afile_chunks(file)
+                else:
+                    chunks = file_chunks(file)
+                response = StreamingHttpResponse(chunks, content_type=self.content_type)
+                response["Content-Length"] = size
+
+        if encoding == "gzip":
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+class ChangeStreamTicketView(generics.GenericAPIView):
+    """
+    A single-use ticket authenticating one `/events/?ticket=` connection.
+
+    `EventSource` cannot send an `Authorization` header; the ticket keeps the
+    access token out of the URL and so out of access logs. It expires after
+    `STREAM_TICKETS["timeout"]` seconds; every reconnect needs a new one.
+    """
+
+    @extend_schema(request=None, responses=OpenApiTypes.OBJECT)
+    def post(self, request, *args, **kwargs):
+        return Response(
+            {
+                "ticket": issue_stream_ticket(str(request.auth)),
+                "expires_in": settings.STREAM_TICKETS["timeout"],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class ChangeStreamView(View):
+    """
+    Server-Sent Events stream of the family's changes.
+
+    A `hello` event carries the family's current change sequence on connect,
+    then every write by any member produces a `change` event with its last
+    sequence number, kind, action and ids (`null` for large changes). A `resync`
+    event means notifications were dropped because the client fell behind. In
+    every case the client catches up with `/sync/?since=<its last seq>`.
+
+    Authenticates with a bearer access token, or for `EventSource` clients with
+    `?ticket=` and a ticket from `/events/ticket/`. Serve it through ASGI: each
+    idle stream costs a queue, not a thread.
+    """
+
+    heartbeat_interval = 15
+    retry_ms = 5000
+
+    async def get(self, request, *args, **kwargs):
+        user = await aauthenticate_jwt(request, ticket_param="ticket")
+        if user is None or not user.family_id:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        response = StreamingHttpResponse(
+            self.stream(user.family_id), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, family_id):
+        broker = get_broker()
+        # Subscribe before reading the sequence so no change falls in between.
+        subscription = broker.subscribe(family_id)
+        try:
+            seq = await Family.objects.values_list("change_seq", flat=True).aget(
+                pk=family_id
+            )
+            yield f"retry: {self.retry_ms}\n\n".encode()
+            yield format_event({"seq": seq}, event="hello", event_id=seq)
+
+            while True:
+                event = await subscription.get(self.heartbeat_interval)
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    # Queued events lag behind the dropped ones.
+                    seq = await Family.objects.values_list(
+                        "change_seq", flat=True
+                    ).aget(pk=family_id)
+                    yield format_event({"seq": seq}, event="resync", event_id=seq)
+                elif event is None:
+                    yield b": keepalive\n\n"
+                else:
+                    yield format_event(event, event="change", event_id=event["seq"])
+        finally:
+            broker.unsubscribe(subscription)
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from monitoring.models import SlowQuery
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ("fingerprint", "calls", "total_ms", "max_ms", "last_seen")
+    readonly_fields = ("fingerprint", "statement", "plan", "plan_sql")
+    search_fields = ("statement",)
@@ -0,0 +1,164 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from money.management.seed import seed_family
+from money.models import Expense
+from monitoring.metrics import registry
+from monitoring.middleware import MetricsMiddleware, QueryTimer
+from users.models import User
+
+METRICS_MIDDLEWARE = "monitoring.middleware.MetricsMiddleware"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure what the metrics middleware adds to a request: time the same "
+        "requests through the test client with and without it, alternating "
+        "rounds and keeping each side's best round. The fixed cost of the "
+        "middleware and of the query wrapper is measured on its own first, since "
+        "it is smaller than the noise of a full request. The seeded family is "
+        "deleted afterwards and the recorded metrics are reset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Requests per endpoint and round.",
+        )
+        parser.add_argument("--rounds", type=int, default=10)
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=1,
+            help="Client threads sending the requests of a round concurrently.",
+        )
+        parser.add_argument(
+            "--response-cache",
+            action="store_true",
+            help="Keep the response cache enabled; cached responses make the "
+            "middleware's share of a request larger.",
+        )
+        parser.add_argument("--expenses", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with_metrics = list(settings.MIDDLEWARE)
+        if METRICS_MIDDLEWARE not in with_metrics:
+            with_metrics.insert(0, METRICS_MIDDLEWARE)
+        without_metrics = [m for m in with_metrics if m != METRICS_MIDDLEWARE]
+
+        overrides = {}
+        if not options["response_cache"]:
+            overrides["RESPONSE_CACHE"] = {
+                "BACKEND": "fire_fruit_money.cache.LRUResponseCache",
+                "OPTIONS": {"max_bytes": 0},
+            }
+
+        try:
+            self.measure_fixed_cost()
+        finally:
+            registry.reset()
+
+        with transaction.atomic():
+            family, _ = seed_family(options["expenses"])
+        user = User.objects.get(family=family)
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        expense_id = Expense.objects.filter(family=family).values_list("pk", flat=True)[
+            0
+        ]
+        endpoints = (
+            ("me", "/api/users/me/"),
+            ("expense retrieve", f"/api/money/expense/{expense_id}/"),
+            ("expense list", "/api/money/expense/?page_size=100"),
+        )
+
+        self.stdout.write(
+            f"{'endpoint':>18} {'without µs':>11} {'with µs':>9} {'overhead µs':>12} "
+            f"{'overhead':>9}"
+        )
+        try:
+            with override_settings(**overrides):
+                for name, path in endpoints:
+                    best = {}
+                    for _ in range(options["rounds"]):
+                        for label, middleware in (
+                            ("without", without_metrics),
+                            ("with", with_metrics),
+                        ):
+                            with override_settings(MIDDLEWARE=middleware):
+                                elapsed = self.run_round(path, headers, options)
+                            best[label] = min(best.get(label, elapsed), elapsed)
+
+                    without, with_ = (
+                        best["without"] * 1e6 / options["requests"],
+                        best["with"] * 1e6 / options["requests"],
+                    )
+                    self.stdout.write(
+                        f"{name:>18} {without:>11.1f} {with_:>9.1f} "
+                        f"{with_ - without:>12.1f} {(with_ / without - 1) * 100:>8.1f}%"
+                    )
+        finally:
+            # Cascades to the family and everything in it.
+            user.delete()
+            registry.reset()
+
+    def measure_fixed_cost(self, calls=100000):
+        request = RequestFactory().get("/api/money/expense/")
+        response = HttpResponse(b"x" * 1000)
+        view = lambda request: response  # noqa: E731
+        middleware = MetricsMiddleware(view)
+
+        def per_call(function, count=calls):
+            start = time.perf_counter()
+            for _ in range(count):
+                function(request)
+            return (time.perf_counter() - start) * 1e6 / count
+
+        cost = per_call(middleware) - per_call(view)
+        self.stdout.write(f"Middleware cost per request: {cost:.2f} µs")
+
+        with connection.cursor() as cursor:
+
+            def query(request):
+                cursor.execute("SELECT 1")
+
+            plain = per_call(query, calls // 10)
+            with connection.execute_wrapper(QueryTimer()):
+                wrapped = per_call(query, calls // 10)
+        self.stdout.write(f"Query wrapper cost per query: {wrapped - plain:.2f} µs\n")
+
+    def run_round(self, path, headers, options):
+        clients = [Client(headers=headers) for _ in range(options["threads"])]
+        for client in clients:
+            # Builds the middleware chain outside the timed requests.
+            assert client.get(path).status_code == 200
+
+        def send(client, count):
+            for _ in range(count):
+                assert client.get(path).status_code == 200
+
+        per_client = [
+            options["requests"] // len(clients)
+            + (index < options["requests"] % len(clients))
+            for index in range(len(clients))
+        ]
+        start = time.perf_counter()
+        if len(clients) == 1:
+            send(clients[0], per_client[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+                for future in [
+                    pool.submit(send, client, count)
+                    for client, count in zip(clients, per_client)
+                ]:
+                    future.result()
+        return time.perf_counter() - start
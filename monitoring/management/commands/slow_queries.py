@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.models import SlowQuery
+
+ORDERINGS = ("total_ms", "max_ms", "calls", "last_seen")
+
+
+class Command(BaseCommand):
+    help = (
+        "List the slow statements recorded per fingerprint, most expensive "
+        "first, or show one fingerprint with its latest sampled plan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "fingerprint",
+            nargs="?",
+            help="Show this fingerprint (or a unique prefix of it) in full.",
+        )
+        parser.add_argument("--ordering", choices=ORDERINGS, default="total_ms")
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument(
+            "--plans",
+            action="store_true",
+            help="Print the latest plan of every listed statement.",
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Delete everything recorded so far.",
+        )
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} fingerprints."))
+            return
+
+        if options["fingerprint"]:
+            matches = list(
+                SlowQuery.objects.filter(
+                    fingerprint__startswith=options["fingerprint"]
+                )[:2]
+            )
+            if len(matches) != 1:
+                raise CommandError(
+                    f"{'No' if not matches else 'More than one'} fingerprint "
+                    f"starts with {options['fingerprint']!r}."
+                )
+            self.write_query(matches[0], plan=True)
+            return
+
+        queries = SlowQuery.objects.order_by(f"-{options['ordering']}")[
+            : options["limit"]
+        ]
+        self.stdout.write(
+            f"{'fingerprint':<12} {'calls':>8} {'total ms':>11} {'mean ms':>9} "
+            f"{'max ms':>9}  statement"
+        )
+        for query in queries:
+            if options["plans"]:
+                self.write_query(query, plan=True)
+            else:
+                self.stdout.write(
+                    f"{query.fingerprint[:12]:<12} {query.calls:>8} "
+                    f"{query.total_ms:>11.1f} {query.mean_ms:>9.1f} "
+                    f"{query.max_ms:>9.1f}  {query.statement[:100]}"
+                )
+
+    def write_query(self, query, plan):
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"{query.fingerprint}: {query.calls} calls, "
+                f"{query.total_ms:.1f} ms total, {query.mean_ms:.1f} ms mean, "
+                f"{query.max_ms:.1f} ms max, last seen {query.last_seen:%Y-%m-%d %H:%M}"
+            )
+        )
+        self.stdout.write(query.statement)
+        if plan and query.plan:
+            self.stdout.write(
+                f"\nPlan captured {query.plan_captured_at:%Y-%m-%d %H:%M} "
+                f"({query.plan_ms:.1f} ms):"
+            )
+            self.stdout.write(query.plan)
+        self.stdout.write("")
@@ -0,0 +1,157 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+Each process keeps its own counters and Prometheus sums them across the
+processes it scrapes. Recording a request takes one lock and a few bisects, so
+the metrics stay on under full load.
+"""
+
+import copy
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = {
+    "http_responses_total": ("counter", "Responses by view, method and status."),
+    "http_request_duration_seconds": (
+        "histogram",
+        "Time until the response is handed to the server; streamed bodies are "
+        "not included.",
+    ),
+    "http_request_db_queries": (
+        "histogram",
+        "Database queries per request, sync requests only.",
+    ),
+    "http_request_db_query_seconds_total": (
+        "counter",
+        "Time spent in database queries, sync requests only.",
+    ),
+    "http_response_size_bytes": (
+        "histogram",
+        "Response body size, non-streaming responses only.",
+    ),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            yield f"{name}_bucket", {**labels, "le": str(bound)}, total
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, total
+
+
+class ViewMetrics:
+    """Everything recorded for one view and method."""
+
+    def __init__(self):
+        self.responses = defaultdict(int)
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.query_seconds = 0.0
+        self.size = Histogram(SIZE_BUCKETS)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = defaultdict(ViewMetrics)
+
+    def observe(
+        self, view, method, status, duration, queries=None, query_seconds=0.0, size=None
+    ):
+        """
+        Record one request. `queries` is `None` when queries were not counted
+        and `size` is `None` for streaming responses.
+        """
+        with self._lock:
+            metrics = self._views[view, method]
+            metrics.responses[status] += 1
+            metrics.duration.observe(duration)
+            if queries is not None:
+                metrics.queries.observe(queries)
+                metrics.query_seconds += query_seconds
+            if size is not None:
+                metrics.size.observe(size)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def samples(self):
+        """`(name, labels, value)` of every sample, grouped by metric."""
+        with self._lock:
+            views = copy.deepcopy(sorted(self._views.items()))
+
+        for (view, method), metrics in views:
+            for status, count in sorted(metrics.responses.items()):
+                labels = {"view": view, "method": method, "status": status}
+                yield "http_responses_total", labels, count
+        for (view, method), metrics in views:
+            yield from metrics.duration.samples(
+                "http_request_duration_seconds", {"view": view, "method": method}
+            )
+        for (view, method), metrics in views:
+            yield from metrics.queries.samples(
+                "http_request_db_queries", {"view": view, "method": method}
+            )
+        for (view, method), metrics in views:
+            labels = {"view": view, "method": method}
+            yield "http_request_db_query_seconds_total", labels, metrics.query_seconds
+        for (view, method), metrics in views:
+            yield from metrics.size.samples(
+                "http_response_size_bytes", {"view": view, "method": method}
+            )
+
+
+registry = Registry()
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def metric_name(sample, metrics):
+    for suffix in ("_bucket", "_sum", "_count"):
+        if sample.endswith(suffix) and sample[: -len(suffix)] in metrics:
+            return sample[: -len(suffix)]
+    return sample
+
+
+def render(samples, metrics=METRICS):
+    """
+    Render samples in the Prometheus text exposition format. `metrics` maps
+    metric names to their type and help text.
+    """
+    lines = []
+    described = set()
+    for name, labels, value in samples:
+        metric = metric_name(name, metrics)
+        if metric not in described and metric in metrics:
+            kind, help_text = metrics[metric]
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            described.add(metric)
+
+        if labels:
+            label_text = ",".join(
+                f'{key}="{escape(val)}"' for key, val in labels.items()
+            )
+            name = f"{name}{{{label_text}}}"
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
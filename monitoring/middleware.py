@@ -0,0 +1,82 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connection
+
+from monitoring.metrics import registry
+
+# Anything else is reported as "other" so arbitrary methods cannot create series.
+METHODS = frozenset(("GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE"))
+
+
+class QueryTimer:
+    """`connection.execute_wrapper` counting the queries of a request and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "<unresolved>"
+
+
+def response_size(response):
+    return None if response.streaming else len(response.content)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, database queries and response size of every request per
+    resolved view. Place it first in `MIDDLEWARE` so the rest of the stack is
+    included.
+
+    Async views run their queries in other threads, so only latency and size
+    are recorded for requests served asynchronously.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self.observe(request, response, start, timer.count, timer.seconds)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    def observe(self, request, response, start, queries=None, query_seconds=0.0):
+        registry.observe(
+            view_name(request),
+            request.method if request.method in METHODS else "other",
+            response.status_code,
+            time.perf_counter() - start,
+            queries,
+            query_seconds,
+            response_size(response),
+        )
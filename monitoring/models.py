@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class SlowQuery(models.Model):
+    """Statements above the slow query threshold, aggregated per fingerprint."""
+
+    fingerprint = models.CharField(max_length=32, unique=True)
+    statement = models.TextField()
+    calls = models.PositiveBigIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+
+    # The latest sampled plan of the statement, its literals redacted, and the
+    # SQL it planned.
+    plan = models.TextField(blank=True)
+    plan_sql = models.TextField(blank=True)
+    plan_ms = models.FloatField(null=True, blank=True)
+    plan_captured_at = models.DateTimeField(null=True, blank=True)
+
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-total_ms",)
+        verbose_name_plural = "slow queries"
+
+    def __str__(self):
+        return f"{self.fingerprint}: {self.calls} calls, {self.total_ms:.0f} ms"
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0
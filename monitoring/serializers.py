@@ -0,0 +1,26 @@
+from rest_framework import serializers
+
+from monitoring.models import SlowQuery
+
+
+class SlowQueryListSerializer(serializers.ModelSerializer):
+    mean_ms = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = SlowQuery
+        fields = (
+            "fingerprint",
+            "statement",
+            "calls",
+            "total_ms",
+            "mean_ms",
+            "max_ms",
+            "plan_captured_at",
+            "first_seen",
+            "last_seen",
+        )
+
+
+class SlowQuerySerializer(SlowQueryListSerializer):
+    class Meta(SlowQueryListSerializer.Meta):
+        fields = SlowQueryListSerializer.Meta.fields + ("plan", "plan_sql", "plan_ms")
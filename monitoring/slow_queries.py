@@ -0,0 +1,282 @@
+"""
+Slow query capture.
+
+Every database connection gets an execute wrapper that times its statements.
+Statements above `SLOW_QUERIES["threshold_ms"]` are normalized into a
+fingerprint (literals, placeholders and value lists replaced) and aggregated in
+process. Every `flush_interval` seconds a background thread, on its own
+database connection, adds the aggregates to the `SlowQuery` table and plans a
+sampled share of the slow SELECT statements, keeping the latest plan per
+fingerprint. Requests only pay for the timing.
+
+On PostgreSQL samples run under `EXPLAIN (ANALYZE, BUFFERS)` in a read-only
+transaction that is always rolled back, so they cannot write. PostgreSQL
+refuses `SELECT ... FOR UPDATE` and `nextval()` there; those statements, and
+every statement on other databases, get a plain `EXPLAIN`, which does not run
+them. Literal values in the plans are redacted before they are stored.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER = re.compile(r"%s|\$\d+|\?")
+VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+REPEATED_LISTS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+WHITESPACE = re.compile(r"\s+")
+# Plan lines holding the statement's conditions, such as "Index Cond: (...)".
+PLAN_CONDITION = re.compile(r"^(\s*(?:[\w-]+ )?(?:Cond|Filter): )(.*)$", re.MULTILINE)
+
+
+def normalize(sql):
+    """The statement with literals and value lists replaced by placeholders."""
+    sql = STRING.sub("?", sql)
+    sql = PLACEHOLDER.sub("?", sql)
+    sql = NUMBER.sub("?", sql)
+    sql = VALUE_LIST.sub("(...)", sql)
+    sql = REPEATED_LISTS.sub("(...), ...", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+def redact_plan(plan):
+    """
+    The plan with its string literals, and the numbers of its conditions,
+    replaced by placeholders. Costs, row counts and timings are kept.
+    """
+    plan = STRING.sub("?", plan)
+    return PLAN_CONDITION.sub(lambda match: match[1] + NUMBER.sub("?", match[2]), plan)
+
+
+def fingerprint(statement):
+    return hashlib.blake2b(statement.encode(), digest_size=16).hexdigest()
+
+
+class SlowQueryRecorder:
+    """
+    Aggregates slow statements until `flush` writes them to the database.
+
+    Statements the recorder runs itself, the EXPLAIN samples and the flush, are
+    never recorded.
+    """
+
+    def __init__(
+        self,
+        threshold_ms=200,
+        plan_sample_rate=0.05,
+        max_fingerprints=500,
+        flush_interval=10,
+        plan_timeout_ms=5000,
+    ):
+        self.threshold = threshold_ms / 1000
+        self.plan_sample_rate = plan_sample_rate
+        self.plan_timeout_ms = plan_timeout_ms
+        self.max_fingerprints = max_fingerprints
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._local = threading.local()
+        self._worker = None
+        self._stopped = threading.Event()
+
+    @property
+    def active(self):
+        return getattr(self._local, "active", False)
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active:
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start
+        if duration >= self.threshold:
+            self.record(sql, params, many, duration, context["connection"])
+        return result
+
+    def record(self, sql, params, many, duration, connection):
+        self.start()
+        statement = normalize(sql)
+        key = fingerprint(statement)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                if len(self._pending) >= self.max_fingerprints:
+                    return
+                entry = self._pending[key] = {
+                    "statement": statement,
+                    "calls": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                }
+            entry["calls"] += 1
+            entry["total_ms"] += duration * 1000
+            entry["max_ms"] = max(entry["max_ms"], duration * 1000)
+
+            if not many and self.should_explain(sql):
+                # Planned by the flush, off the request path.
+                entry["sample"] = (connection.alias, sql, params)
+
+    def should_explain(self, sql):
+        return (
+            sql.lstrip()[:6].upper() == "SELECT"
+            and random.random() < self.plan_sample_rate
+        )
+
+    def explain(self, alias, sql, params):
+        """
+        Plan the statement on this thread's connection, run under
+        `EXPLAIN (ANALYZE, BUFFERS)` where it can be run read-only.
+        """
+        connection = connections[alias]
+        start = time.perf_counter()
+        rows = None
+        if connection.vendor == "postgresql":
+            rows = self.run_explain(connection, sql, params, analyze=True)
+        if rows is None:
+            rows = self.run_explain(connection, sql, params)
+        if rows is None:
+            return None
+
+        return {
+            "plan": redact_plan("\n".join(str(row[-1]) for row in rows)),
+            "plan_sql": sql,
+            "plan_ms": (time.perf_counter() - start) * 1000,
+            "plan_captured_at": timezone.now(),
+        }
+
+    def run_explain(self, connection, sql, params, analyze=False):
+        """
+        The EXPLAIN rows, from a transaction of their own that is rolled back;
+        `None` when the database refuses the statement.
+        """
+        if analyze:
+            prefix = connection.ops.explain_query_prefix(analyze=True, buffers=True)
+        else:
+            prefix = connection.ops.explain_query_prefix()
+        try:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    if analyze:
+                        cursor.execute("SET TRANSACTION READ ONLY")
+                        cursor.execute(
+                            "SELECT set_config('statement_timeout', %s, true)",
+                            [str(self.plan_timeout_ms)],
+                        )
+                    cursor.execute(f"{prefix} {sql}", params)
+                    rows = cursor.fetchall()
+                transaction.set_rollback(True, using=connection.alias)
+        except DatabaseError:
+            return None
+        return rows
+
+    def start(self):
+        """Start the flushing thread, once per process."""
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self.run, name="slow-query-flush", daemon=True
+                )
+                self._worker.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        self._local.active = True
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            finally:
+                # Idle between flushes without holding connections.
+                connections.close_all()
+
+    def flush(self):
+        """Add the pending aggregates and plans to the `SlowQuery` table."""
+        from monitoring.models import SlowQuery
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        active = self.active
+        self._local.active = True
+        try:
+            for key, entry in pending.items():
+                if "sample" in entry:
+                    entry.update(self.explain(*entry["sample"]) or {})
+                plan = {
+                    field: entry[field]
+                    for field in ("plan", "plan_sql", "plan_ms", "plan_captured_at")
+                    if field in entry
+                }
+                with transaction.atomic():
+                    updated = SlowQuery.objects.filter(fingerprint=key).update(
+                        calls=F("calls") + entry["calls"],
+                        total_ms=F("total_ms") + entry["total_ms"],
+                        max_ms=Greatest("max_ms", entry["max_ms"]),
+                        last_seen=timezone.now(),
+                        **plan,
+                    )
+                    if not updated:
+                        SlowQuery.objects.create(
+                            fingerprint=key,
+                            statement=entry["statement"],
+                            calls=entry["calls"],
+                            total_ms=entry["total_ms"],
+                            max_ms=entry["max_ms"],
+                            **plan,
+                        )
+        except DatabaseError:
+            # Dropped; the next flush starts over.
+            pass
+        finally:
+            self._local.active = active
+
+
+_recorder = None
+
+
+def get_recorder():
+    """The process's recorder, `None` when `SLOW_QUERIES` is not configured."""
+    global _recorder
+    if _recorder is None and settings.SLOW_QUERIES:
+        _recorder = SlowQueryRecorder(**settings.SLOW_QUERIES)
+    return _recorder
+
+
+@receiver(setting_changed)
+def reset_recorder(setting, **kwargs):
+    global _recorder
+    if setting == "SLOW_QUERIES" and _recorder is not None:
+        _recorder.stop()
+        _recorder = None
+
+
+def record_slow_queries(execute, sql, params, many, context):
+    recorder = get_recorder()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_wrapper(sender, connection, **kwargs):
+    # Wrappers live on the connection object, which outlives reconnects.
+    if record_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_slow_queries)
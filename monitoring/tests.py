@@ -0,0 +1,64 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from monitoring.models import SlowQuery
+from monitoring.slow_queries import SlowQueryRecorder, redact_plan
+
+
+class RedactPlanTests(SimpleTestCase):
+    def test_redact_plan(self):
+        plan = (
+            "Limit  (cost=8.52..8.53 rows=5) (actual time=0.1..0.2 rows=5 loops=1)\n"
+            "  ->  Index Scan using money_expense_family_idx on money_expense\n"
+            "        Index Cond: ((family_id = 34) AND (updated_at >= '2026-10-18'))\n"
+            "        Filter: ((title)::text = 'rent'::text)\n"
+            "        Rows Removed by Filter: 12"
+        )
+        self.assertEqual(
+            redact_plan(plan),
+            "Limit  (cost=8.52..8.53 rows=5) (actual time=0.1..0.2 rows=5 loops=1)\n"
+            "  ->  Index Scan using money_expense_family_idx on money_expense\n"
+            "        Index Cond: ((family_id = ?) AND (updated_at >= ?))\n"
+            "        Filter: ((title)::text = ?::text)\n"
+            "        Rows Removed by Filter: 12",
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN ANALYZE is PostgreSQL's.")
+class ExplainTests(TransactionTestCase):
+    sequence = "pg_get_serial_sequence('monitoring_slowquery', 'id')"
+
+    def setUp(self):
+        self.recorder = SlowQueryRecorder()
+        SlowQuery.objects.create(fingerprint="a" * 32, statement="SELECT ?")
+
+    def explain(self, sql, params=()):
+        return self.recorder.explain("default", sql, params)["plan"]
+
+    def test_analyze(self):
+        plan = self.explain(
+            "SELECT * FROM monitoring_slowquery WHERE fingerprint = %s", ["a" * 32]
+        )
+        self.assertIn("actual time=", plan)
+        self.assertIn("fingerprint)::text = ?::text", plan)
+        self.assertNotIn("a" * 32, plan)
+
+    def last_value(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT pg_sequence_last_value({self.sequence}::regclass)")
+            return cursor.fetchone()[0]
+
+    def test_refused_read_only(self):
+        last_value = self.last_value()
+        for sql in (
+            f"SELECT nextval({self.sequence})",
+            "SELECT * FROM monitoring_slowquery FOR UPDATE",
+        ):
+            with self.subTest(sql=sql):
+                # Planned with plain EXPLAIN, which doesn't run the statement.
+                plan = self.explain(sql)
+                self.assertTrue(plan)
+                self.assertNotIn("actual time=", plan)
+        self.assertEqual(self.last_value(), last_value)
@@ -0,0 +1,13 @@
+from django.urls import path, include
+from rest_framework import routers
+
+from monitoring.views import SlowQueryViewSet
+
+router = routers.DefaultRouter()
+router.register("slow-queries", SlowQueryViewSet, basename="slow-queries")
+
+urlpatterns = [
+    path("", include(router.urls)),
+]
+
+app_name = "monitoring"
@@ -0,0 +1,107 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views import View
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import permissions, viewsets
+from rest_framework.exceptions import ValidationError
+
+from fire_fruit_money.cache import get_response_cache
+from monitoring.metrics import METRICS, registry, render
+from monitoring.models import SlowQuery
+from monitoring.serializers import SlowQueryListSerializer, SlowQuerySerializer
+from users.authentication import get_user_cache
+
+CACHE_METRICS = {
+    "response_cache_hits_total": ("counter", "Response cache hits."),
+    "response_cache_misses_total": ("counter", "Response cache misses."),
+    "response_cache_evictions_total": ("counter", "Response cache evictions."),
+    "response_cache_entries": ("gauge", "Responses held by the in-process cache."),
+    "response_cache_bytes": ("gauge", "Size of the responses held in process."),
+    "user_cache_hits_total": ("counter", "Token users served from the cache."),
+    "user_cache_misses_total": ("counter", "Token users loaded from the database."),
+    "user_cache_entries": ("gauge", "Users held by the cache."),
+}
+
+
+def cache_samples():
+    stats = get_response_cache().stats()
+    for key in ("hits", "misses", "evictions"):
+        yield f"response_cache_{key}_total", {}, stats[key]
+    for key in ("entries", "bytes"):
+        if key in stats:
+            yield f"response_cache_{key}", {}, stats[key]
+
+    stats = get_user_cache().stats()
+    yield "user_cache_hits_total", {}, stats["hits"]
+    yield "user_cache_misses_total", {}, stats["misses"]
+    yield "user_cache_entries", {}, stats["entries"]
+
+
+class MetricsView(View):
+    """
+    This process's metrics in the Prometheus text format.
+
+    Scrapers authenticate with `Authorization: Bearer <METRICS_TOKEN>`; without
+    a configured token only `INTERNAL_IPS` may scrape.
+    """
+
+    http_method_names = ["get"]
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def get(self, request, *args, **kwargs):
+        if not self.is_allowed(request):
+            return HttpResponseForbidden()
+        body = render(registry.samples(), METRICS) + render(
+            cache_samples(), CACHE_METRICS
+        )
+        return HttpResponse(body, content_type=self.content_type)
+
+    def is_allowed(self, request):
+        token = settings.METRICS_TOKEN
+        if not token:
+            return request.META.get("REMOTE_ADDR") in settings.INTERNAL_IPS
+        return hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+
+
+class SlowQueryViewSet(viewsets.ReadOnlyModelViewSet):
+    """Slow statements by fingerprint, with their latest sampled plan. Staff only."""
+
+    permission_classes = (permissions.IsAdminUser,)
+    lookup_field = "fingerprint"
+    orderings = ("total_ms", "max_ms", "calls", "last_seen")
+    default_limit = 50
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return SlowQueryListSerializer
+        return SlowQuerySerializer
+
+    def get_queryset(self):
+        # Statements recorded since each process's last flush are not included.
+        queryset = SlowQuery.objects.all()
+        if self.action != "list":
+            return queryset
+
+        ordering = self.request.query_params.get("ordering", "total_ms")
+        if ordering not in self.orderings:
+            raise ValidationError(
+                {"ordering": f"Must be one of: {', '.join(self.orderings)}."}
+            )
+        try:
+            limit = int(self.request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        return queryset.order_by(f"-{ordering}")[: max(limit, 0)]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("ordering", str, enum=orderings),
+            OpenApiParameter("limit", int),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
@@ -0,0 +1,262 @@
+"""
+Access token authentication with an in-process cache of the token's user.
+
+Resolving a token costs a query for the user and another one for the family
+every scoped view reads. `CachedJWTAuthentication` loads both with one query
+and keeps them for `timeout` seconds in a bounded LRU cache, so most requests
+authenticate without touching the database. Saving or deleting a user drops
+the cached entry once the transaction commits. With an `alias` of one of the
+`CACHES` shared by all processes, the drop also bumps a per-user version there
+that every process checks before using its entry; otherwise other processes
+pick the change up when their entry expires. Configured with the `USER_CACHE`
+setting.
+
+Cached users are a snapshot for reading; writes start from a fresh row.
+"""
+
+import copy
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """LRU cache of users with their family, keyed by user id."""
+
+    def __init__(self, max_entries=10000, timeout=60, alias=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def version_key(self, user_id):
+        return f"user-cache:version:{user_id}"
+
+    def version(self, user_id):
+        """
+        The shared version of the user, `None` without a shared cache. Read it
+        before loading the user that is passed to `set`.
+        """
+        if self.alias is None:
+            return None
+        return caches[self.alias].get(self.version_key(user_id), 0)
+
+    def get(self, user_id):
+        """A private copy of the cached user, or `None`."""
+        version = self.version(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and (
+                entry[1] < time.monotonic() or entry[2] != version
+            ):
+                del self._entries[user_id]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+
+        # Views may modify `request.user`, so every request gets its own copy.
+        return copy.deepcopy(entry[0])
+
+    def set(self, user, version=None):
+        entry = (copy.deepcopy(user), time.monotonic() + self.timeout, version)
+        with self._lock:
+            self._entries[user.pk] = entry
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+        if self.alias is not None:
+            cache = caches[self.alias]
+            for user_id in user_ids:
+                key = self.version_key(user_id)
+                try:
+                    cache.incr(key)
+                except ValueError:
+                    # A missing version reads as 0, which entries cached
+                    # before this call may carry.
+                    cache.add(key, 1, timeout=None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
+
+_user_cache = None
+
+
+def get_user_cache():
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = UserCache(**settings.USER_CACHE)
+    return _user_cache
+
+
+@receiver(setting_changed)
+def reset_user_cache(setting, **kwargs):
+    global _user_cache
+    if setting == "USER_CACHE":
+        _user_cache = None
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Joining or leaving a family, changing the password or the staff flag all
+    # save the user. Dropping the entry before the commit would let a concurrent
+    # request cache the old row again.
+    invalidate_cached_users(instance.pk)
+
+
+def invalidate_cached_users(*user_ids):
+    """
+    Drop users from the cache once the transaction commits. Needed after
+    queryset `update()` and `bulk_update()`, which send no signals.
+    """
+    transaction.on_commit(lambda: get_user_cache().invalidate(*user_ids))
+
+
+def check_user(user, validated_token):
+    """Apply `JWTAuthentication`'s checks to a user resolved from a token."""
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+    if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+        api_settings.REVOKE_TOKEN_CLAIM
+    ) != get_md5_hash_password(user.password):
+        raise AuthenticationFailed(
+            "The user's password has been changed.", code="password_changed"
+        )
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """`JWTAuthentication` resolving the user and their family through the cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        cache = get_user_cache()
+        user = cache.get(user_id)
+        if user is None:
+            version = cache.version(user_id)
+            try:
+                user = self.user_model.objects.select_related("family").get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            cache.set(user, version)
+
+        check_user(user, validated_token)
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = CachedJWTAuthentication
+    priority = 1
+
+
+def stream_ticket_key(ticket):
+    return f"stream-ticket:{ticket}"
+
+
+def issue_stream_ticket(raw_token):
+    """
+    Return a random single-use ticket standing in for an access token.
+
+    Clients that cannot set headers, such as `EventSource`, pass the ticket in
+    the URL instead of the token, which would end up in access logs. It is kept
+    in the `STREAM_TICKETS` cache for `timeout` seconds.
+    """
+    config = settings.STREAM_TICKETS
+    ticket = secrets.token_urlsafe(32)
+    caches[config["alias"]].set(stream_ticket_key(ticket), raw_token, config["timeout"])
+    return ticket
+
+
+async def aredeem_stream_ticket(ticket):
+    """The access token of a ticket, `None` if it is unknown, expired or used."""
+    cache = caches[settings.STREAM_TICKETS["alias"]]
+    key = stream_ticket_key(ticket)
+    raw_token = await cache.aget(key)
+    # Of concurrent redeemers, only the one whose delete succeeds gets the token.
+    if raw_token is None or not await cache.adelete(key):
+        return None
+    return raw_token
+
+
+async def aauthenticate_jwt(request, ticket_param=None):
+    """
+    Authenticate a plain (non-DRF) async view's request with an access token.
+
+    The token is read from the `Authorization` header or, when `ticket_param` is
+    given, redeemed from the stream ticket in that query parameter. Works like
+    `CachedJWTAuthentication` but loads uncached users with the async ORM.
+    Returns the user, or `None` if the token is missing or invalid.
+    """
+    authentication = CachedJWTAuthentication()
+
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None and request.GET.get(ticket_param or ""):
+        raw_token = await aredeem_stream_ticket(request.GET[ticket_param])
+    if raw_token is None:
+        return None
+
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, KeyError):
+        return None
+
+    cache = get_user_cache()
+    user = cache.get(user_id)
+    if user is None:
+        version = cache.version(user_id)
+        user_model = authentication.user_model
+        try:
+            user = await user_model.objects.select_related("family").aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except user_model.DoesNotExist:
+            return None
+        cache.set(user, version)
+
+    try:
+        check_user(user, validated_token)
+    except AuthenticationFailed:
+        return None
+    return user
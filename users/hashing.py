@@ -0,0 +1,255 @@
+"""
+Password hashing off the request thread.
+
+Hashing a password takes tens to hundreds of milliseconds of CPU. Request
+paths hand it to `get_hashing_executor()`, a small process pool configured by
+the `PASSWORD_HASHING` setting. At most `max_workers + max_pending` operations
+are in flight per process; beyond that `HashingBusy` is raised, which DRF
+renders as 503 so a burst of logins is shed instead of starving every other
+endpoint of CPU and worker threads. Without the setting passwords are hashed
+inline.
+
+Kept free of model imports: worker processes import this module before Django
+is set up.
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Below this many passwords a worker pool costs more than it saves.
+MIN_POOL_PASSWORDS = 64
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many password operations in progress, try again shortly."
+    default_code = "hashing_busy"
+    # Rendered as Retry-After.
+    wait = 1
+
+
+def setup_worker():
+    # Workers are spawned, not forked, so they share no database connections
+    # with the parent and need their own Django setup for the hasher settings.
+    django.setup()
+
+
+def make_passwords(passwords):
+    return [hashers.make_password(password) for password in passwords]
+
+
+def hash_passwords(passwords, processes=None):
+    """
+    Hash `passwords` with the configured hasher, keeping their order. `None`
+    gives an unusable password. `processes=1` hashes in this process.
+
+    Starts a pool of its own, so it is meant for management commands; request
+    paths use `get_hashing_executor().make_passwords()`.
+    """
+    passwords = list(passwords)
+    if processes == 1 or len(passwords) < MIN_POOL_PASSWORDS:
+        return [hashers.make_password(password) for password in passwords]
+
+    processes = processes or os.cpu_count()
+    with ProcessPoolExecutor(
+        max_workers=processes, mp_context=get_context("spawn"), initializer=setup_worker
+    ) as pool:
+        chunk_size = max(len(passwords) // (processes * 4), 1)
+        return list(pool.map(hashers.make_password, passwords, chunksize=chunk_size))
+
+
+class HashingExecutor:
+    """
+    A process pool for single hashing operations with bounded queueing.
+
+    The pool is started on first use and replaced when a worker dies. Every
+    method has an awaitable `a` variant for async views. Operations that time
+    out or are lost with a worker raise `HashingBusy`, like a full queue.
+    """
+
+    def __init__(self, max_workers=2, max_pending=32, timeout=30):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=get_context("spawn"),
+                    initializer=setup_worker,
+                )
+            return self._pool
+
+    def discard(self, pool):
+        """Drop `pool` if it is still the current one; the next use starts a new one."""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, function, *args, wait=False):
+        """
+        Run `function(*args)` in the pool and return its future. Raises
+        `HashingBusy` when every slot is taken, or with `wait` when none frees
+        up within `timeout` seconds.
+        """
+        if not self._slots.acquire(
+            timeout=self.timeout if wait else None, blocking=wait
+        ):
+            raise HashingBusy()
+        try:
+            pool = self.pool
+            try:
+                future = pool.submit(function, *args)
+            except BrokenProcessPool:
+                # A worker died (OOM kill, crash) since the last operation.
+                self.discard(pool)
+                pool = self.pool
+                future = pool.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda future: self.done(pool, future))
+        return future
+
+    def done(self, pool, future):
+        self._slots.release()
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self.discard(pool)
+
+    def result(self, future):
+        try:
+            return future.result(self.timeout)
+        except (TimeoutError, BrokenProcessPool):
+            future.cancel()
+            raise HashingBusy()
+
+    async def aresult(self, future):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except (TimeoutError, BrokenProcessPool):
+            future.cancel()
+            raise HashingBusy()
+
+    def make_password(self, password):
+        return self.result(self.submit(hashers.make_password, password))
+
+    def verify_password(self, password, encoded):
+        """`(is_correct, must_update)` as returned by Django's `verify_password`."""
+        return self.result(self.submit(hashers.verify_password, password, encoded))
+
+    async def amake_password(self, password):
+        return await self.aresult(self.submit(hashers.make_password, password))
+
+    def make_passwords(self, passwords, chunk_size=16):
+        """
+        Hash `passwords` in order, `chunk_size` per operation. At most
+        `max_workers` chunks are in flight, each waiting for a free slot, so a
+        bulk load never holds more than the single operations could.
+        """
+        passwords = list(passwords)
+        hashes, in_flight = [], deque()
+        for start in range(0, len(passwords), chunk_size):
+            if len(in_flight) >= self.max_workers:
+                hashes.extend(self.result(in_flight.popleft()))
+            in_flight.append(
+                self.submit(
+                    make_passwords, passwords[start : start + chunk_size], wait=True
+                )
+            )
+        while in_flight:
+            hashes.extend(self.result(in_flight.popleft()))
+        return hashes
+
+    async def averify_password(self, password, encoded):
+        return await self.aresult(
+            self.submit(hashers.verify_password, password, encoded)
+        )
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+class InlineHasher:
+    """Hashes in the calling thread; used when `PASSWORD_HASHING` is not set."""
+
+    def make_password(self, password):
+        return hashers.make_password(password)
+
+    def verify_password(self, password, encoded):
+        return hashers.verify_password(password, encoded)
+
+    def make_passwords(self, passwords):
+        return make_passwords(passwords)
+
+    async def amake_password(self, password):
+        return self.make_password(password)
+
+    async def averify_password(self, password, encoded):
+        return self.verify_password(password, encoded)
+
+    def shutdown(self):
+        pass
+
+
+_executor = None
+
+
+def get_hashing_executor():
+    global _executor
+    if _executor is None:
+        config = settings.PASSWORD_HASHING
+        _executor = HashingExecutor(**config) if config else InlineHasher()
+    return _executor
+
+
+@receiver(setting_changed)
+def reset_hashing_executor(setting, **kwargs):
+    global _executor
+    if setting == "PASSWORD_HASHING" and _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+def check_password(user, password):
+    """
+    Like `user.check_password`, with the hashing done by the executor. A
+    password stored with outdated hasher settings is rehashed and saved.
+    """
+    executor = get_hashing_executor()
+    is_correct, must_update = executor.verify_password(password, user.password)
+    if is_correct and must_update:
+        user.password = executor.make_password(password)
+        user.save(update_fields=["password"])
+    return is_correct
+
+
+async def acheck_password(user, password):
+    executor = get_hashing_executor()
+    is_correct, must_update = await executor.averify_password(password, user.password)
+    if is_correct and must_update:
+        user.password = await executor.amake_password(password)
+        await user.asave(update_fields=["password"])
+    return is_correct
@@ -0,0 +1,131 @@
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Send a storm of concurrent logins together with a steady stream of "
+        "unrelated requests (the current user's profile) through one pool of "
+        "threads, as under a threaded WSGI server, and report the latency of the "
+        "unrelated requests. Runs once with passwords hashed in the request "
+        "threads and once on the hashing executor. Uses the configured password "
+        "hasher; the created users are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=200)
+        parser.add_argument(
+            "--probes",
+            type=int,
+            default=500,
+            help="Unrelated requests sent during the storm.",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=16,
+            help="Worker threads of the simulated WSGI server.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Processes of the hashing executor.",
+        )
+        parser.add_argument(
+            "--max-pending",
+            type=int,
+            default=8,
+            help="Hashing operations queued before logins get 503.",
+        )
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        password = "storm-password"
+        password_hash = make_password(password)
+        emails = [f"storm-{run}-{index}@example.com" for index in range(8)]
+        for email in emails:
+            User.objects.create_user(email, password_hash=password_hash)
+        prober = User.objects.get(email=emails[0])
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(prober)}"}
+
+        self.stdout.write(
+            f"{'hashing':>9} {'probe p50':>10} {'probe p99':>10} {'login p50':>10} "
+            f"{'ok':>5} {'503':>5} {'elapsed s':>10}"
+        )
+        try:
+            for name, config in (
+                ("inline", None),
+                (
+                    "executor",
+                    {
+                        "max_workers": options["workers"],
+                        "max_pending": options["max_pending"],
+                    },
+                ),
+            ):
+                with override_settings(PASSWORD_HASHING=config):
+                    self.storm(name, emails, password, headers, options)
+        finally:
+            User.objects.filter(email__startswith=f"storm-{run}-").delete()
+
+    def storm(self, name, emails, password, headers, options):
+        local = threading.local()
+        probes, logins, statuses = [], [], []
+
+        def client():
+            if not hasattr(local, "client"):
+                local.client = Client(headers=headers)
+            return local.client
+
+        def login(index, submitted):
+            response = client().post(
+                "/api/users/token/",
+                {"email": emails[index % len(emails)], "password": password},
+            )
+            statuses.append(response.status_code)
+            if response.status_code == 200:
+                logins.append(time.perf_counter() - submitted)
+
+        def probe(submitted):
+            assert client().get("/api/users/me/").status_code == 200
+            probes.append(time.perf_counter() - submitted)
+
+        # Warm up the executor's worker processes outside the measurement.
+        login(0, time.perf_counter())
+        probes.clear()
+        logins.clear()
+        statuses.clear()
+
+        # Spread the probes evenly between the logins.
+        total = options["logins"] + options["probes"]
+        every = total / max(options["probes"], 1)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            sent_probes = 0
+            for index in range(total):
+                if sent_probes < options["probes"] and index >= sent_probes * every:
+                    pool.submit(probe, time.perf_counter())
+                    sent_probes += 1
+                else:
+                    pool.submit(login, index, time.perf_counter())
+        elapsed = time.perf_counter() - start
+
+        probe_percentiles = statistics.quantiles(probes, n=100)
+        login_p50 = statistics.median(logins) if logins else 0
+        self.stdout.write(
+            f"{name:>9} {probe_percentiles[49] * 1000:>8.1f}ms "
+            f"{probe_percentiles[98] * 1000:>8.1f}ms {login_p50 * 1000:>8.1f}ms "
+            f"{statuses.count(200):>5} {statuses.count(503):>5} {elapsed:>10.1f}"
+        )
@@ -0,0 +1,69 @@
+import csv
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.provisioning import provision_users
+
+TRUE_VALUES = ("1", "true", "yes", "y")
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the users listed in a CSV file, each with a family, in one "
+        "transaction. Columns: email and optionally password, first_name, "
+        "last_name, family and admin. Rows with the same family key share one "
+        "family, administered by the row with a true admin column or else the "
+        "first one; rows without get a family of their own. Users without a "
+        "password cannot log in until they set one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row; - for stdin.")
+        parser.add_argument(
+            "--processes",
+            type=int,
+            help="Worker processes hashing passwords; defaults to the CPU count.",
+        )
+
+    def handle(self, *args, **options):
+        if options["path"] == "-":
+            accounts = self.read(sys.stdin)
+        else:
+            with open(options["path"], newline="") as file:
+                accounts = self.read(file)
+
+        start = time.perf_counter()
+        try:
+            users = provision_users(
+                accounts, processes=options["processes"] or os.cpu_count()
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        families = len({user.family_id for user in users})
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(users)} users in {families} families in "
+                f"{time.perf_counter() - start:.1f}s."
+            )
+        )
+
+    def read(self, file):
+        reader = csv.DictReader(file)
+        if "email" not in (reader.fieldnames or ()):
+            raise CommandError("The CSV file needs an email column.")
+
+        accounts = []
+        for row in reader:
+            account = {
+                key: value
+                for key, value in row.items()
+                if key in ("email", "password", "first_name", "last_name", "family")
+                and value
+            }
+            account["admin"] = row.get("admin", "").strip().lower() in TRUE_VALUES
+            accounts.append(account)
+        return accounts
@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext as _
 from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
 
@@ -12,13 +14,19 @@ from fire_fruit_money.settings import AUTH_USER_MODEL
 class UserManager(DjangoUserManager):
     use_in_migrations = True
 
-    def _create_user(self, email, password, **extra_fields):
-        """Create and save a User with the given email and password."""
+    def _create_user(self, email, password, password_hash=None, **extra_fields):
+        """
+        Create and save a User with the given email and password, or with an
+        already hashed `password_hash`.
+        """
         if not email:
             raise ValueError("The given email must be set")
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)
+        if password_hash is None:
+            user.set_password(password)
+        else:
+            user.password = password_hash
         user.save(using=self._db)
         return user
 
@@ -46,12 +54,35 @@ class Family(models.Model):
         AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="family_admin"
     )
 
+    change_seq = models.BigIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.admin}'s family"
 
+    @classmethod
+    def reserve_change_seq(cls, family_id, count=1):
+        """
+        Advance the family's change sequence by `count` and return the new value.
+
+        Must be called inside a transaction: the row lock taken by the UPDATE is
+        held until commit, so writers of one family are serialized and their
+        sequence numbers become visible in increasing order. `updated_at` is
+        bumped too.
+        """
+        cls.objects.filter(pk=family_id).update(
+            change_seq=F("change_seq") + count, updated_at=timezone.now()
+        )
+        return cls.objects.values_list("change_seq", flat=True).get(pk=family_id)
+
+    @classmethod
+    def touch(cls, *family_ids):
+        """Advance the change sequence of several families, locking them in id order."""
+        for family_id in sorted(set(family_ids)):
+            cls.reserve_change_seq(family_id)
+
 
 class Invite(models.Model):
     STATUS_CHOICES = (
@@ -103,13 +134,10 @@ class User(AbstractUser):
 
 @receiver(post_save, sender=get_user_model())
 def create_family_for_user(sender, instance, created, **kwargs):
-    if created:
+    if created and instance.family_id is None:
         family = Family.objects.create(admin=instance)
 
-        # Add the user to the family
-        family.members.add(instance)
-        family.save()
-
-        # Update the user's family field
+        # One UPDATE instead of saving the user again, which would also resend
+        # this signal.
+        User.objects.filter(pk=instance.pk).update(family=family)
         instance.family = family
-        instance.save()
@@ -0,0 +1,122 @@
+"""
+Bulk provisioning of users and their families.
+
+Signup creates each user's family from a post_save signal, a handful of writes
+per user. Provisioning inserts all users, then all families, then links the
+users to their family with one bulk update, without sending signals. Password
+hashing, the expensive part, is spread over worker processes before the
+transaction starts (see `users.hashing`): the process's bounded hashing
+executor on request paths, a pool of its own in management commands.
+"""
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from users.hashing import get_hashing_executor, hash_passwords
+from users.models import Family, User
+
+
+def family_admins(accounts):
+    """
+    The index of the admin of every account's family.
+
+    Accounts sharing a `family` key form one family, administered by the
+    account marked `admin` or else the first listed; the rest get a family of
+    their own, as after signup.
+    """
+    admins = {}
+    for index, account in enumerate(accounts):
+        group = account.get("family")
+        if group is None:
+            continue
+        if account.get("admin"):
+            if group in admins and accounts[admins[group]].get("admin"):
+                raise ValueError(f"Family {group!r} has more than one admin.")
+            admins[group] = index
+        else:
+            admins.setdefault(group, index)
+
+    return [
+        index if account.get("family") is None else admins[account["family"]]
+        for index, account in enumerate(accounts)
+    ]
+
+
+def existing_emails(emails):
+    return set(
+        User.objects.filter(email__in=list(emails)).values_list("email", flat=True)
+    )
+
+
+def check_new(emails):
+    conflicts = existing_emails(emails)
+    if conflicts:
+        raise ValueError(f"Users already exist: {', '.join(sorted(conflicts)[:10])}.")
+
+
+def provision_users(accounts, processes=None, batch_size=5000):
+    """
+    Create users with their families in one transaction and return them.
+
+    Every account is a dict with an `email` and optionally a `password`,
+    `first_name`, `last_name`, `is_staff`, a `family` grouping key and an
+    `admin` flag (see `family_admins`). A precomputed `password_hash` is used as
+    is instead of hashing `password`; accounts without either get an unusable
+    password. Passwords are hashed by `get_hashing_executor()`, or with
+    `processes` by a pool of that many processes started for the call.
+    """
+    accounts = list(accounts)
+    emails = [User.objects.normalize_email(account["email"]) for account in accounts]
+    if len(set(emails)) != len(emails):
+        raise ValueError("Emails must be unique.")
+    admins = family_admins(accounts)
+    check_new(emails)
+
+    hashes = {
+        index: make_password(None)
+        for index, account in enumerate(accounts)
+        if "password_hash" not in account and account.get("password") is None
+    }
+    to_hash = [
+        index
+        for index, account in enumerate(accounts)
+        if "password_hash" not in account and index not in hashes
+    ]
+    passwords = [accounts[index]["password"] for index in to_hash]
+    if processes is None:
+        hashed = get_hashing_executor().make_passwords(passwords)
+    else:
+        hashed = hash_passwords(passwords, processes)
+    hashes.update(zip(to_hash, hashed))
+
+    # Checked again now that the hashing is done; a concurrent signup of one
+    # of the emails still fails the insert on the unique constraint.
+    with transaction.atomic():
+        check_new(emails)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    email=email,
+                    password=(
+                        hashes[index] if index in hashes else account["password_hash"]
+                    ),
+                    first_name=account.get("first_name", ""),
+                    last_name=account.get("last_name", ""),
+                    is_staff=account.get("is_staff", False),
+                )
+                for index, (email, account) in enumerate(zip(emails, accounts))
+            ),
+            batch_size=batch_size,
+        )
+
+        admin_indexes = sorted(set(admins))
+        families = Family.objects.bulk_create(
+            (Family(admin=users[index]) for index in admin_indexes),
+            batch_size=batch_size,
+        )
+        family_of_admin = dict(zip(admin_indexes, families))
+        for user, admin in zip(users, admins):
+            user.family = family_of_admin[admin]
+        User.objects.bulk_update(users, ["family"], batch_size=batch_size)
+
+    return users
@@ -14,6 +14,7 @@ from rest_framework_simplejwt.serializers import (
 )
 from rest_framework_simplejwt.settings import api_settings
 
+from users.hashing import get_hashing_executor
 from users.models import Invite, User, Family
 
 
@@ -49,20 +50,21 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
     def create(self, validated_data):
-        """ "create useer with encrypted password"""
-        return get_user_model().objects.create_user(**validated_data)
+        """Create user with the password hashed on the hashing executor"""
+        password = validated_data.pop("password")
+        return get_user_model().objects.create_user(
+            password_hash=get_hashing_executor().make_password(password),
+            **validated_data,
+        )
 
     def update(self, instance, validated_data):
-        """Update user with encrypted password"""
+        """Update user with the password hashed on the hashing executor"""
 
         password = validated_data.pop("password", None)
-        user = super().update(instance, validated_data)
-
         if password:
-            user.set_password(password)
-            user.save()
+            instance.password = get_hashing_executor().make_password(password)
 
-        return user
+        return super().update(instance, validated_data)
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -240,3 +242,36 @@ class InviteUpdateSerializer(serializers.ModelSerializer):
         model = Invite
         fields = ["id", "sender", "recipient", "status", "created_at", "updated_at"]
         read_only_fields = ("id", "sender", "recipient", "created_at", "updated_at")
+
+
+class ProvisionAccountSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    password = serializers.CharField(
+        min_length=5, required=False, write_only=True, style={"input_type": "password"}
+    )
+    first_name = serializers.CharField(max_length=150, required=False)
+    last_name = serializers.CharField(max_length=150, required=False)
+    family = serializers.CharField(
+        max_length=100,
+        required=False,
+        help_text="Accounts with the same key share one family.",
+    )
+    admin = serializers.BooleanField(
+        required=False, help_text="Administers the account's family."
+    )
+
+
+class ProvisionSerializer(serializers.Serializer):
+    # Hashing must fit in a request timeout; larger loads go through the
+    # provision_users management command.
+    accounts = ProvisionAccountSerializer(
+        many=True,
+        max_length=100,
+        help_text="At most 100 accounts; use the provision_users command for more.",
+    )
+
+
+class ProvisionedUserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ("id", "email", "family")
@@ -0,0 +1,180 @@
+import uuid
+from unittest import mock
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, check_password
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from users.authentication import get_user_cache, invalidate_cached_users
+from users.hashing import HashingBusy, HashingExecutor, InlineHasher
+from users.models import Invite, User
+from users.provisioning import provision_users
+
+ROW_COUNTS = (10, 1000, 10000)
+
+
+def create_family(members):
+    """
+    A family of `members` users and as many users with families of their own,
+    each invited by the family's admin. Returns the admin.
+    """
+    prefix = uuid.uuid4().hex
+    users = provision_users(
+        [
+            {
+                "email": f"member-{prefix}-{i}@example.com",
+                "password_hash": UNUSABLE_PASSWORD_PREFIX,
+                "family": "family",
+                "admin": i == 0,
+            }
+            for i in range(members)
+        ]
+        + [
+            {
+                "email": f"other-{prefix}-{i}@example.com",
+                "password_hash": UNUSABLE_PASSWORD_PREFIX,
+            }
+            for i in range(members)
+        ]
+    )
+    admin = users[0]
+    Invite.objects.bulk_create(
+        Invite(sender=admin, recipient=recipient) for recipient in users[members:]
+    )
+    # Plans made before autovacuum catches up take the fresh tables for empty
+    # and join them in nested loops.
+    with connection.cursor() as cursor:
+        for model in (User, Invite):
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
+    return admin
+
+
+# A cache per test, so responses of earlier tests are never served.
+@override_settings(
+    RESPONSE_CACHE={"BACKEND": "fire_fruit_money.cache.LRUResponseCache"}
+)
+class QueryCountTests(TestCase):
+    """List and retrieve run a fixed number of queries however many rows there are."""
+
+    def get_client(self, user, staff):
+        user = User.objects.select_related("family").get(pk=user.pk)
+        user.is_staff = staff
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def assert_read_queries(self, basename, get_pk, queries):
+        """`queries` maps whether the user is staff to the expected count."""
+        for rows in ROW_COUNTS:
+            admin = create_family(rows)
+            pk = get_pk(admin)
+
+            for staff in (False, True):
+                with self.subTest(rows=rows, staff=staff):
+                    client = self.get_client(admin, staff)
+                    with self.assertNumQueries(queries[staff]):
+                        response = client.get(reverse(f"users:{basename}-list"))
+                    self.assertEqual(response.status_code, 200)
+
+                    with self.assertNumQueries(queries[staff]):
+                        response = client.get(
+                            reverse(f"users:{basename}-detail", args=[pk])
+                        )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_family(self):
+        # The family, its prefetched members and, unless the user is staff,
+        # the family's change state.
+        self.assert_read_queries(
+            "families", lambda admin: admin.family_id, {False: 3, True: 2}
+        )
+
+    def test_invite(self):
+        self.assert_read_queries(
+            "invites",
+            lambda admin: admin.sent_invites.latest("id").pk,
+            {False: 1, True: 1},
+        )
+
+
+@override_settings(USER_CACHE={"max_entries": 100, "timeout": 60, "alias": None})
+class UserCacheTests(TestCase):
+    def test_invalidated_on_commit_after_bulk_update(self):
+        user = User.objects.create_user("cached@example.com")
+        family = User.objects.create_user("other@example.com").family_admin
+        cache = get_user_cache()
+        cache.set(User.objects.select_related("family").get(pk=user.pk))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.family = family
+            User.objects.bulk_update([user], ["family"])
+            invalidate_cached_users(user.pk)
+            # Kept until the commit, before which requests would cache the
+            # old row again.
+            self.assertIsNotNone(cache.get(user.pk))
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertIsNone(cache.get(user.pk))
+
+
+class HashingExecutorTests(SimpleTestCase):
+    def test_make_passwords(self):
+        executor = HashingExecutor(max_workers=1, max_pending=0, timeout=30)
+        self.addCleanup(executor.shutdown)
+        passwords = [f"password-{i}" for i in range(5)]
+
+        hashes = executor.make_passwords(passwords, chunk_size=2)
+        self.assertEqual(len(hashes), len(passwords))
+        for password, encoded in zip(passwords, hashes):
+            self.assertTrue(check_password(password, encoded))
+
+    def test_make_passwords_waits_for_a_slot(self):
+        executor = HashingExecutor(max_workers=1, max_pending=0, timeout=0.1)
+        self.addCleanup(executor.shutdown)
+        executor._slots.acquire()
+        with self.assertRaises(HashingBusy):
+            executor.make_passwords(["password"])
+
+
+@override_settings(PASSWORD_HASHING=None)
+class ProvisionUsersViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("staff@example.com", is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        self.url = reverse("users:provision")
+
+    def accounts(self, count):
+        return [
+            {"email": f"user-{i}@example.com", "password": f"password-{i}"}
+            for i in range(count)
+        ]
+
+    def test_hashes_through_the_executor(self):
+        with mock.patch.object(
+            InlineHasher,
+            "make_passwords",
+            autospec=True,
+            side_effect=lambda self, p: [f"hash-{password}" for password in p],
+        ) as make_passwords:
+            response = self.client.post(
+                self.url, {"accounts": self.accounts(3)}, format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        make_passwords.assert_called_once()
+        self.assertEqual(
+            User.objects.get(email="user-1@example.com").password, "hash-password-1"
+        )
+
+    def test_batch_limit(self):
+        response = self.client.post(
+            self.url, {"accounts": self.accounts(101)}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(email="user-0@example.com").exists())
@@ -6,7 +6,13 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 
-from users.views import CreateUserView, ManageUserView, InviteViewSet, FamilyViewSet
+from users.views import (
+    CreateUserView,
+    ManageUserView,
+    InviteViewSet,
+    FamilyViewSet,
+    ProvisionUsersView,
+)
 
 router = routers.DefaultRouter()
 router.register("invites", InviteViewSet, basename="invites")
@@ -19,6 +25,7 @@ urlpatterns = [
     path("token/refresh", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
     path("me/", ManageUserView.as_view(), name="me"),
+    path("provision/", ProvisionUsersView.as_view(), name="provision"),
     path("", include(router.urls)),
 ]
 
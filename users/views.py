@@ -1,18 +1,25 @@
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.db.models import Q
-from rest_framework import generics, viewsets, mixins, status
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics, viewsets, mixins, status, permissions
 from rest_framework.decorators import action as action_decorator
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from fire_fruit_money.async_views import AsyncReadMixin
+from fire_fruit_money.cache import FamilyResponseCacheMixin
 from users.models import Invite, Family
+from users.provisioning import provision_users
 from users.serializers import (
     UserSerializer,
     InviteSerializer,
     InviteListSerializer,
     InviteUpdateSerializer,
     FamilySerializer, date_time_format,
+    ProvisionSerializer,
+    ProvisionedUserSerializer,
 )
 
 
@@ -44,14 +51,56 @@ class CreateUserView(generics.CreateAPIView):
         return serializer.save()
 
 
+class ProvisionUsersView(generics.GenericAPIView):
+    """
+    Create up to 100 users with their families at once. Staff only.
+
+    Larger loads go through the `provision_users` management command.
+    """
+
+    serializer_class = ProvisionSerializer
+    permission_classes = (permissions.IsAdminUser,)
+
+    @extend_schema(responses={201: ProvisionedUserSerializer(many=True)})
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            users = provision_users(serializer.validated_data["accounts"])
+        except ValueError as error:
+            raise ValidationError({"accounts": [str(error)]})
+        return Response(
+            ProvisionedUserSerializer(users, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        # `request.user` may come from the user cache; saving it would write
+        # back fields another process has changed since.
+        return get_user_model().objects.get(pk=self.request.user.pk)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        user = serializer.save()
+
+        # Families are rendered by their admin's and members' emails, so responses
+        # keyed on the family's change sequence are stale after an email change.
+        if "email" in serializer.validated_data:
+            Family.touch(
+                user.family_id,
+                *Family.objects.filter(admin=user).values_list("pk", flat=True),
+            )
 
 
 class FamilyViewSet(
+    FamilyResponseCacheMixin,
+    AsyncReadMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -60,7 +109,7 @@ class FamilyViewSet(
 
     def get_queryset(self):
         user = self.request.user
-        queryset = Family.objects.all()
+        queryset = Family.objects.select_related("admin").prefetch_related("members")
         if not user.is_staff:
             queryset = queryset.filter(members=user)
         return queryset
@@ -79,7 +128,7 @@ class FamilyViewSet(
         The user must be a member of the family they are trying to leave.
         """
         family = self.get_object()
-        member = request.user
+        member = get_user_model().objects.select_for_update().get(pk=request.user.pk)
 
         # Ensure that the user who wants to leave the family is a member of this family.
         if not member in family.members.all():
@@ -96,7 +145,9 @@ class FamilyViewSet(
             )
 
         member.family = Family.objects.get(admin=member)
-        member.save()
+        member.save(update_fields=["family"])
+
+        Family.touch(family.pk, member.family_id)
 
         return Response(
             {"detail": "You successfully left the family"}, status=status.HTTP_200_OK
@@ -152,7 +203,9 @@ class FamilyViewSet(
 
         member = get_user_model().objects.get(email=member_email)
         member.family = Family.objects.get(admin=member)
-        member.save()
+        member.save(update_fields=["family"])
+
+        Family.touch(family.pk, member.family_id)
 
         return Response(
             {"detail": f"You successfully deleted {member} from your family."},
@@ -160,7 +213,7 @@ class FamilyViewSet(
         )
 
 
-class InviteViewSet(viewsets.ModelViewSet):
+class InviteViewSet(AsyncReadMixin, viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         queryset = Invite.objects.select_related("sender", "recipient")
@@ -192,8 +245,11 @@ class InviteViewSet(viewsets.ModelViewSet):
             sender = serializer.instance.sender
             recipient = serializer.instance.recipient
 
+            previous_family_id = recipient.family_id
             recipient.family = sender.family
-            recipient.save()
+            recipient.save(update_fields=["family"])
+
+            Family.touch(previous_family_id, recipient.family_id)
 
             serializer.instance.delete()
             return